@@ -0,0 +1,66 @@
+"""Mock upstream TTS services shared by the tests."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+
+
+def audio_start(rate=16000):
+    return AudioStart(rate=rate, width=2, channels=1).event()
+
+
+def audio_chunk(audio, rate=16000):
+    return AudioChunk(rate=rate, width=2, channels=1, audio=audio).event()
+
+
+def audio_events(audio, rate=16000):
+    return [audio_start(rate), audio_chunk(audio, rate), AudioStop().event()]
+
+
+def make_client(*events, delay=0.0):
+    """Mock upstream client answering with events, the first one after a delay.
+
+    Once the events run out the client reads None, as if the upstream closed
+    the connection.
+    """
+    client = AsyncMock()
+    client.__aenter__.return_value = client
+    responses = list(events)
+
+    async def read_event():
+        await asyncio.sleep(delay if len(responses) == len(events) else 0)
+        return responses.pop(0) if responses else None
+
+    client.read_event.side_effect = read_event
+    return client
+
+
+def make_echo_client(delays=None):
+    """Mock upstream client whose audio is the text it was asked to synthesize.
+
+    ``delays`` maps a text to the seconds to wait before answering it.
+    """
+    delays = delays or {}
+    client = AsyncMock()
+    client.__aenter__.return_value = client
+    responses = []
+
+    async def write_event(event):
+        text = event.data["text"]
+        responses.extend(audio_events(text.encode()))
+        responses.insert(0, delays.get(text, 0))
+
+    async def read_event():
+        if responses and not hasattr(responses[0], "type"):
+            await asyncio.sleep(responses.pop(0))
+        return responses.pop(0) if responses else None
+
+    client.write_event.side_effect = write_event
+    client.read_event.side_effect = read_event
+    return client
+
+
+async def collect(request):
+    """Read every event of an in-flight request."""
+    return [event async for event in request.subscribe()]
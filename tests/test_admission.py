@@ -0,0 +1,71 @@
+import hashlib
+
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.error import Error
+
+from wyoming_tts_proxy.admission import AdmissionPolicy, FrequencySketch
+from wyoming_tts_proxy.metrics import CACHE_REJECTIONS_TOTAL
+
+
+def key(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def stream(audio=b"\x00" * 100):
+    return [
+        AudioStart(rate=16000, width=2, channels=1).event(),
+        AudioChunk(rate=16000, width=2, channels=1, audio=audio).event(),
+        AudioStop().event(),
+    ]
+
+
+def rejections(reason):
+    return CACHE_REJECTIONS_TOTAL.labels(reason=reason)._value.get()
+
+
+def test_sketch_counts_and_ages():
+    sketch = FrequencySketch(expected_keys=16)
+    for _ in range(4):
+        sketch.increment(key("often"))
+    sketch.increment(key("once"))
+
+    assert sketch.estimate(key("often")) == 4
+    assert sketch.estimate(key("once")) == 1
+    assert sketch.estimate(key("never")) == 0
+
+    # Reaching the sample size halves all counts
+    for _ in range(sketch.sample_size - 5):
+        sketch.increment(key("popular"))
+    assert sketch.estimate(key("often")) == 2
+    assert sketch.estimate(key("once")) == 0
+
+
+def test_rejects_failed_and_incomplete_streams():
+    policy = AdmissionPolicy()
+    errors = rejections("error")
+    incomplete = rejections("incomplete")
+
+    assert policy.admit(key("a"), stream())
+    assert not policy.admit(key("a"), stream()[:2] + [Error(text="boom").event()])
+    assert not policy.admit(key("a"), stream()[:2])
+    # Audio started again after the stop
+    assert not policy.admit(key("a"), stream() + stream()[:1])
+
+    assert rejections("error") == errors + 1
+    assert rejections("incomplete") == incomplete + 2
+
+
+def test_rejects_large_entries():
+    policy = AdmissionPolicy(max_entry_bytes=1000)
+
+    assert policy.admit(key("a"), stream(b"\x00" * 1000))
+    assert not policy.admit(key("a"), stream(b"\x00" * 1002))
+
+
+def test_admits_after_enough_requests():
+    policy = AdmissionPolicy(admit_after=2)
+
+    policy.record(key("a"))
+    assert not policy.admit(key("a"), stream())
+    policy.record(key("a"))
+    assert policy.admit(key("a"), stream())
@@ -0,0 +1,75 @@
+import pytest
+
+from wyoming_tts_proxy.balancer import EWMA_HALF_LIFE, UpstreamBalancer
+
+URIS = ["tcp://a:10200", "tcp://b:10200", "tcp://c:10200"]
+
+
+def test_failover_keeps_configured_order():
+    balancer = UpstreamBalancer(URIS)
+    assert balancer.order() == URIS
+    assert balancer.order() == URIS
+    assert balancer.preferred() == URIS[0]
+
+
+def test_round_robin_rotates():
+    balancer = UpstreamBalancer(URIS, "round_robin")
+    assert balancer.preferred() == URIS[0]
+    assert balancer.order() == URIS
+    assert balancer.preferred() == URIS[1]
+    assert balancer.order() == [URIS[1], URIS[2], URIS[0]]
+    assert balancer.order() == [URIS[2], URIS[0], URIS[1]]
+    assert balancer.order() == URIS
+
+
+def test_least_outstanding():
+    balancer = UpstreamBalancer(URIS, "least_outstanding")
+    balancer.started(URIS[0])
+    balancer.started(URIS[0])
+    balancer.started(URIS[1])
+    assert balancer.order() == [URIS[2], URIS[1], URIS[0]]
+
+    balancer.finished(URIS[0])
+    balancer.finished(URIS[0])
+    assert balancer.order()[0] == URIS[0]
+
+
+def test_ewma_prefers_fastest_and_unmeasured():
+    balancer = UpstreamBalancer(URIS, "ewma")
+    balancer.latency[URIS[0]].record(0.5)
+    balancer.latency[URIS[1]].record(0.1)
+    # c has no samples yet, so it is tried first to get measured
+    assert balancer.order() == [URIS[2], URIS[1], URIS[0]]
+
+    # Only once, it waits behind the others until it is measured
+    assert balancer.order() == [URIS[1], URIS[0], URIS[2]]
+
+    balancer.latency[URIS[2]].record(0.3)
+    assert balancer.order() == [URIS[1], URIS[2], URIS[0]]
+
+
+def test_ewma_counts_failures():
+    balancer = UpstreamBalancer(URIS, "ewma")
+    for uri in URIS:
+        balancer.latency[uri].record(0.5)
+    balancer.latency[URIS[0]].record(0.1)
+
+    # Failing before first audio records no latency sample
+    balancer.failed(URIS[0])
+    assert balancer.order()[-1] == URIS[0]
+
+
+def test_ewma_decays_so_slow_upstreams_are_retried():
+    balancer = UpstreamBalancer(URIS[:2], "ewma")
+    balancer.latency[URIS[0]].record(2.0)
+    balancer.latency[URIS[1]].record(0.2)
+    assert balancer.order() == URIS[1::-1]
+
+    # a has not been chosen for several half-lives
+    balancer.latency[URIS[0]].updated_at -= 5 * EWMA_HALF_LIFE
+    assert balancer.order() == URIS[:2]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        UpstreamBalancer(URIS, "random")
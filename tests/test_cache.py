@@ -1,5 +1,19 @@
-from wyoming.audio import AudioStart, AudioStop
-from wyoming_tts_proxy.cache import AudioCache
+import asyncio
+import os
+import sqlite3
+import threading
+
+import pytest
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import write_event
+from wyoming_tts_proxy.cache import (
+    PCM_MAGIC,
+    SHARED_INDEX_FILE,
+    AudioCache,
+    MemoryTier,
+    _read_batch,
+)
+from wyoming_tts_proxy.metrics import CACHE_TIER_HITS_TOTAL
 
 
 def test_cache_set_get(tmp_path):
@@ -61,3 +75,414 @@ def test_cache_pruning(tmp_path):
     cache.set("third", None, [AudioStop().event()])
     assert not (cache_dir / f"{cache.get_hash('second', None)}.events").exists()
     assert not (cache_dir / f"{cache.get_hash('third', None)}.events").exists()
+
+
+def speech_events():
+    import math
+    import struct
+
+    samples = [int(8000 * math.sin(i / 20)) for i in range(16000)]
+    audio = struct.pack(f"<{len(samples)}h", *samples)
+    return [
+        AudioStart(rate=16000, width=2, channels=1).event(),
+        AudioChunk(rate=16000, width=2, channels=1, audio=audio).event(),
+        AudioStop().event(),
+    ]
+
+
+def cache_file(cache, text):
+    return cache.cache_dir / f"{cache.get_hash(text, None)}.events"
+
+
+@pytest.mark.parametrize("compression", ["zlib", "delta"])
+def test_cache_compression_round_trip(tmp_path, compression):
+    if compression == "delta":
+        pytest.importorskip("numpy")
+    plain = AudioCache(str(tmp_path / "plain"))
+    compressed = AudioCache(str(tmp_path / "compressed"), compression=compression)
+    events = speech_events()
+
+    plain.set("Hello", None, events)
+    compressed.set("Hello", None, events)
+    retrieved = compressed.get("Hello", None)
+
+    assert [e.type for e in retrieved] == [e.type for e in events]
+    assert retrieved[1].payload == events[1].payload
+    assert retrieved[1].data == events[1].data
+    assert (
+        cache_file(compressed, "Hello").stat().st_size
+        < cache_file(plain, "Hello").stat().st_size
+    )
+
+
+def test_delta_compresses_better_than_zlib(tmp_path):
+    pytest.importorskip("numpy")
+    zlib_cache = AudioCache(str(tmp_path / "zlib"), compression="zlib")
+    delta_cache = AudioCache(str(tmp_path / "delta"), compression="delta")
+
+    zlib_cache.set("Hello", None, speech_events())
+    delta_cache.set("Hello", None, speech_events())
+
+    assert (
+        cache_file(delta_cache, "Hello").stat().st_size
+        < cache_file(zlib_cache, "Hello").stat().st_size
+    )
+
+
+def test_uncompressed_entries_are_read_after_enabling_compression(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    AudioCache(cache_dir).set("Hello", None, speech_events())
+
+    retrieved = AudioCache(cache_dir, compression="zlib").get("Hello", None)
+
+    assert retrieved[1].payload == speech_events()[1].payload
+
+
+def tier_hits(tier):
+    return CACHE_TIER_HITS_TOTAL.labels(tier=tier)._value.get()
+
+
+def test_memory_tier_serves_hot_entries(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), memory_size_mb=1)
+    events = speech_events()
+    cache.set("Hello", None, events)
+    memory_before, disk_before = tier_hits("memory"), tier_hits("disk")
+
+    # Served from memory even without the file
+    cache_file(cache, "Hello").unlink()
+    retrieved = cache.get("Hello", None)
+
+    assert retrieved[1].payload == events[1].payload
+    assert tier_hits("memory") == memory_before + 1
+    assert tier_hits("disk") == disk_before
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    AudioCache(cache_dir).set("Hello", None, speech_events())
+    cache = AudioCache(cache_dir, memory_size_mb=1)
+    disk_before = tier_hits("disk")
+
+    cache.get("Hello", None)
+    cache.get("Hello", None)
+
+    assert tier_hits("disk") == disk_before + 1
+    assert len(cache.memory) == 1
+
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_bytes=10)
+    tier.put("a", b"aaaa")
+    tier.put("b", b"bbbb")
+    tier.get("a")
+    tier.put("c", b"cccc")
+
+    assert tier.get("b") is None
+    assert tier.get("a") == b"aaaa"
+    assert tier.get("c") == b"cccc"
+    assert tier.size == 8
+
+    # Entries larger than the budget are not kept
+    tier.put("d", b"d" * 11)
+    assert tier.get("d") is None
+
+
+def test_pruning_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    for text in ("first", "second", "third"):
+        cache.set(text, None, speech_events())
+    cache.get("first", None)
+
+    # Room for two entries
+    cache.max_size_mb = (2.5 * cache_file(cache, "first").stat().st_size) / (
+        1024 * 1024
+    )
+    cache.set("fourth", None, speech_events())
+
+    assert cache_file(cache, "first").exists()
+    assert not cache_file(cache, "second").exists()
+    assert not cache_file(cache, "third").exists()
+    assert cache_file(cache, "fourth").exists()
+
+
+def test_index_is_loaded_from_disk(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    AudioCache(cache_dir).set("Hello", None, speech_events())
+
+    cache = AudioCache(cache_dir)
+
+    assert "Hello" not in cache.index
+    assert cache.get_hash("Hello", None) in cache.index
+    assert cache.index.total_size == cache_file(cache, "Hello").stat().st_size
+
+
+@pytest.mark.asyncio
+async def test_background_writes_are_served_before_they_land(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    events = speech_events()
+
+    cache.set_background("Hello", None, events)
+    retrieved = await cache.get_async("Hello", None)
+    assert retrieved[1].payload == events[1].payload
+
+    await cache.flush()
+    assert cache_file(cache, "Hello").exists()
+    assert not cache._pending
+
+
+@pytest.mark.asyncio
+async def test_get_async_reads_from_disk(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    AudioCache(cache_dir).set("Hello", None, speech_events())
+    cache = AudioCache(cache_dir)
+    disk_before = tier_hits("disk")
+
+    retrieved = await cache.get_async("Hello", None)
+
+    assert retrieved[1].payload == speech_events()[1].payload
+    assert tier_hits("disk") == disk_before + 1
+    assert await cache.get_async("missing", None) is None
+
+
+async def collect_stream(stream):
+    return [event async for event in stream]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+async def test_stream_async(tmp_path, compression):
+    cache_dir = str(tmp_path / "cache")
+    AudioCache(cache_dir, compression=compression).set("Hello", None, speech_events())
+    cache = AudioCache(cache_dir, compression=compression)
+
+    stream = await cache.stream_async("Hello", None)
+    events = await collect_stream(stream)
+
+    assert [e.type for e in events] == ["audio-start", "audio-chunk", "audio-stop"]
+    assert events[1].payload == speech_events()[1].payload
+    assert await cache.stream_async("missing", None) is None
+
+
+@pytest.mark.asyncio
+async def test_stream_async_promotes_to_memory(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    AudioCache(cache_dir).set("Hello", None, speech_events())
+    cache = AudioCache(cache_dir, memory_size_mb=1)
+
+    await collect_stream(await cache.stream_async("Hello", None))
+
+    assert len(cache.memory) == 1
+
+
+def test_read_batch_starts_playback_after_first_chunk():
+    chunk = AudioChunk(rate=16000, width=2, channels=1, audio=b"\x00" * 40000).event()
+    reader = iter([AudioStart(rate=16000, width=2, channels=1).event()] + [chunk] * 5)
+
+    assert [e.type for e in _read_batch(reader, first=True)] == [
+        "audio-start",
+        "audio-chunk",
+    ]
+    # Later batches hold about STREAM_BATCH_SIZE bytes of audio
+    assert len(_read_batch(reader, first=False)) == 2
+    assert len(_read_batch(reader, first=False)) == 2
+    assert _read_batch(reader, first=False) == []
+
+
+def test_single_format_entries_are_stored_as_pcm(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    events = speech_events()
+    cache.set("Hello", None, events)
+
+    data = cache_file(cache, "Hello").read_bytes()
+    assert data.startswith(PCM_MAGIC)
+    assert data.endswith(events[1].payload)
+
+    retrieved = cache.get("Hello", None)
+    assert [e.type for e in retrieved] == ["audio-start", "audio-chunk", "audio-stop"]
+    assert retrieved[0].data == events[0].data
+    assert retrieved[1].payload == events[1].payload
+
+
+def test_memory_tier_replays_pcm_without_copies(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), memory_size_mb=1)
+    cache.set("Hello", None, speech_events())
+
+    retrieved = cache.get("Hello", None)
+
+    assert isinstance(retrieved[1].payload, memoryview)
+
+
+def test_mixed_entries_are_stored_as_events(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    events = [
+        AudioStart(rate=16000, width=2, channels=1).event(),
+        AudioChunk(rate=16000, width=2, channels=1, audio=b"\x01\x02").event(),
+        AudioChunk(rate=22050, width=2, channels=1, audio=b"\x03\x04").event(),
+        AudioStop().event(),
+    ]
+    cache.set("Hello", None, events)
+
+    assert not cache_file(cache, "Hello").read_bytes().startswith(PCM_MAGIC)
+    retrieved = cache.get("Hello", None)
+    assert [AudioChunk.from_event(e).rate for e in retrieved[1:3]] == [16000, 22050]
+
+
+def test_legacy_event_files_are_read(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    with open(cache_file(cache, "Hello"), "wb") as f:
+        for event in speech_events():
+            write_event(event, f)
+
+    retrieved = cache.get("Hello", None)
+
+    assert retrieved[1].payload == speech_events()[1].payload
+
+
+@pytest.mark.parametrize("damage", ["truncate", "flip"])
+def test_corrupt_pcm_entries_are_removed(tmp_path, damage):
+    cache_dir = str(tmp_path / "cache")
+    AudioCache(cache_dir).set("Hello", None, speech_events())
+    cache = AudioCache(cache_dir)
+    path = cache_file(cache, "Hello")
+    data = bytearray(path.read_bytes())
+    if damage == "truncate":
+        del data[-100:]
+    else:
+        data[-100] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    assert cache.get("Hello", None) is None
+    assert not path.exists()
+    assert cache.get_hash("Hello", None) not in cache.index
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_segment_store(tmp_path, compression):
+    cache_dir = str(tmp_path / "cache")
+    cache = AudioCache(cache_dir, store="segments", compression=compression)
+    cache.set("Hello", None, speech_events())
+
+    assert not list(cache.cache_dir.glob("*.events"))
+    assert cache.get("Hello", None)[1].payload == speech_events()[1].payload
+
+    reopened = AudioCache(cache_dir, store="segments", compression=compression)
+    assert cache.get_hash("Hello", None) in reopened.index
+    assert reopened.get("Hello", None)[1].payload == speech_events()[1].payload
+
+
+@pytest.mark.asyncio
+async def test_segment_store_pruning_compacts(tmp_path):
+    cache = AudioCache(
+        str(tmp_path / "cache"), store="segments", segment_size_mb=0, max_size_mb=1
+    )
+    for i in range(40):
+        cache.set(f"phrase {i}", None, speech_events())
+    await cache.flush()
+
+    # Only about 30 entries fit, the pack files of the others are gone
+    assert len(cache.index) < 40
+    segments = list((cache.cache_dir / "segments").glob("segment-*.pack"))
+    assert len(segments) <= len(cache.index) + 1
+    assert cache.get("phrase 39", None) is not None
+
+
+@pytest.mark.asyncio
+async def test_admission_after_repeated_requests(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), admit_after=2)
+
+    # A one-off text is not cached
+    assert await cache.stream_async("Hello", None) is None
+    cache.set_background("Hello", None, speech_events())
+    await cache.flush()
+    assert not cache_file(cache, "Hello").exists()
+
+    # The second request for it is
+    assert await cache.stream_async("Hello", None) is None
+    cache.set_background("Hello", None, speech_events())
+    await cache.flush()
+    assert cache_file(cache, "Hello").exists()
+
+
+def test_failed_stream_is_not_cached(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    cache.set("Hello", None, speech_events()[:2])
+
+    assert cache.get("Hello", None) is None
+
+
+def test_shared_cache_between_processes(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = AudioCache(cache_dir, shared=True, max_size_mb=1)
+    second = AudioCache(cache_dir, shared=True, max_size_mb=1)
+
+    first.set("Hello", None, speech_events())
+    assert second.get("Hello", None)[1].payload == speech_events()[1].payload
+    assert not list(first.cache_dir.glob(".*.tmp"))
+
+    # Entries written by either process count against the same limit
+    for i in range(40):
+        (first, second)[i % 2].set(f"phrase {i}", None, speech_events())
+    on_disk = sum(f.stat().st_size for f in first.cache_dir.glob("*.events"))
+    assert on_disk == first.index.total_size <= 1024 * 1024
+    assert len(first.index) == len(list(first.cache_dir.glob("*.events")))
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_close_writes_use_times(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = AudioCache(cache_dir, shared=True)
+    first.set("Hello", None, speech_events())
+    first.set("Bye", None, speech_events())
+    assert first.get("Hello", None) is not None
+
+    await first.close()
+
+    # The use of "Hello" made "Bye" the oldest entry
+    second = AudioCache(cache_dir, shared=True)
+    assert second.index.pop_oldest()[0] == second.get_hash("Bye", None)
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_hits_do_not_wait_for_busy_database(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache = AudioCache(str(cache_dir), shared=True, memory_size_mb=1)
+    cache.set("Hello", None, speech_events())
+
+    # Another process holds the database while a background write waits for it
+    other = sqlite3.connect(str(cache_dir / SHARED_INDEX_FILE), isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        cache.set_background("Bye", None, speech_events())
+        await asyncio.sleep(0.1)
+
+        hits = []
+        lookup = threading.Thread(target=lambda: hits.append(cache.get("Hello", None)))
+        lookup.start()
+        lookup.join(timeout=1)
+        assert hits and hits[0] is not None
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    await cache.close()
+
+
+def test_shared_cache_requires_file_store(tmp_path):
+    with pytest.raises(ValueError):
+        AudioCache(str(tmp_path / "cache"), shared=True, store="segments")
+
+
+def test_stale_temp_files_are_removed(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    stale = cache_dir / ".abc.1.2.tmp"
+    stale.write_bytes(b"partial")
+    os.utime(stale, (0, 0))
+    fresh = cache_dir / ".def.1.2.tmp"
+    fresh.write_bytes(b"partial")
+
+    AudioCache(str(cache_dir))
+
+    assert not stale.exists()
+    # Possibly still being written by another process
+    assert fresh.exists()
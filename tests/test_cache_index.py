@@ -0,0 +1,78 @@
+from wyoming_tts_proxy.cache_index import CacheIndex, SharedCacheIndex
+from wyoming_tts_proxy.store import StoredEntry
+
+
+def test_tracks_total_size():
+    index = CacheIndex()
+    index.add("a", 10, used_at=1.0)
+    index.add("b", 20, used_at=2.0)
+    assert index.total_size == 30
+
+    # Rewriting an entry replaces its size
+    index.add("a", 5, used_at=3.0)
+    assert index.total_size == 25
+    assert len(index) == 2
+
+    index.remove("b")
+    assert index.total_size == 5
+    assert "b" not in index
+
+
+def test_pops_least_recently_used():
+    index = CacheIndex()
+    index.add("a", 1, used_at=1.0)
+    index.add("b", 2, used_at=2.0)
+    index.add("c", 3, used_at=3.0)
+    index.touch("a")
+
+    assert index.pop_oldest() == ("b", 2)
+    assert index.pop_oldest() == ("c", 3)
+    assert index.pop_oldest() == ("a", 1)
+    assert index.pop_oldest() is None
+    assert index.total_size == 0
+
+
+def test_heap_does_not_grow_without_bound():
+    index = CacheIndex()
+    index.add("a", 1)
+    for _ in range(1000):
+        index.touch("a")
+
+    assert len(index._heap) < 100
+    assert index.pop_oldest() == ("a", 1)
+
+
+def test_shared_index_is_seen_by_every_process(tmp_path):
+    first = SharedCacheIndex(tmp_path / "index.sqlite3")
+    second = SharedCacheIndex(tmp_path / "index.sqlite3")
+    first.add("a", 10, used_at=1.0)
+    second.add("b", 20, used_at=2.0)
+    first.add("a", 5, used_at=3.0)
+
+    assert first.total_size == second.total_size == 25
+    assert len(second) == 2
+    assert "a" in second
+
+    # Use times are written with the next change
+    first.touch("b")
+    first.flush()
+    assert second.pop_oldest() == ("a", 5)
+    assert first.pop_oldest() == ("b", 20)
+    assert second.pop_oldest() is None
+    assert first.total_size == 0
+
+
+def test_shared_index_reconciles_with_disk(tmp_path):
+    index = SharedCacheIndex(tmp_path / "index.sqlite3")
+    index.add("gone", 10, used_at=1.0)
+    index.add("kept", 20, used_at=2.0)
+    index.add("new", 30, used_at=5.0)
+
+    index.reconcile(
+        [StoredEntry("kept", 99, 9.0), StoredEntry("found", 40, 3.0)], scanned_at=4.0
+    )
+
+    # Existing rows are kept as they are, rows written after the scan too
+    assert index.total_size == 90
+    assert "gone" not in index
+    assert index.pop_oldest() == ("kept", 20)
@@ -0,0 +1,122 @@
+import pytest
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+
+from wyoming_tts_proxy.convert import AudioConverter
+
+np = pytest.importorskip("numpy")
+
+
+def chunk(samples, rate=16000, width=2, channels=1):
+    audio = np.asarray(samples, dtype=f"<i{width}").tobytes()
+    return AudioChunk(rate=rate, width=width, channels=channels, audio=audio).event()
+
+
+def samples(events, width=2):
+    audio = b"".join(e.payload for e in events if AudioChunk.is_type(e.type))
+    return np.frombuffer(audio, dtype=f"<i{width}")
+
+
+def test_disabled_passes_events_through():
+    converter = AudioConverter()
+    event = chunk([1, 2, 3])
+    assert not converter.enabled
+    assert converter.process(event) == [event]
+
+
+def test_chunk_in_target_format_is_passed_through():
+    event = chunk([1, 2, 3])
+    assert AudioConverter(rate=16000, width=2, channels=1).process(event) == [event]
+
+
+def test_audio_start_is_rewritten():
+    event = AudioStart(rate=22050, width=2, channels=2).event()
+    converted = AudioConverter(rate=16000, channels=1).process(event)
+
+    start = AudioStart.from_event(converted[0])
+    assert (start.rate, start.width, start.channels) == (16000, 2, 1)
+
+
+def test_stereo_is_downmixed():
+    event = chunk([1000, 3000, -2000, 0], channels=2)
+    converted = AudioConverter(channels=1).process(event)
+
+    assert AudioChunk.from_event(converted[0]).channels == 1
+    assert samples(converted).tolist() == [2000, -1000]
+
+
+def test_width_conversion():
+    event = chunk([0, 16384, -32768])
+    converted = AudioConverter(width=1).process(event)
+
+    assert AudioChunk.from_event(converted[0]).width == 1
+    assert list(converted[0].payload) == [128, 192, 0]
+
+    back = AudioConverter(width=2).process(converted[0])
+    assert samples(back).tolist() == [0, 16384, -32768]
+
+
+def test_24_bit_round_trip():
+    event = chunk([0, 12345, -32768, 32767])
+    wide = AudioConverter(width=3).process(event)
+    assert len(wide[0].payload) == 12
+
+    back = AudioConverter(width=2).process(wide[0])
+    assert samples(back).tolist() == [0, 12345, -32768, 32767]
+
+
+def test_resampling_is_continuous_across_chunks():
+    ramp = np.arange(0, 22050 * 10, 10) % 30000
+    whole = AudioConverter(rate=16000).process(chunk(ramp, rate=22050))
+
+    converter = AudioConverter(rate=16000)
+    pieces = []
+    for start in range(0, len(ramp), 97):
+        pieces.extend(converter.process(chunk(ramp[start : start + 97], rate=22050)))
+
+    assert AudioChunk.from_event(pieces[0]).rate == 16000
+    # Identical up to rounding of the interpolation positions
+    assert len(samples(pieces)) == len(samples(whole))
+    assert np.abs(samples(pieces) - samples(whole)).max() <= 1
+    assert abs(len(samples(whole)) - 16000) <= 1
+
+
+def test_incomplete_frames_are_carried_over():
+    audio = np.asarray([100, 200, 300], dtype="<i2").tobytes()
+    converter = AudioConverter(width=1)
+    first = converter.process(
+        AudioChunk(rate=16000, width=2, channels=1, audio=audio[:3]).event()
+    )
+    second = converter.process(
+        AudioChunk(rate=16000, width=2, channels=1, audio=audio[3:]).event()
+    )
+
+    assert len(first[0].payload) == 1
+    assert len(second[0].payload) == 2
+
+
+def test_non_audio_events_pass_through():
+    converter = AudioConverter(channels=1)
+    events = [
+        AudioStart(rate=16000, width=2, channels=2).event(),
+        chunk([100, 300], channels=2),
+        AudioStop().event(),
+    ]
+
+    converted = [e for event in events for e in converter.process(event)]
+
+    assert [e.type for e in converted] == ["audio-start", "audio-chunk", "audio-stop"]
+    assert samples(converted).tolist() == [200]
+
+
+def test_downsampling_does_not_alias():
+    def level(frequency, rate=22050):
+        t = np.arange(rate) / rate
+        tone = (np.sin(2 * np.pi * frequency * t) * 16000).astype("<i2")
+        converted = samples(AudioConverter(rate=16000).process(chunk(tone, rate=rate)))
+        # Skip the start, where the filter is still filling up
+        return np.abs(converted[1000:]).max()
+
+    # Below the 8 kHz target Nyquist frequency the tone is kept
+    assert level(1000) > 15000
+    # Above it, it would fold back to 6 kHz without the low-pass filter
+    assert level(10000) < 500
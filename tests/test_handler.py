@@ -1,10 +1,13 @@
 import asyncio
+import io
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from wyoming.event import write_event
 from wyoming.info import Describe, Info, TtsProgram, Attribution
 from wyoming.tts import Synthesize
-from wyoming.audio import AudioStart, AudioStop
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
 
 from wyoming_tts_proxy.handler import TTSProxyEventHandler
 from wyoming_tts_proxy.normalizer import TextNormalizer
@@ -38,6 +41,11 @@ def proxy_config():
     return ProxyConfig()
 
 
+def written_event_types(writer):
+    """Return the event types written to a mocked client StreamWriter."""
+    return [json.loads(c.args[0][0])["type"] for c in writer.writelines.call_args_list]
+
+
 @pytest.mark.asyncio
 async def test_handler_describe(
     proxy_program_info, text_normalizer, audio_cache, proxy_config
@@ -75,7 +83,7 @@ async def test_handler_describe(
     )
 
     with patch(
-        "wyoming_tts_proxy.handler.AsyncClient.from_uri", return_value=upstream_client
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
     ):
         # Simulate Describe event
         event = Describe().event()
@@ -112,7 +120,7 @@ async def test_handler_describe_failover(
     )
 
     with patch(
-        "wyoming_tts_proxy.handler.AsyncClient.from_uri", side_effect=[client1, client2]
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", side_effect=[client1, client2]
     ):
         event = Describe().event()
         result = await handler.handle_event(event)
@@ -153,7 +161,7 @@ async def test_handler_synthesize_ssml(
 
     event = Synthesize(text="hello").event()
     with patch(
-        "wyoming_tts_proxy.handler.AsyncClient.from_uri", return_value=upstream_client
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
     ):
         result = await handler.handle_event(event)
 
@@ -224,7 +232,7 @@ async def test_handler_streaming_synthesize(
     from wyoming.tts import SynthesizeStart, SynthesizeChunk, SynthesizeStop
 
     with patch(
-        "wyoming_tts_proxy.handler.AsyncClient.from_uri", return_value=upstream_client
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
     ):
         # Start streaming
         await handler.handle_event(SynthesizeStart().event())
@@ -277,7 +285,7 @@ async def test_handler_force_streaming_with_flag(
 
     event = Synthesize(text="hello").event()
     with patch(
-        "wyoming_tts_proxy.handler.AsyncClient.from_uri", return_value=upstream_client
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
     ):
         result = await handler.handle_event(event)
 
@@ -325,7 +333,7 @@ async def test_handler_preserve_streaming_flag(
     )
 
     with patch(
-        "wyoming_tts_proxy.handler.AsyncClient.from_uri", return_value=upstream_client
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
     ):
         event = Describe().event()
         result = await handler.handle_event(event)
@@ -334,3 +342,565 @@ async def test_handler_preserve_streaming_flag(
     # Check that the Info sent to client preserves the streaming flag
     # The write call should have the streaming flag set to True
     assert writer.write.called
+
+
+@pytest.mark.asyncio
+async def test_handler_incremental_streaming(
+    proxy_program_info, text_normalizer, audio_cache
+):
+    """Sentences are forwarded upstream and audio flows before SynthesizeStop."""
+    from wyoming.audio import AudioChunk
+    from wyoming.tts import (
+        SynthesizeChunk,
+        SynthesizeStart,
+        SynthesizeStop,
+        SynthesizeStopped,
+    )
+
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+
+    upstream_events = asyncio.Queue()
+    upstream_client = AsyncMock()
+    upstream_client.__aenter__.return_value = upstream_client
+    upstream_client.read_event.side_effect = upstream_events.get
+
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://upstream"],
+        text_normalizer=text_normalizer,
+        cache=audio_cache,
+        config=ProxyConfig(incremental_streaming=True),
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
+    ):
+        await handler.handle_event(SynthesizeStart().event())
+        await handler.handle_event(SynthesizeChunk(text="Hello *there*. How").event())
+
+        sent = [c.args[0] for c in upstream_client.write_event.call_args_list]
+        assert SynthesizeStart.is_type(sent[0].type)
+        assert sent[1].data["text"] == "Hello there. "
+
+        # Audio for the first sentence reaches the client mid-stream
+        await upstream_events.put(AudioStart(rate=16000, width=2, channels=1).event())
+        await upstream_events.put(
+            AudioChunk(rate=16000, width=2, channels=1, audio=b"\0\0").event()
+        )
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert written_event_types(writer) == ["audio-start", "audio-chunk"]
+
+        await handler.handle_event(SynthesizeChunk(text=" are you?").event())
+        await upstream_events.put(AudioStop().event())
+        await upstream_events.put(SynthesizeStopped().event())
+        result = await handler.handle_event(SynthesizeStop().event())
+
+    assert result is True
+    sent = [c.args[0] for c in upstream_client.write_event.call_args_list]
+    assert [e.data.get("text") for e in sent[1:-1]] == [
+        "Hello there. ",
+        "How are you? ",
+    ]
+    assert SynthesizeStop.is_type(sent[-1].type)
+    written = written_event_types(writer)
+    assert written == [
+        "audio-start",
+        "audio-chunk",
+        "audio-stop",
+        "synthesize-stopped",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_handler_incremental_streaming_keeps_sentence_boundaries(
+    proxy_program_info, text_normalizer, audio_cache
+):
+    """The upstream still sees whitespace between the forwarded sentences."""
+    import re
+
+    from wyoming.tts import (
+        SynthesizeChunk,
+        SynthesizeStart,
+        SynthesizeStop,
+        SynthesizeStopped,
+    )
+
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+
+    upstream_events = asyncio.Queue()
+    upstream_client = AsyncMock()
+    upstream_client.__aenter__.return_value = upstream_client
+    upstream_client.read_event.side_effect = upstream_events.get
+
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://upstream"],
+        text_normalizer=text_normalizer,
+        cache=audio_cache,
+        config=ProxyConfig(incremental_streaming=True),
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
+    ):
+        await handler.handle_event(SynthesizeStart().event())
+        for text in ["Hello there. ", "How are ", "you today? ", "I am fine."]:
+            await handler.handle_event(SynthesizeChunk(text=text).event())
+        await upstream_events.put(SynthesizeStopped().event())
+        await handler.handle_event(SynthesizeStop().event())
+
+    upstream_text = "".join(
+        c.args[0].data["text"]
+        for c in upstream_client.write_event.call_args_list
+        if SynthesizeChunk.is_type(c.args[0].type)
+    )
+    assert upstream_text.strip() == "Hello there. How are you today? I am fine."
+    # Boundaries as detected by wyoming-piper: terminator, whitespace, capital
+    assert len(re.findall(r"[.?!]\s+[A-Z]", upstream_text)) == 2
+
+
+@pytest.mark.asyncio
+async def test_handler_incremental_streaming_all_upstreams_fail(
+    proxy_program_info, text_normalizer, audio_cache
+):
+    from wyoming.tts import SynthesizeChunk, SynthesizeStart, SynthesizeStop
+
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+
+    failing_client = AsyncMock()
+    failing_client.__aenter__.side_effect = Exception("Failed")
+
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://upstream1", "tcp://upstream2"],
+        text_normalizer=text_normalizer,
+        cache=audio_cache,
+        config=ProxyConfig(incremental_streaming=True),
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=failing_client
+    ):
+        await handler.handle_event(SynthesizeStart().event())
+        await handler.handle_event(SynthesizeChunk(text="One. Two. ").event())
+        result = await handler.handle_event(SynthesizeStop().event())
+
+    assert result is True
+    # Each upstream is only tried once for the whole stream
+    assert failing_client.__aenter__.call_count == 2
+    assert written_event_types(writer) == ["error", "synthesize-stopped"]
+
+
+@pytest.mark.asyncio
+async def test_handler_incremental_streaming_client_disconnect(
+    proxy_program_info, text_normalizer, audio_cache
+):
+    """A client that goes away is not counted against a healthy upstream."""
+    from wyoming.tts import SynthesizeChunk, SynthesizeStart, SynthesizeStop
+
+    from wyoming_tts_proxy.health import UpstreamHealth
+    from wyoming_tts_proxy.metrics import UPSTREAM_FAILURES_TOTAL
+
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+    writer.drain.side_effect = ConnectionResetError("Client disconnected")
+
+    upstream_events = asyncio.Queue()
+    upstream_client = AsyncMock()
+    upstream_client.__aenter__.return_value = upstream_client
+    upstream_client.read_event.side_effect = upstream_events.get
+
+    health = UpstreamHealth(failure_threshold=1)
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://upstream"],
+        text_normalizer=text_normalizer,
+        cache=audio_cache,
+        config=ProxyConfig(incremental_streaming=True),
+        health=health,
+    )
+    failures = UPSTREAM_FAILURES_TOTAL.labels(uri="tcp://upstream")._value.get()
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
+    ):
+        await handler.handle_event(SynthesizeStart().event())
+        await handler.handle_event(SynthesizeChunk(text="Hello there. ").event())
+        await upstream_events.put(AudioStart(rate=16000, width=2, channels=1).event())
+        with pytest.raises(ConnectionResetError):
+            await handler.handle_event(SynthesizeStop().event())
+
+    assert health.breaker("tcp://upstream").state == "closed"
+    assert UPSTREAM_FAILURES_TOTAL.labels(uri="tcp://upstream")._value.get() == failures
+
+
+@pytest.mark.asyncio
+async def test_handler_incremental_streaming_connect_timeout(
+    proxy_program_info, text_normalizer, audio_cache
+):
+    """A stuck connect fails over to the next upstream."""
+    from wyoming.tts import (
+        SynthesizeChunk,
+        SynthesizeStart,
+        SynthesizeStop,
+        SynthesizeStopped,
+    )
+
+    from wyoming_tts_proxy.metrics import UPSTREAM_TIMEOUTS_TOTAL
+
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+
+    async def hang(*args):
+        await asyncio.sleep(10)
+
+    stuck_client = AsyncMock()
+    stuck_client.__aenter__.side_effect = hang
+    upstream_client = AsyncMock()
+    upstream_client.__aenter__.return_value = upstream_client
+    upstream_client.read_event.side_effect = [SynthesizeStopped().event()]
+
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://stuck", "tcp://upstream"],
+        text_normalizer=text_normalizer,
+        cache=audio_cache,
+        config=ProxyConfig(incremental_streaming=True, upstream_connect_timeout=0.05),
+    )
+    timeouts = UPSTREAM_TIMEOUTS_TOTAL.labels(uri="tcp://stuck", stage="connect")
+    before = timeouts._value.get()
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[stuck_client, upstream_client],
+    ):
+        await handler.handle_event(SynthesizeStart().event())
+        await asyncio.wait_for(
+            handler.handle_event(SynthesizeChunk(text="Hello there. ").event()),
+            timeout=2,
+        )
+        await handler.handle_event(SynthesizeStop().event())
+
+    assert timeouts._value.get() == before + 1
+    assert upstream_client.write_event.called
+    assert written_event_types(writer) == ["synthesize-stopped"]
+
+
+@pytest.mark.asyncio
+async def test_handler_incremental_streaming_times_out_after_stop(
+    proxy_program_info, text_normalizer, audio_cache
+):
+    """Audio gaps only count once the client has sent all of its text."""
+    from wyoming.tts import SynthesizeChunk, SynthesizeStart, SynthesizeStop
+
+    from wyoming_tts_proxy.metrics import UPSTREAM_TIMEOUTS_TOTAL
+
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+
+    upstream_events = asyncio.Queue()
+    upstream_client = AsyncMock()
+    upstream_client.__aenter__.return_value = upstream_client
+    upstream_client.read_event.side_effect = upstream_events.get
+
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://upstream"],
+        text_normalizer=text_normalizer,
+        cache=audio_cache,
+        config=ProxyConfig(
+            incremental_streaming=True,
+            upstream_first_chunk_timeout=0.05,
+            upstream_chunk_timeout=0.05,
+        ),
+    )
+    timeouts = UPSTREAM_TIMEOUTS_TOTAL.labels(uri="tcp://upstream", stage="chunk")
+    before = timeouts._value.get()
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
+    ):
+        await handler.handle_event(SynthesizeStart().event())
+        await handler.handle_event(SynthesizeChunk(text="Hello there. ").event())
+        await upstream_events.put(AudioStart(rate=16000, width=2, channels=1).event())
+        await upstream_events.put(
+            AudioChunk(rate=16000, width=2, channels=1, audio=b"\0\0").event()
+        )
+        # The client is still generating text, this gap is not a timeout
+        await asyncio.sleep(0.1)
+        await handler.handle_event(SynthesizeChunk(text="How are you?").event())
+        # The upstream never finishes after SynthesizeStop
+        await asyncio.wait_for(
+            handler.handle_event(SynthesizeStop().event()), timeout=2
+        )
+
+    assert timeouts._value.get() == before + 1
+    assert written_event_types(writer) == [
+        "audio-start",
+        "audio-chunk",
+        "error",
+        "synthesize-stopped",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_handler_ignores_synthesize_during_stream(
+    proxy_program_info, text_normalizer, audio_cache, proxy_config
+):
+    from wyoming.tts import SynthesizeStart
+
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://upstream"],
+        text_normalizer=text_normalizer,
+        cache=audio_cache,
+        config=proxy_config,
+    )
+
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri") as from_uri:
+        await handler.handle_event(SynthesizeStart().event())
+        result = await handler.handle_event(Synthesize(text="hello").event())
+
+    assert result is True
+    assert not from_uri.called
+    assert written_event_types(writer) == []
+
+
+@pytest.mark.asyncio
+async def test_handler_reuses_pooled_connection(
+    proxy_program_info, text_normalizer, audio_cache, proxy_config
+):
+    from wyoming.tts import (
+        SynthesizeChunk,
+        SynthesizeStart,
+        SynthesizeStop,
+        SynthesizeStopped,
+    )
+
+    from wyoming_tts_proxy.pool import UpstreamPool
+
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+
+    upstream_client = AsyncMock()
+    upstream_client._reader = MagicMock()
+    upstream_client._reader.at_eof.return_value = False
+    upstream_client._writer = MagicMock()
+    upstream_client._writer.is_closing.return_value = False
+    upstream_client.read_event.side_effect = [
+        AudioStart(rate=16000, width=2, channels=1).event(),
+        AudioStop().event(),
+        SynthesizeStopped().event(),
+    ] * 2
+
+    pool = UpstreamPool(max_idle_per_uri=1)
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://upstream"],
+        text_normalizer=text_normalizer,
+        cache=audio_cache,
+        config=proxy_config,
+        pool=pool,
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
+    ) as from_uri:
+        for text in ("hello", "world"):
+            await handler.handle_event(SynthesizeStart().event())
+            await handler.handle_event(SynthesizeChunk(text=text).event())
+            await handler.handle_event(SynthesizeStop().event())
+
+    assert from_uri.call_count == 1
+    assert upstream_client.connect.call_count == 1
+    assert written_event_types(writer) == ["audio-start", "audio-stop"] * 2
+
+
+@pytest.mark.asyncio
+async def test_handler_describe_uses_cached_info(
+    proxy_program_info, text_normalizer, audio_cache, proxy_config
+):
+    from wyoming_tts_proxy.info import InfoCache
+    from wyoming_tts_proxy.pool import UpstreamPool
+
+    upstream_client = AsyncMock()
+    upstream_client.__aenter__.return_value = upstream_client
+    upstream_client.read_event.return_value = Info(
+        tts=[
+            TtsProgram(
+                name="upstream-tts",
+                description="desc",
+                attribution=Attribution(name="attr", url="url"),
+                installed=True,
+                version="1.0",
+                voices=[],
+            )
+        ]
+    ).event()
+    failing_client = AsyncMock()
+    failing_client.__aenter__.side_effect = Exception("Failed")
+
+    pool = UpstreamPool()
+    info_cache = InfoCache(["tcp://upstream"], pool, proxy_program_info)
+
+    def make_handler(writer):
+        return TTSProxyEventHandler(
+            AsyncMock(spec=asyncio.StreamReader),
+            writer,
+            proxy_program_info=proxy_program_info,
+            cli_args=MagicMock(stream_tts=False),
+            upstream_uris=["tcp://upstream"],
+            text_normalizer=text_normalizer,
+            cache=audio_cache,
+            config=proxy_config,
+            pool=pool,
+            info_cache=info_cache,
+        )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
+    ):
+        await make_handler(AsyncMock(spec=asyncio.StreamWriter)).handle_event(
+            Describe().event()
+        )
+
+    # Upstream is down now, but a later client still gets the upstream voices
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=failing_client
+    ):
+        await make_handler(writer).handle_event(Describe().event())
+
+    data = b"".join(c.args[0] for c in writer.write.call_args_list)
+    assert b"upstream-tts (via test-proxy)" in data
+    assert not failing_client.__aenter__.called
+
+
+@pytest.mark.asyncio
+async def test_handler_coalesces_identical_requests(
+    proxy_program_info, text_normalizer, audio_cache, proxy_config
+):
+    from wyoming.audio import AudioChunk
+
+    from wyoming_tts_proxy.pool import UpstreamPool
+    from wyoming_tts_proxy.synthesizer import UpstreamSynthesizer
+
+    upstream_events = asyncio.Queue()
+    upstream_client = AsyncMock()
+    upstream_client.__aenter__.return_value = upstream_client
+    upstream_client.read_event.side_effect = upstream_events.get
+
+    synthesizer = UpstreamSynthesizer(
+        ["tcp://upstream"], proxy_config, audio_cache, UpstreamPool()
+    )
+    writers = [AsyncMock(spec=asyncio.StreamWriter) for _ in range(3)]
+    handlers = [
+        TTSProxyEventHandler(
+            AsyncMock(spec=asyncio.StreamReader),
+            writer,
+            proxy_program_info=proxy_program_info,
+            cli_args=MagicMock(stream_tts=False),
+            upstream_uris=["tcp://upstream"],
+            text_normalizer=text_normalizer,
+            cache=audio_cache,
+            config=proxy_config,
+            synthesizer=synthesizer,
+        )
+        for writer in writers
+    ]
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=upstream_client
+    ) as from_uri:
+        first = asyncio.create_task(
+            handlers[0].handle_event(Synthesize(text="Attention please").event())
+        )
+        await upstream_events.put(AudioStart(rate=16000, width=2, channels=1).event())
+        await asyncio.sleep(0.01)
+
+        # Joins after the first event was received and replays it
+        others = [
+            asyncio.create_task(
+                handler.handle_event(Synthesize(text="Attention please").event())
+            )
+            for handler in handlers[1:]
+        ]
+        await asyncio.sleep(0.01)
+        await upstream_events.put(
+            AudioChunk(rate=16000, width=2, channels=1, audio=b"\0\0").event()
+        )
+        await upstream_events.put(AudioStop().event())
+        await asyncio.gather(first, *others)
+
+    assert from_uri.call_count == 1
+    assert upstream_client.write_event.call_count == 1
+    for writer in writers:
+        assert written_event_types(writer) == [
+            "audio-start",
+            "audio-chunk",
+            "audio-stop",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_handler_closes_truncated_cache_entry(
+    proxy_program_info, text_normalizer, tmp_path, proxy_config
+):
+    reader = AsyncMock(spec=asyncio.StreamReader)
+    writer = AsyncMock(spec=asyncio.StreamWriter)
+
+    cache = AudioCache(str(tmp_path / "cache"), enabled=True)
+    # An entry in the older Wyoming events format, cut off in the middle of
+    # the chunk payload
+    entry = io.BytesIO()
+    write_event(AudioStart(rate=16000, width=2, channels=1).event(), entry)
+    write_event(
+        AudioChunk(rate=16000, width=2, channels=1, audio=b"\x00" * 64).event(), entry
+    )
+    cache_file = cache.cache_dir / f"{cache.get_hash('hello', None)}.events"
+    cache_file.write_bytes(entry.getvalue()[:-10])
+
+    handler = TTSProxyEventHandler(
+        reader,
+        writer,
+        proxy_program_info=proxy_program_info,
+        cli_args=MagicMock(stream_tts=False),
+        upstream_uris=["tcp://upstream"],
+        text_normalizer=text_normalizer,
+        cache=cache,
+        config=proxy_config,
+    )
+
+    assert await handler.handle_event(Synthesize(text="hello").event())
+    assert written_event_types(writer) == ["audio-start", "audio-stop"]
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from wyoming_tts_proxy.health import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    UpstreamHealth,
+)
+from wyoming_tts_proxy.metrics import UPSTREAM_BREAKER_STATE
+
+URI = "tcp://upstream:10200"
+
+
+def breaker_gauge(uri):
+    return UPSTREAM_BREAKER_STATE.labels(uri=uri)._value.get()
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(URI, failure_threshold=3, cooldown=30.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker_gauge(URI) == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(URI, failure_threshold=2, cooldown=30.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe():
+    with patch("wyoming_tts_proxy.health.time.monotonic", return_value=100.0):
+        breaker = CircuitBreaker(URI, failure_threshold=1, cooldown=30.0)
+        breaker.record_failure()
+
+    with patch("wyoming_tts_proxy.health.time.monotonic", return_value=131.0):
+        # Only one probe is let through after the cooldown
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert breaker_gauge(URI) == 2
+        assert not breaker.allow()
+
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    with patch("wyoming_tts_proxy.health.time.monotonic", return_value=162.0):
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker_gauge(URI) == 0
+        assert breaker.allow()
+
+
+def test_released_probe_lets_next_request_through():
+    with patch("wyoming_tts_proxy.health.time.monotonic", return_value=100.0):
+        breaker = CircuitBreaker(URI, failure_threshold=1, cooldown=30.0)
+        breaker.record_failure()
+
+    with patch("wyoming_tts_proxy.health.time.monotonic", return_value=131.0):
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+
+def test_disabled_health_always_allows():
+    health = UpstreamHealth(failure_threshold=0)
+    for _ in range(10):
+        health.record_failure(URI)
+    assert health.allow(URI)
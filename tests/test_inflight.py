@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from wyoming.audio import AudioStart, AudioStop
+
+from wyoming_tts_proxy.inflight import InFlightTable
+
+
+async def collect(request):
+    return [event.type async for event in request.subscribe()]
+
+
+@pytest.mark.asyncio
+async def test_inflight_join_returns_running_request():
+    table = InFlightTable()
+    request, is_leader = table.join("key")
+    joined, joined_is_leader = table.join("key")
+
+    assert is_leader
+    assert not joined_is_leader
+    assert joined is request
+
+    table.remove(request)
+    _, is_leader = table.join("key")
+    assert is_leader
+
+
+@pytest.mark.asyncio
+async def test_inflight_disabled_never_joins():
+    table = InFlightTable(enabled=False)
+    first, _ = table.join("key")
+    second, is_leader = table.join("key")
+
+    assert is_leader
+    assert second is not first
+
+
+@pytest.mark.asyncio
+async def test_inflight_late_subscriber_replays_and_follows():
+    table = InFlightTable()
+    request, _ = table.join("key")
+
+    early = asyncio.create_task(collect(request))
+    request.publish(AudioStart(rate=16000, width=2, channels=1).event())
+    await asyncio.sleep(0)
+
+    late = asyncio.create_task(collect(request))
+    await asyncio.sleep(0)
+    request.publish(AudioStop().event())
+    request.finish()
+
+    assert await early == ["audio-start", "audio-stop"]
+    assert await late == ["audio-start", "audio-stop"]
+    assert not request.failed
+
+
+@pytest.mark.asyncio
+async def test_inflight_failure_is_visible_to_subscribers():
+    table = InFlightTable()
+    request, _ = table.join("key")
+    subscriber = asyncio.create_task(collect(request))
+    request.finish(failed=True)
+
+    assert await subscriber == []
+    assert request.failed
@@ -0,0 +1,124 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from wyoming.info import Attribution, Info, TtsProgram
+
+from wyoming_tts_proxy.info import InfoCache
+from wyoming_tts_proxy.pool import UpstreamPool
+
+PROXY_PROGRAM_INFO = {"name": "test-proxy"}
+
+
+def upstream_info(name="upstream-tts"):
+    return Info(
+        tts=[
+            TtsProgram(
+                name=name,
+                description="desc",
+                attribution=Attribution(name="attr", url="url"),
+                installed=True,
+                version="1.0",
+                voices=[],
+            )
+        ]
+    ).event()
+
+
+def make_client(*responses):
+    """Mock upstream client; callable responses are awaited when read."""
+    pending = iter(responses)
+
+    async def read_event():
+        response = next(pending)
+        return (await response()) if callable(response) else response
+
+    client = AsyncMock()
+    client.__aenter__.return_value = client
+    client.read_event.side_effect = read_event
+    return client
+
+
+@pytest.mark.asyncio
+async def test_info_cache_serves_cached_copy():
+    client = make_client(upstream_info())
+    info_cache = InfoCache(["tcp://upstream"], UpstreamPool(), PROXY_PROGRAM_INFO)
+
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=client):
+        first = await info_cache.get()
+        second = await info_cache.get()
+
+    assert first is second
+    assert first.tts[0].name == "upstream-tts (via test-proxy)"
+    assert client.write_event.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_info_cache_serves_stale_copy_while_refreshing():
+    refreshed = asyncio.Event()
+
+    async def slow_info():
+        await refreshed.wait()
+        return upstream_info("refreshed-tts")
+
+    client = make_client(upstream_info(), slow_info)
+    info_cache = InfoCache(
+        ["tcp://upstream"], UpstreamPool(), PROXY_PROGRAM_INFO, ttl=0.01
+    )
+
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=client):
+        await info_cache.get()
+        await asyncio.sleep(0.02)
+
+        # Upstream is stuck, but the stale copy comes back immediately
+        stale = await asyncio.wait_for(info_cache.get(), timeout=1)
+        assert stale.tts[0].name == "upstream-tts (via test-proxy)"
+
+        refreshed.set()
+        fresh = await info_cache.refresh()
+
+    assert fresh.tts[0].name == "refreshed-tts (via test-proxy)"
+    assert (await info_cache.get()) is fresh
+
+
+@pytest.mark.asyncio
+async def test_info_cache_keeps_copy_when_upstreams_fail():
+    client = make_client(upstream_info())
+    info_cache = InfoCache(["tcp://upstream"], UpstreamPool(), PROXY_PROGRAM_INFO)
+
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=client):
+        cached = await info_cache.get()
+
+    failing = AsyncMock()
+    failing.__aenter__.side_effect = Exception("Failed")
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=failing):
+        assert (await info_cache.refresh()) is cached
+
+
+@pytest.mark.asyncio
+async def test_info_cache_disabled_queries_every_time():
+    client = make_client(upstream_info(), upstream_info())
+    info_cache = InfoCache(
+        ["tcp://upstream"], UpstreamPool(), PROXY_PROGRAM_INFO, ttl=0
+    )
+
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=client):
+        await info_cache.get()
+        await info_cache.get()
+
+    assert client.write_event.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_info_cache_background_refresh():
+    client = make_client(*[upstream_info() for _ in range(10)])
+    info_cache = InfoCache(
+        ["tcp://upstream"], UpstreamPool(), PROXY_PROGRAM_INFO, ttl=0.01
+    )
+
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=client):
+        info_cache.start()
+        await asyncio.sleep(0.05)
+        await info_cache.stop()
+
+    assert client.write_event.call_count >= 2
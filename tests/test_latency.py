@@ -0,0 +1,33 @@
+from wyoming_tts_proxy.latency import LatencyWindow
+
+
+def test_percentile_needs_min_samples():
+    window = LatencyWindow(min_samples=3)
+    window.record(0.1)
+    window.record(0.2)
+    assert window.percentile(95) is None
+
+    window.record(0.3)
+    assert window.percentile(95) == 0.3
+    assert window.percentile(50) == 0.2
+
+
+def test_window_keeps_recent_samples():
+    window = LatencyWindow(size=10, min_samples=1)
+    for i in range(100):
+        window.record(float(i))
+
+    assert len(window) == 10
+    assert window.percentile(0) == 90.0
+    assert window.percentile(100) == 99.0
+
+
+def test_ewma():
+    window = LatencyWindow(alpha=0.5)
+    assert window.ewma is None
+
+    window.record(1.0)
+    assert window.ewma == 1.0
+
+    window.record(0.0)
+    assert window.ewma == 0.5
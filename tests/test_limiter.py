@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from wyoming_tts_proxy.limiter import UpstreamLimiter
+
+URI = "tcp://upstream:10200"
+
+
+@pytest.mark.asyncio
+async def test_disabled_limiter_grants_everything():
+    limiter = UpstreamLimiter()
+    slots = [limiter.reserve(URI) for _ in range(10)]
+    for slot in slots:
+        await slot.acquire()
+        slot.release()
+
+
+@pytest.mark.asyncio
+async def test_queue_is_bounded():
+    limiter = UpstreamLimiter(max_concurrent=1, max_queue=1)
+    running = limiter.reserve(URI)
+    queued = limiter.reserve(URI)
+    assert running is not None
+    assert queued is not None
+    assert limiter.reserve(URI) is None
+
+    await running.acquire()
+    waiter = asyncio.create_task(queued.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    # Releasing the running slot hands it to the queued request
+    running.release()
+    await asyncio.wait_for(waiter, timeout=1)
+    assert limiter.reserve(URI) is not None
+
+
+@pytest.mark.asyncio
+async def test_released_waiter_leaves_queue():
+    limiter = UpstreamLimiter(max_concurrent=1, max_queue=1)
+    running = limiter.reserve(URI)
+    queued = limiter.reserve(URI)
+
+    queued.release()
+    queued.release()
+    next_in_line = limiter.reserve(URI)
+    assert next_in_line is not None
+
+    running.release()
+    await asyncio.wait_for(next_in_line.acquire(), timeout=1)
+    next_in_line.release()
+    assert limiter.reserve(URI) is not None
+
+
+@pytest.mark.asyncio
+async def test_available_counts_free_and_queued_slots():
+    assert UpstreamLimiter().available(URI) is None
+
+    limiter = UpstreamLimiter(max_concurrent=2, max_queue=1)
+    assert limiter.available(URI) == 3
+    slots = [limiter.reserve(URI) for _ in range(3)]
+    assert limiter.available(URI) == 0
+
+    slots[2].release()
+    assert limiter.available(URI) == 1
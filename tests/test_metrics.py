@@ -1,3 +1,7 @@
+import asyncio
+import time
+
+import pytest
 from prometheus_client import REGISTRY
 from wyoming_tts_proxy.metrics import (
     REQUESTS_TOTAL,
@@ -33,3 +37,21 @@ def test_health_endpoint():
     response = urllib.request.urlopen(f"http://127.0.0.1:{port}/health")
     assert response.getcode() == 200
     assert response.read() == b"OK"
+
+
+@pytest.mark.asyncio
+async def test_event_loop_lag_is_recorded():
+    from wyoming_tts_proxy.metrics import EVENT_LOOP_LAG, monitor_event_loop_lag
+
+    def lag_sum():
+        return EVENT_LOOP_LAG._sum.get()
+
+    before = lag_sum()
+    monitor = asyncio.create_task(monitor_event_loop_lag(0.01))
+    await asyncio.sleep(0)
+    # Block the loop
+    time.sleep(0.1)
+    await asyncio.sleep(0.02)
+    monitor.cancel()
+
+    assert lag_sum() - before >= 0.05
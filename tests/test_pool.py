@@ -0,0 +1,136 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from wyoming.audio import AudioStart, AudioStop
+from wyoming.event import async_read_event, async_write_event
+from wyoming.tts import Synthesize
+
+from wyoming_tts_proxy.metrics import UPSTREAM_POOL_HITS_TOTAL
+from wyoming_tts_proxy.pool import UpstreamPool
+
+
+class FakeUpstream:
+    """Minimal TTS server answering every Synthesize with AudioStart/AudioStop."""
+
+    def __init__(self, close_after_response: bool = False):
+        self.close_after_response = close_after_response
+        self.connections = 0
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *args):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def uri(self) -> str:
+        port = self.server.sockets[0].getsockname()[1]
+        return f"tcp://127.0.0.1:{port}"
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                event = await async_read_event(reader)
+                if event is None:
+                    break
+                await async_write_event(
+                    AudioStart(rate=16000, width=2, channels=1).event(), writer
+                )
+                await async_write_event(AudioStop().event(), writer)
+                if self.close_after_response:
+                    break
+        finally:
+            writer.close()
+
+
+async def synthesize(pool, uri):
+    async with pool.connection(uri) as client:
+        await client.write_event(Synthesize(text="hello").event())
+        assert (await client.read_event()).type == "audio-start"
+        assert (await client.read_event()).type == "audio-stop"
+
+
+@pytest.mark.asyncio
+async def test_pool_disabled_opens_connection_per_request():
+    pool = UpstreamPool(max_idle_per_uri=0)
+    assert not pool.enabled
+
+    client = AsyncMock()
+    client.__aenter__.return_value = client
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=client):
+        for _ in range(2):
+            async with pool.connection("tcp://upstream:1") as upstream_client:
+                assert upstream_client is client
+
+    assert client.__aenter__.call_count == 2
+    assert client.__aexit__.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connection():
+    pool = UpstreamPool(max_idle_per_uri=2)
+    async with FakeUpstream() as upstream:
+        hits_before = UPSTREAM_POOL_HITS_TOTAL.labels(uri=upstream.uri)._value.get()
+        for _ in range(3):
+            await synthesize(pool, upstream.uri)
+
+        assert upstream.connections == 1
+        hits_after = UPSTREAM_POOL_HITS_TOTAL.labels(uri=upstream.uri)._value.get()
+        assert hits_after == hits_before + 2
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_discard_closes_connection():
+    pool = UpstreamPool(max_idle_per_uri=2)
+    async with FakeUpstream() as upstream:
+        async with pool.connection(upstream.uri) as client:
+            pool.discard(client)
+        await synthesize(pool, upstream.uri)
+
+        assert upstream.connections == 2
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_drops_connection_closed_by_peer():
+    pool = UpstreamPool(max_idle_per_uri=2)
+    async with FakeUpstream(close_after_response=True) as upstream:
+        await synthesize(pool, upstream.uri)
+        await asyncio.sleep(0.05)  # Let the EOF reach the idle connection
+        await synthesize(pool, upstream.uri)
+
+        assert upstream.connections == 2
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_drops_expired_connection():
+    pool = UpstreamPool(max_idle_per_uri=2, idle_timeout=0)
+    async with FakeUpstream() as upstream:
+        await synthesize(pool, upstream.uri)
+        await asyncio.sleep(0.01)
+        await synthesize(pool, upstream.uri)
+
+        assert upstream.connections == 2
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_prewarm():
+    pool = UpstreamPool(max_idle_per_uri=2)
+    async with FakeUpstream() as upstream:
+        pool.prewarm(upstream.uri)
+        pool.prewarm(upstream.uri)  # Already in progress
+        hits_before = UPSTREAM_POOL_HITS_TOTAL.labels(uri=upstream.uri)._value.get()
+        await synthesize(pool, upstream.uri)
+
+        assert upstream.connections == 1
+        hits_after = UPSTREAM_POOL_HITS_TOTAL.labels(uri=upstream.uri)._value.get()
+        assert hits_after == hits_before + 1
+        await pool.close()
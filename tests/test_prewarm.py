@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import pytest
+
+from helpers import audio_events, make_client
+from wyoming_tts_proxy.cache import AudioCache
+from wyoming_tts_proxy.config import ProxyConfig
+from wyoming_tts_proxy.metrics import PREWARM_PHRASES_TOTAL
+from wyoming_tts_proxy.normalizer import TextNormalizer
+from wyoming_tts_proxy.pool import UpstreamPool
+from wyoming_tts_proxy.prewarm import (
+    CachePrewarmer,
+    PrewarmPhrase,
+    load_prewarm_file,
+)
+from wyoming_tts_proxy.synthesizer import UpstreamSynthesizer
+
+UPSTREAM_URIS = ["tcp://primary:10200", "tcp://secondary:10200"]
+
+
+def prewarmed(result):
+    return PREWARM_PHRASES_TOTAL.labels(result=result)._value.get()
+
+
+def make_prewarmer(tmp_path, phrases, **cache_options):
+    config = ProxyConfig()
+    cache = AudioCache(str(tmp_path / "cache"), **cache_options)
+    synthesizer = UpstreamSynthesizer(UPSTREAM_URIS, config, cache, UpstreamPool())
+    return CachePrewarmer(phrases, synthesizer, cache, TextNormalizer(config), rate=0)
+
+
+def test_load_prewarm_file(tmp_path):
+    prewarm_file = tmp_path / "prewarm.yaml"
+    prewarm_file.write_text(
+        "- Timer set\n- text: Done\n  voice: en_US-lessac\n", encoding="utf-8"
+    )
+
+    assert load_prewarm_file(str(prewarm_file)) == [
+        PrewarmPhrase("Timer set"),
+        PrewarmPhrase("Done", "en_US-lessac"),
+    ]
+
+    prewarm_file.write_text("- voice: en_US-lessac\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_prewarm_file(str(prewarm_file))
+
+
+@pytest.mark.asyncio
+async def test_prewarm_synthesizes_missing_phrases(tmp_path):
+    prewarmer = make_prewarmer(
+        tmp_path,
+        [PrewarmPhrase("Timer  set"), PrewarmPhrase("Done")],
+        # Prewarmed phrases are cached even though nobody requested them
+        admit_after=2,
+    )
+    cache = prewarmer.cache
+    cache.allow("Done", None)
+    cache.set("Done", None, audio_events(b"done"))
+    synthesized = prewarmed("synthesized")
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_client(*audio_events(b"timer")),
+    ) as from_uri:
+        await prewarmer.run()
+        await cache.flush()
+
+    # Only the phrase that was not cached yet went upstream, normalized
+    assert from_uri.call_count == 1
+    assert prewarmed("synthesized") == synthesized + 1
+    assert cache.get("Timer set", None)[1].payload == b"timer"
+
+
+@pytest.mark.asyncio
+async def test_prewarm_skips_failed_phrases(tmp_path):
+    prewarmer = make_prewarmer(
+        tmp_path, [PrewarmPhrase("Timer set"), PrewarmPhrase("Done")]
+    )
+    failed = prewarmed("failed")
+    clients = iter(
+        [make_client(), make_client()]  # both upstreams close the connection
+        + [make_client(*audio_events(b"done"))]
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: next(clients),
+    ):
+        await prewarmer.run()
+        await prewarmer.cache.flush()
+
+    assert prewarmed("failed") == failed + 1
+    assert not await prewarmer.cache.contains("Timer set", None)
+    assert await prewarmer.cache.contains("Done", None)
+
+
+@pytest.mark.asyncio
+async def test_prewarm_counts_phrases_not_admitted(tmp_path):
+    prewarmer = make_prewarmer(
+        tmp_path, [PrewarmPhrase("Timer set")], max_entry_size_mb=0.000001
+    )
+    synthesized = prewarmed("synthesized")
+    not_admitted = prewarmed("not_admitted")
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_client(*audio_events(b"timer")),
+    ):
+        await prewarmer.run()
+
+    # Too large to be cached, so it was not prewarmed
+    assert prewarmed("not_admitted") == not_admitted + 1
+    assert prewarmed("synthesized") == synthesized
+    assert not await prewarmer.cache.contains("Timer set", None)
@@ -0,0 +1,59 @@
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+
+from wyoming_tts_proxy.reframe import AudioReframer
+
+# 10 ms of 16 kHz 16-bit mono audio
+FRAME_BYTES = 320
+
+
+def chunk(audio, rate=16000):
+    return AudioChunk(rate=rate, width=2, channels=1, audio=audio).event()
+
+
+def chunk_sizes(events):
+    return [len(e.payload) for e in events if AudioChunk.is_type(e.type)]
+
+
+def test_disabled_passes_events_through():
+    reframer = AudioReframer(0)
+    event = chunk(b"\x00" * 10)
+    assert reframer.process(event) == [event]
+
+
+def test_small_chunks_are_coalesced():
+    events = [AudioStart(rate=16000, width=2, channels=1).event()]
+    events += [chunk(bytes([i]) * 100) for i in range(7)]
+    events.append(AudioStop().event())
+
+    reframer = AudioReframer(10)
+    framed = [e for event in events for e in reframer.process(event)]
+
+    assert framed[0].type == "audio-start"
+    assert framed[-1].type == "audio-stop"
+    assert chunk_sizes(framed) == [FRAME_BYTES, FRAME_BYTES, 60]
+    assert b"".join(e.payload for e in framed[1:-1]) == b"".join(
+        e.payload for e in events[1:-1]
+    )
+
+
+def test_large_chunk_is_split_without_copies():
+    audio = bytes(range(256)) * 5
+    framed = AudioReframer(10).process(chunk(audio))
+
+    assert chunk_sizes(framed) == [FRAME_BYTES] * 4
+    assert all(isinstance(e.payload, memoryview) for e in framed)
+    assert b"".join(bytes(e.payload) for e in framed) == audio[: FRAME_BYTES * 4]
+
+
+def test_frame_sized_chunk_is_passed_through():
+    event = chunk(b"\x01" * FRAME_BYTES)
+    assert AudioReframer(10).process(event) == [event]
+
+
+def test_format_change_flushes_buffer():
+    reframer = AudioReframer(10)
+    assert reframer.process(chunk(b"\x00" * 100)) == []
+
+    framed = reframer.process(chunk(b"\x00" * 100, rate=22050))
+    assert chunk_sizes(framed) == [100]
+    assert AudioChunk.from_event(framed[0]).rate == 16000
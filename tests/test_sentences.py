@@ -0,0 +1,41 @@
+from wyoming_tts_proxy.sentences import SentenceBuffer, split_sentences
+
+
+def test_split_sentences():
+    assert split_sentences("Hello there. How are you? I'm fine!") == [
+        "Hello there.",
+        "How are you?",
+        "I'm fine!",
+    ]
+
+
+def test_split_sentences_keeps_decimals():
+    assert split_sentences("Pi is 3.14 today.") == ["Pi is 3.14 today."]
+
+
+def test_split_sentences_newlines_and_quotes():
+    assert split_sentences('He said "stop." Then left\nNew line') == [
+        'He said "stop."',
+        "Then left",
+        "New line",
+    ]
+
+
+def test_split_sentences_empty():
+    assert split_sentences("") == []
+    assert split_sentences("   ") == []
+
+
+def test_sentence_buffer_waits_for_whitespace():
+    buffer = SentenceBuffer()
+    assert buffer.add("The value is 3.") == []
+    assert buffer.add("14 exactly. Next") == ["The value is 3.14 exactly."]
+    assert buffer.add(" part") == []
+    assert buffer.flush() == "Next part"
+    assert buffer.flush() == ""
+
+
+def test_sentence_buffer_ignores_boundaries_in_code_blocks():
+    buffer = SentenceBuffer()
+    assert buffer.add("Look:\n```\nprint('a. b')\n") == ["Look:"]
+    assert buffer.add("```\nDone. ") == ["```\nprint('a. b')\n```", "Done."]
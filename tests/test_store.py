@@ -0,0 +1,83 @@
+import hashlib
+
+from wyoming_tts_proxy.store import INDEX_FILE, SegmentStore
+
+
+def key(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def read(store, text):
+    with store.open(key(text)) as data:
+        return None if data is None else bytes(data)
+
+
+def test_write_and_read(tmp_path):
+    store = SegmentStore(tmp_path)
+    store.write(key("a"), b"first")
+    store.write(key("b"), b"second")
+
+    assert read(store, "a") == b"first"
+    assert read(store, "b") == b"second"
+    assert read(store, "c") is None
+
+    # Rewriting an entry replaces it
+    store.write(key("a"), b"third")
+    assert read(store, "a") == b"third"
+
+    store.remove(key("b"))
+    assert not store.contains(key("b"))
+
+
+def test_index_is_persisted_and_tail_recovered(tmp_path):
+    store = SegmentStore(tmp_path)
+    store.write(key("a"), b"saved")
+    store.flush()
+    assert (tmp_path / INDEX_FILE).exists()
+    # Written after the index was saved
+    store.write(key("b"), b"unsaved")
+
+    reopened = SegmentStore(tmp_path)
+
+    assert read(reopened, "a") == b"saved"
+    assert read(reopened, "b") == b"unsaved"
+    assert {entry.key for entry in reopened.scan()} == {key("a"), key("b")}
+
+
+def test_torn_write_is_truncated(tmp_path):
+    store = SegmentStore(tmp_path)
+    store.write(key("a"), b"complete")
+    store.flush()
+    store.write(key("b"), b"torn")
+    segment = next(tmp_path.glob("segment-*.pack"))
+    segment.write_bytes(segment.read_bytes()[:-2])
+
+    reopened = SegmentStore(tmp_path)
+
+    assert read(reopened, "a") == b"complete"
+    assert read(reopened, "b") is None
+    reopened.write(key("c"), b"after")
+    assert read(SegmentStore(tmp_path), "c") == b"after"
+
+
+def test_segments_roll_and_compact(tmp_path):
+    store = SegmentStore(tmp_path, segment_size=100)
+    for i in range(6):
+        store.write(key(str(i)), bytes([i]) * 40)
+    segments = sorted(tmp_path.glob("segment-*.pack"))
+    assert len(segments) == 6
+
+    for i in range(5):
+        if i != 2:
+            store.remove(key(str(i)))
+    assert store.needs_compaction()
+
+    store.compact()
+
+    assert not store.needs_compaction()
+    assert read(store, "2") == bytes([2]) * 40
+    assert read(store, "5") == bytes([5]) * 40
+    assert len(list(tmp_path.glob("segment-*.pack"))) <= 2
+
+    reopened = SegmentStore(tmp_path)
+    assert {entry.key for entry in reopened.scan()} == {key("2"), key("5")}
@@ -0,0 +1,627 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from wyoming.audio import AudioChunk, AudioStart
+
+from helpers import (
+    audio_chunk,
+    audio_events,
+    audio_start,
+    collect,
+    make_client,
+    make_echo_client,
+)
+from wyoming_tts_proxy.cache import AudioCache
+from wyoming_tts_proxy.config import ProxyConfig
+from wyoming_tts_proxy.health import UpstreamHealth
+from wyoming_tts_proxy.metrics import (
+    HEDGED_REQUESTS_TOTAL,
+    SENTENCE_CACHE_MISSES_TOTAL,
+    UPSTREAM_TIMEOUTS_TOTAL,
+)
+from wyoming_tts_proxy.pool import UpstreamPool
+from wyoming_tts_proxy.synthesizer import UpstreamSynthesizer
+
+UPSTREAM_URIS = ["tcp://primary:10200", "tcp://secondary:10200"]
+
+
+def make_synthesizer(tmp_path, **config):
+    return UpstreamSynthesizer(
+        UPSTREAM_URIS,
+        ProxyConfig(**config),
+        AudioCache(str(tmp_path / "cache"), enabled=False),
+        UpstreamPool(),
+    )
+
+
+def hedged_count(winner):
+    return HEDGED_REQUESTS_TOTAL.labels(winner=winner)._value.get()
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_over_slow_primary(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, hedge_requests=True, hedge_delay=0.05)
+    slow_client = make_client(*audio_events(b"slow"), delay=10)
+    fast_client = make_client(*audio_events(b"fast"))
+    before = hedged_count("hedge")
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[slow_client, fast_client],
+    ):
+        request = synthesizer.synthesize("Hello", None, False)
+        events = await asyncio.wait_for(collect(request), timeout=2)
+
+    assert not request.failed
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [b"fast"]
+    assert hedged_count("hedge") == before + 1
+    # The losing attempt was cancelled and its connection closed
+    assert slow_client.__aexit__.called
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_when_primary_is_fast(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, hedge_requests=True, hedge_delay=1.0)
+    client = make_client(*audio_events(b"primary"))
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=client
+    ) as from_uri:
+        request = synthesizer.synthesize("Hello", None, False)
+        events = await collect(request)
+
+    assert from_uri.call_count == 1
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [b"primary"]
+    assert len(synthesizer.latency[UPSTREAM_URIS[0]]) == 1
+
+
+@pytest.mark.asyncio
+async def test_failover_without_hedging_is_sequential(tmp_path):
+    synthesizer = make_synthesizer(tmp_path)
+    failing_client = AsyncMock()
+    failing_client.__aenter__.side_effect = ConnectionError("down")
+    client = make_client(*audio_events(b"secondary"))
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[failing_client, client],
+    ):
+        request = synthesizer.synthesize("Hello", None, False)
+        events = await collect(request)
+
+    assert not request.failed
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [b"secondary"]
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_breaker_skips_upstream(tmp_path):
+    health = UpstreamHealth(failure_threshold=1, cooldown=30.0)
+    synthesizer = UpstreamSynthesizer(
+        UPSTREAM_URIS,
+        ProxyConfig(),
+        AudioCache(str(tmp_path / "cache"), enabled=False),
+        UpstreamPool(),
+        health,
+    )
+    failing_client = AsyncMock()
+    failing_client.__aenter__.side_effect = ConnectionError("down")
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[
+            failing_client,
+            make_client(*audio_events(b"first")),
+            make_client(*audio_events(b"second")),
+        ],
+    ) as from_uri:
+        await collect(synthesizer.synthesize("Hello", None, False))
+        request = synthesizer.synthesize("Hello again", None, False)
+        await collect(request)
+
+    assert not request.failed
+    # The primary is not retried while its breaker is open
+    assert [c.args[0] for c in from_uri.call_args_list] == [
+        UPSTREAM_URIS[0],
+        UPSTREAM_URIS[1],
+        UPSTREAM_URIS[1],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_text_is_not_split_by_default(tmp_path):
+    synthesizer = make_synthesizer(tmp_path)
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_echo_client(),
+    ) as from_uri:
+        request = synthesizer.synthesize("One. Two.", None, False)
+        events = await collect(request)
+
+    # Several upstreams alone do not turn one request into one per sentence
+    assert from_uri.call_count == 1
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [b"One. Two."]
+
+
+@pytest.mark.asyncio
+async def test_ssml_is_not_split(tmp_path):
+    synthesizer = make_synthesizer(
+        tmp_path, split_sentences=True, ssml_template="<speak>{{text}}</speak>"
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_echo_client(),
+    ) as from_uri:
+        await collect(synthesizer.synthesize("One. Two.", None, False))
+
+    assert from_uri.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_mid_stream_failure_is_not_replayed_without_split_sentences(tmp_path):
+    synthesizer = make_synthesizer(tmp_path)
+    # The primary dies after the first chunk
+    dying_client = make_client(audio_start(), audio_chunk(b"abcd"))
+    client = make_client(*audio_events(b"abcdef"))
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[dying_client, client],
+    ) as from_uri:
+        request = synthesizer.synthesize("Hello", None, False)
+        events = await collect(request)
+
+    # Replaying the text from the start would play the first chunk twice
+    assert request.failed
+    assert from_uri.call_count == 1
+    assert [e.type for e in events] == ["audio-start", "audio-chunk", "audio-stop"]
+    assert events[1].payload == b"abcd"
+
+
+@pytest.mark.asyncio
+async def test_split_sentences_resumes_from_interrupted_sentence(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, split_sentences=True)
+    first_sentence = make_client(*audio_events(b"one"))
+    dying_client = make_client(audio_start(), audio_chunk(b"tw"))
+    second_sentence = make_client(*audio_events(b"two"))
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[first_sentence, dying_client, second_sentence],
+    ) as from_uri:
+        request = synthesizer.synthesize("First one. Second two.", None, False)
+        events = await collect(request)
+
+    assert not request.failed
+    # Only the interrupted sentence went to the next upstream
+    assert [c.args[0] for c in from_uri.call_args_list] == [
+        UPSTREAM_URIS[0],
+        UPSTREAM_URIS[0],
+        UPSTREAM_URIS[1],
+    ]
+    synthesized = [
+        c.args[0].data["text"] for c in second_sentence.write_event.call_args_list
+    ]
+    assert synthesized == ["Second two."]
+
+    # The audio of the interrupted attempt was never sent
+    assert [e.type for e in events] == [
+        "audio-start",
+        "audio-chunk",
+        "audio-chunk",
+        "audio-stop",
+    ]
+    assert [e.payload for e in events[1:3]] == [b"one", b"two"]
+
+
+@pytest.mark.asyncio
+async def test_failover_caches_response_without_interrupted_audio(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    synthesizer = UpstreamSynthesizer(
+        UPSTREAM_URIS, ProxyConfig(split_sentences=True), cache, UpstreamPool()
+    )
+    first_sentence = make_client(*audio_events(b"one"))
+    dying_client = make_client(audio_start(), audio_chunk(b"tw"))
+    second_sentence = make_client(*audio_events(b"two"))
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[first_sentence, dying_client, second_sentence],
+    ):
+        request = synthesizer.synthesize("First one. Second two.", None, False)
+        await collect(request)
+        await cache.flush()
+
+    assert not request.failed
+    cached = cache.get("First one. Second two.", None)
+    assert b"".join(e.payload for e in cached if AudioChunk.is_type(e.type)) == (
+        b"onetwo"
+    )
+
+
+@pytest.mark.asyncio
+async def test_failover_does_not_splice_different_audio_format(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, split_sentences=True)
+    first_sentence = make_client(*audio_events(b"\0" * 4410, rate=22050))
+    dying_client = make_client(audio_start(rate=22050))
+    second_sentence = make_client(*audio_events(b"\0" * 4800, rate=24000))
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[first_sentence, dying_client, second_sentence],
+    ):
+        request = synthesizer.synthesize("First one. Second two.", None, False)
+        events = await collect(request)
+
+    assert request.failed
+    assert [e.type for e in events] == ["audio-start", "audio-chunk", "audio-stop"]
+    assert AudioStart.from_event(events[0]).rate == 22050
+
+
+@pytest.mark.asyncio
+async def test_failover_splices_converted_audio_format(tmp_path):
+    pytest.importorskip("numpy")
+    synthesizer = make_synthesizer(tmp_path, split_sentences=True, audio_rate=16000)
+    first_sentence = make_client(*audio_events(b"\0" * 4410, rate=22050))
+    dying_client = make_client(audio_start(rate=22050))
+    second_sentence = make_client(*audio_events(b"\0" * 4800, rate=24000))
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[first_sentence, dying_client, second_sentence],
+    ):
+        request = synthesizer.synthesize("First one. Second two.", None, False)
+        events = await collect(request)
+
+    assert not request.failed
+    assert [e.type for e in events] == [
+        "audio-start",
+        "audio-chunk",
+        "audio-chunk",
+        "audio-stop",
+    ]
+    assert {AudioChunk.from_event(e).rate for e in events[1:3]} == {16000}
+
+
+@pytest.mark.asyncio
+async def test_split_sentences_closes_audio_when_all_upstreams_fail(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, split_sentences=True)
+    failing_client = AsyncMock()
+    failing_client.__aenter__.side_effect = ConnectionError("down")
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[
+            make_client(*audio_events(b"one")),
+            failing_client,
+            failing_client,
+        ],
+    ):
+        request = synthesizer.synthesize("First one. Second two.", None, False)
+        events = await collect(request)
+
+    assert request.failed
+    assert [e.type for e in events] == ["audio-start", "audio-chunk", "audio-stop"]
+
+
+@pytest.mark.asyncio
+async def test_full_upstream_spills_to_next(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, upstream_max_concurrent=1)
+    slow_client = make_client(*audio_events(b"slow"), delay=0.1)
+    client = make_client(*audio_events(b"spilled"))
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[slow_client, client],
+    ) as from_uri:
+        first = synthesizer.synthesize("Hello", None, False)
+        second = synthesizer.synthesize("Goodbye", None, False)
+        await collect(first)
+        events = await collect(second)
+
+    assert [c.args[0] for c in from_uri.call_args_list] == UPSTREAM_URIS
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [b"spilled"]
+
+
+@pytest.mark.asyncio
+async def test_all_upstreams_full_fails_fast(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, upstream_max_concurrent=1)
+    clients = [
+        make_client(*audio_events(b"a"), delay=0.1),
+        make_client(*audio_events(b"b"), delay=0.1),
+    ]
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri", side_effect=clients
+    ) as from_uri:
+        synthesizer.synthesize("One", None, False)
+        synthesizer.synthesize("Two", None, False)
+        rejected = synthesizer.synthesize("Three", None, False)
+        await asyncio.wait_for(collect(rejected), timeout=0.05)
+        await asyncio.gather(*synthesizer._tasks)
+
+    assert rejected.failed
+    assert from_uri.call_count == 2
+
+
+def timeout_count(uri, stage):
+    return UPSTREAM_TIMEOUTS_TOTAL.labels(uri=uri, stage=stage)._value.get()
+
+
+@pytest.mark.asyncio
+async def test_first_chunk_timeout_fails_over(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, upstream_first_chunk_timeout=0.05)
+    wedged_client = make_client(*audio_events(b"late"), delay=10)
+    client = make_client(*audio_events(b"on time"))
+    before = timeout_count(UPSTREAM_URIS[0], "first_chunk")
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[wedged_client, client],
+    ):
+        request = synthesizer.synthesize("Hello", None, False)
+        events = await asyncio.wait_for(collect(request), timeout=2)
+
+    assert not request.failed
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [b"on time"]
+    assert timeout_count(UPSTREAM_URIS[0], "first_chunk") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_chunk_timeout_after_first_chunk(tmp_path):
+    synthesizer = make_synthesizer(
+        tmp_path, split_sentences=True, upstream_chunk_timeout=0.05
+    )
+    responses = [audio_start(), audio_chunk(b"ab")]
+
+    async def read_event():
+        if responses:
+            return responses.pop(0)
+        await asyncio.sleep(10)
+
+    stalling_client = make_client()
+    stalling_client.read_event.side_effect = read_event
+    client = make_client(*audio_events(b"abcd"))
+    before = timeout_count(UPSTREAM_URIS[0], "chunk")
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=[stalling_client, client],
+    ):
+        request = synthesizer.synthesize("Hello", None, False)
+        events = await asyncio.wait_for(collect(request), timeout=2)
+
+    assert not request.failed
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [b"abcd"]
+    assert timeout_count(UPSTREAM_URIS[0], "chunk") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_request_deadline_spans_failover(tmp_path):
+    synthesizer = make_synthesizer(
+        tmp_path, upstream_first_chunk_timeout=0.1, request_timeout=0.15
+    )
+    clients = [
+        make_client(*audio_events(b"a"), delay=10),
+        make_client(*audio_events(b"b"), delay=10),
+    ]
+    before = timeout_count(UPSTREAM_URIS[1], "request")
+
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", side_effect=clients):
+        request = synthesizer.synthesize("Hello", None, False)
+        await asyncio.wait_for(collect(request), timeout=2)
+
+    assert request.failed
+    # The second upstream only got what was left of the request deadline
+    assert timeout_count(UPSTREAM_URIS[1], "request") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_parallel_sentences_are_emitted_in_order(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, split_sentences=True, parallel_sentences=3)
+    # Later sentences finish first
+    delays = {"One.": 0.2, "Two.": 0.1, "Three.": 0.0}
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_echo_client(delays),
+    ) as from_uri:
+        start = asyncio.get_running_loop().time()
+        request = synthesizer.synthesize("One. Two. Three.", None, False)
+        events = await collect(request)
+        elapsed = asyncio.get_running_loop().time() - start
+
+    assert not request.failed
+    assert from_uri.call_count == 3
+    assert [e.type for e in events] == [
+        "audio-start",
+        "audio-chunk",
+        "audio-chunk",
+        "audio-chunk",
+        "audio-stop",
+    ]
+    assert [e.payload for e in events[1:4]] == [b"One.", b"Two.", b"Three."]
+    # Synthesized concurrently rather than one after another
+    assert elapsed < 0.3
+
+
+@pytest.mark.asyncio
+async def test_sentences_of_a_request_stay_on_one_upstream(tmp_path):
+    synthesizer = make_synthesizer(
+        tmp_path,
+        split_sentences=True,
+        parallel_sentences=3,
+        load_balancing="round_robin",
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_echo_client(),
+    ) as from_uri:
+        await collect(synthesizer.synthesize("One. Two. Three.", None, False))
+        await collect(synthesizer.synthesize("Four. Five.", None, False))
+
+    # The policy picks the upstream per request, not per sentence
+    assert [c.args[0] for c in from_uri.call_args_list] == [UPSTREAM_URIS[0]] * 3 + [
+        UPSTREAM_URIS[1]
+    ] * 2
+
+
+@pytest.mark.asyncio
+async def test_sentences_follow_failover_to_next_upstream(tmp_path):
+    synthesizer = make_synthesizer(tmp_path, split_sentences=True)
+    dying_client = make_client(audio_start(), audio_chunk(b"tw"))
+    clients = iter(
+        [make_echo_client(), dying_client, make_echo_client(), make_echo_client()]
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: next(clients),
+    ) as from_uri:
+        request = synthesizer.synthesize("One. Two. Three.", None, False)
+        events = await collect(request)
+
+    assert not request.failed
+    # The sentence after the failover does not go back to the failed upstream
+    assert [c.args[0] for c in from_uri.call_args_list] == [
+        UPSTREAM_URIS[0],
+        UPSTREAM_URIS[0],
+        UPSTREAM_URIS[1],
+        UPSTREAM_URIS[1],
+    ]
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [
+        b"One.",
+        b"Two.",
+        b"Three.",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_parallel_sentences_stay_within_concurrency_limit(tmp_path):
+    synthesizer = UpstreamSynthesizer(
+        UPSTREAM_URIS[:1],
+        ProxyConfig(
+            split_sentences=True,
+            parallel_sentences=2,
+            upstream_max_concurrent=1,
+            upstream_queue_size=0,
+        ),
+        AudioCache(str(tmp_path / "cache"), enabled=False),
+        UpstreamPool(),
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_echo_client({"One.": 0.05}),
+    ) as from_uri:
+        request = synthesizer.synthesize("One. Two.", None, False)
+        events = await collect(request)
+
+    # The second sentence waits for the first instead of being rejected
+    assert not request.failed
+    assert from_uri.call_count == 2
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [
+        b"One.",
+        b"Two.",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sentence_cache_only_synthesizes_missing_sentences(tmp_path):
+    synthesizer = UpstreamSynthesizer(
+        UPSTREAM_URIS,
+        ProxyConfig(sentence_cache=True),
+        AudioCache(str(tmp_path / "cache"), enabled=True),
+        UpstreamPool(),
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_echo_client({}),
+    ) as from_uri:
+        await collect(synthesizer.synthesize("One. Two.", None, False))
+        assert from_uri.call_count == 2
+
+        request = synthesizer.synthesize("One. Three.", None, False)
+        events = await collect(request)
+
+    assert not request.failed
+    # Only the new sentence went upstream
+    assert from_uri.call_count == 3
+    assert [e.type for e in events] == [
+        "audio-start",
+        "audio-chunk",
+        "audio-chunk",
+        "audio-stop",
+    ]
+    assert [e.payload for e in events[1:3]] == [b"One.", b"Three."]
+
+
+@pytest.mark.asyncio
+async def test_sentence_cache_without_cache_does_not_split(tmp_path):
+    synthesizer = UpstreamSynthesizer(
+        UPSTREAM_URIS[:1],
+        ProxyConfig(sentence_cache=True),
+        AudioCache(str(tmp_path / "cache"), enabled=False),
+        UpstreamPool(),
+    )
+    misses = SENTENCE_CACHE_MISSES_TOTAL._value.get()
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        side_effect=lambda uri: make_echo_client({}),
+    ) as from_uri:
+        request = synthesizer.synthesize("One. Two.", None, False)
+        events = await collect(request)
+
+    assert not request.failed
+    # The whole text went upstream at once and nothing counted as a miss
+    assert from_uri.call_count == 1
+    assert [e.payload for e in events[1:2]] == [b"One. Two."]
+    assert SENTENCE_CACHE_MISSES_TOTAL._value.get() == misses
+
+
+@pytest.mark.asyncio
+async def test_audio_is_reframed_before_publishing_and_caching(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), enabled=True)
+    synthesizer = UpstreamSynthesizer(
+        UPSTREAM_URIS, ProxyConfig(audio_frame_ms=10), cache, UpstreamPool()
+    )
+
+    with patch(
+        "wyoming_tts_proxy.pool.AsyncClient.from_uri",
+        return_value=make_client(*audio_events(b"\x00" * 700)),
+    ):
+        events = await collect(synthesizer.synthesize("Hello", None, False))
+
+    # 10 ms of 16 kHz 16-bit mono audio is 320 bytes
+    sizes = [len(e.payload) for e in events if AudioChunk.is_type(e.type)]
+    assert sizes == [320, 320, 60]
+    cached_sizes = [
+        len(e.payload) for e in cache.get("Hello") if AudioChunk.is_type(e.type)
+    ]
+    assert cached_sizes == sizes
+
+
+@pytest.mark.asyncio
+async def test_audio_is_converted_before_caching(tmp_path):
+    pytest.importorskip("numpy")
+    cache = AudioCache(str(tmp_path / "cache"))
+    synthesizer = UpstreamSynthesizer(
+        UPSTREAM_URIS, ProxyConfig(audio_width=1), cache, UpstreamPool()
+    )
+    client = make_client(*audio_events(b"\x00\x40" * 4))
+
+    with patch("wyoming_tts_proxy.pool.AsyncClient.from_uri", return_value=client):
+        events = await collect(synthesizer.synthesize("Hello", None, False))
+
+    assert AudioStart.from_event(events[0]).width == 1
+    assert [e.payload for e in events if AudioChunk.is_type(e.type)] == [
+        bytes([192]) * 4
+    ]
+    cached = cache.get("Hello", None)
+    assert AudioStart.from_event(cached[0]).width == 1
+    assert AudioChunk.from_event(cached[1]).audio == bytes([192]) * 4
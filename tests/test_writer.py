@@ -0,0 +1,92 @@
+import asyncio
+import io
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import read_event
+
+from wyoming_tts_proxy.writer import BufferedEventWriter
+
+
+def make_writer():
+    writer = MagicMock(spec=asyncio.StreamWriter)
+    writer.drain = AsyncMock()
+    return writer
+
+
+def chunk(audio):
+    return AudioChunk(rate=16000, width=2, channels=1, audio=audio).event()
+
+
+def written_events(writer):
+    data = io.BytesIO(b"".join(c.args[0] for c in writer.write.call_args_list))
+    events = []
+    while (event := read_event(data)) is not None:
+        events.append(event)
+    return events
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_batched_until_control_event():
+    writer = make_writer()
+    buffered = BufferedEventWriter(writer, max_bytes=65536, max_delay=10)
+
+    await buffered.write_event(AudioStart(rate=16000, width=2, channels=1).event())
+    assert writer.write.call_count == 1
+
+    for i in range(10):
+        await buffered.write_event(chunk(bytes([i]) * 100))
+    assert writer.write.call_count == 1
+
+    await buffered.write_event(AudioStop().event())
+    assert writer.write.call_count == 2
+    assert writer.drain.call_count == 2
+
+    events = written_events(writer)
+    assert [e.type for e in events] == ["audio-start"] + ["audio-chunk"] * 10 + [
+        "audio-stop"
+    ]
+    assert events[5].payload == bytes([4]) * 100
+
+
+@pytest.mark.asyncio
+async def test_buffer_is_flushed_at_size_threshold():
+    writer = make_writer()
+    buffered = BufferedEventWriter(writer, max_bytes=500, max_delay=10)
+
+    await buffered.write_event(chunk(b"\x00" * 300))
+    assert writer.write.call_count == 0
+
+    await buffered.write_event(chunk(b"\x00" * 300))
+    assert writer.write.call_count == 1
+    assert len(written_events(writer)) == 2
+
+
+@pytest.mark.asyncio
+async def test_buffer_is_flushed_after_delay():
+    writer = make_writer()
+    buffered = BufferedEventWriter(writer, max_bytes=65536, max_delay=0.01)
+
+    await buffered.write_event(chunk(b"\x00" * 100))
+    assert writer.write.call_count == 0
+
+    await asyncio.sleep(0.05)
+    assert writer.write.call_count == 1
+    await buffered.close()
+    assert writer.write.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_delayed_flush_error_is_handled():
+    writer = make_writer()
+    writer.write.side_effect = RuntimeError("Transport is closing")
+    buffered = BufferedEventWriter(writer, max_bytes=65536, max_delay=0.01)
+
+    await buffered.write_event(chunk(b"\x00" * 100))
+    flush_task = buffered._flush_task
+    await asyncio.sleep(0.05)
+
+    # The error is logged instead of being left in the task
+    assert flush_task.done()
+    assert flush_task.exception() is None
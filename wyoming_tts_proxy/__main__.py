@@ -18,7 +18,13 @@ from .handler import TTSProxyEventHandler
 from .normalizer import TextNormalizer
 from .config import ProxyConfig
 from .cache import AudioCache
-from .metrics import start_metrics_server
+from .convert import AudioConverter
+from .health import UpstreamHealth
+from .info import InfoCache
+from .metrics import monitor_event_loop_lag, start_metrics_server
+from .pool import UpstreamPool
+from .prewarm import CachePrewarmer, load_prewarm_file
+from .synthesizer import UpstreamSynthesizer
 
 
 PROXY_PROGRAM_NAME = "tts-proxy"
@@ -99,6 +105,18 @@ async def main() -> None:
         default=int(os.getenv("MAX_CACHE_SIZE_MB", "512")),
         help="Maximum cache size in megabytes (env: MAX_CACHE_SIZE_MB, default: 512)",
     )
+    parser.add_argument(
+        "--upstream-pool-size",
+        type=int,
+        default=int(os.getenv("UPSTREAM_POOL_SIZE", "0")),
+        help="Idle connections to keep open per upstream (0 = disabled) (env: UPSTREAM_POOL_SIZE)",
+    )
+    parser.add_argument(
+        "--load-balancing",
+        default=os.getenv("LOAD_BALANCING"),
+        choices=["failover", "round_robin", "least_outstanding", "ewma"],
+        help="How synthesis requests are spread across upstreams (env: LOAD_BALANCING, default: failover)",
+    )
     parser.add_argument(
         "--metrics-port",
         type=int,
@@ -130,9 +148,24 @@ async def main() -> None:
         default=os.getenv("STREAM_TTS", "false").lower() == "true",
         help="Force streaming TTS output even for non-streaming input (env: STREAM_TTS)",
     )
+    parser.add_argument(
+        "--incremental-streaming",
+        action="store_true",
+        default=os.getenv("INCREMENTAL_STREAMING", "false").lower() == "true",
+        help="Send complete sentences of streaming input upstream as they arrive (env: INCREMENTAL_STREAMING)",
+    )
+    parser.add_argument(
+        "--prewarm-file",
+        default=os.getenv("PREWARM_FILE"),
+        help="YAML list of phrases to synthesize into the cache at startup (env: PREWARM_FILE)",
+    )
     args = parser.parse_args()
 
     config = load_config(args.config)
+    if args.incremental_streaming:
+        config = config.model_copy(update={"incremental_streaming": True})
+    if args.load_balancing:
+        config = config.model_copy(update={"load_balancing": args.load_balancing})
 
     # Use CLI arg first, then config, then env was handled by parser default
     use_structured = args.structured_logging or config.structured_logging
@@ -167,17 +200,49 @@ async def main() -> None:
         )
         sys.exit(1)
 
+    # Audio conversion needs numpy and a supported sample width
+    try:
+        AudioConverter(config.audio_rate, config.audio_width, config.audio_channels)
+    except (RuntimeError, ValueError) as e:
+        _LOGGER.error(str(e))
+        sys.exit(1)
+
     # Metrics
     metrics_port = args.metrics_port or config.metrics_port
     start_metrics_server(metrics_port)
+    lag_monitor = None
+    if metrics_port:
+        lag_monitor = asyncio.create_task(monitor_event_loop_lag())
 
     # Cache
     cache_dir = args.cache_dir or config.cache_dir
     max_cache_size = args.max_cache_size_mb or config.max_cache_size_mb
-    cache = AudioCache(
-        cache_dir=cache_dir,
-        max_size_mb=max_cache_size,
-        enabled=config.cache_enabled,
+    try:
+        cache = AudioCache(
+            cache_dir=cache_dir,
+            max_size_mb=max_cache_size,
+            enabled=config.cache_enabled,
+            compression=config.cache_compression,
+            memory_size_mb=config.cache_memory_mb,
+            io_workers=config.cache_io_workers,
+            store=config.cache_store,
+            segment_size_mb=config.cache_segment_size_mb,
+            admit_after=config.cache_admit_after,
+            max_entry_size_mb=config.cache_max_entry_mb,
+            shared=config.cache_shared,
+        )
+    except (RuntimeError, ValueError) as e:
+        _LOGGER.error(str(e))
+        sys.exit(1)
+
+    # Upstream connections
+    pool = UpstreamPool(
+        max_idle_per_uri=args.upstream_pool_size or config.upstream_pool_size,
+        idle_timeout=config.upstream_pool_idle_timeout,
+    )
+    health = UpstreamHealth(
+        failure_threshold=config.circuit_breaker_threshold,
+        cooldown=config.circuit_breaker_cooldown,
     )
 
     _LOGGER.info(f"Starting {PROXY_PROGRAM_NAME} v{PROXY_PROGRAM_VERSION}")
@@ -194,6 +259,37 @@ async def main() -> None:
         "attribution_url": PROXY_ATTRIBUTION_URL,
     }
 
+    info_cache = InfoCache(
+        upstream_uris,
+        pool,
+        proxy_program_basic_info,
+        ttl=config.info_cache_ttl,
+        health=health,
+    )
+    info_cache.start()
+
+    synthesizer = UpstreamSynthesizer(upstream_uris, config, cache, pool, health)
+
+    # Prewarming runs in the background while the server is already listening
+    prewarm_file = args.prewarm_file or config.prewarm_file
+    prewarm_phrases = []
+    if prewarm_file:
+        try:
+            prewarm_phrases = load_prewarm_file(prewarm_file)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            _LOGGER.error(f"Failed to load prewarm file {prewarm_file}: {e}")
+            sys.exit(1)
+        if not cache.enabled:
+            _LOGGER.warning("Ignoring the prewarm file, the audio cache is disabled")
+    prewarmer = CachePrewarmer(
+        prewarm_phrases,
+        synthesizer,
+        cache,
+        text_normalizer,
+        rate=config.prewarm_rate,
+        streaming=args.stream_tts or config.stream_tts,
+    )
+
     handler_factory = partial(
         TTSProxyEventHandler,
         proxy_program_info=proxy_program_basic_info,
@@ -202,10 +298,15 @@ async def main() -> None:
         text_normalizer=text_normalizer,
         cache=cache,
         config=config,
+        pool=pool,
+        health=health,
+        info_cache=info_cache,
+        synthesizer=synthesizer,
     )
 
     server = AsyncServer.from_uri(args.uri)
     _LOGGER.info(f"Proxy server ready and listening at {args.uri}")
+    prewarmer.start()
 
     try:
         await server.run(handler_factory)
@@ -215,6 +316,12 @@ async def main() -> None:
     except KeyboardInterrupt:
         _LOGGER.info("Server shutting down due to KeyboardInterrupt.")
     finally:
+        if lag_monitor is not None:
+            lag_monitor.cancel()
+        await prewarmer.stop()
+        await info_cache.stop()
+        await cache.close()
+        await pool.close()
         _LOGGER.info("Proxy server has shut down.")
 
 
@@ -0,0 +1,121 @@
+from typing import Iterable, Optional, Set
+
+from wyoming.audio import AudioStart, AudioStop
+from wyoming.error import Error
+from wyoming.event import Event
+
+from .metrics import CACHE_ADMISSIONS_TOTAL, CACHE_REJECTIONS_TOTAL
+
+# Counters saturate at this value, as in TinyLFU
+MAX_COUNT = 15
+SKETCH_DEPTH = 4
+# Counters per row for every key the sketch is sized for
+SKETCH_WIDTH_FACTOR = 4
+# bytes.translate() table that halves every counter
+HALVE = bytes(value // 2 for value in range(256))
+
+
+class FrequencySketch:
+    """Approximate request counts of recent cache keys (a count-min sketch).
+
+    Every key is counted in ``SKETCH_DEPTH`` rows of small counters that
+    saturate at ``MAX_COUNT``, and its estimate is the smallest of them.
+    After ``10 * expected_keys`` requests all counters are halved, so the
+    counts follow recent popularity instead of growing forever (TinyLFU
+    aging). Keys are the sha256 hex digests used by the cache, so the rows
+    are indexed by slices of the key itself.
+    """
+
+    def __init__(self, expected_keys: int = 10000):
+        width = 1
+        while width < expected_keys * SKETCH_WIDTH_FACTOR:
+            width *= 2
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in range(SKETCH_DEPTH)]
+        self.sample_size = 10 * expected_keys
+        self._additions = 0
+
+    def increment(self, key: str) -> None:
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < MAX_COUNT:
+                row[index] += 1
+
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._reset()
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _indexes(self, key: str) -> Iterable[int]:
+        step = len(key) // SKETCH_DEPTH
+        for i in range(SKETCH_DEPTH):
+            yield int(key[i * step : (i + 1) * step], 16) & self._mask
+
+    def _reset(self) -> None:
+        self._rows = [bytearray(row.translate(HALVE)) for row in self._rows]
+        self._additions //= 2
+
+
+class AdmissionPolicy:
+    """Decide which synthesized streams are worth writing to the cache.
+
+    Streams that contain an Error or do not end their audio with an AudioStop
+    are always rejected. With ``admit_after`` an entry is only admitted once
+    its key has been requested that many times recently, going by a
+    ``FrequencySketch`` that is fed every cache lookup, so one-off texts
+    (typically LLM responses) do not push repeated phrases out of the cache.
+    Keys passed to ``allow()`` skip the frequency check. With
+    ``max_entry_bytes`` streams with more audio are rejected.
+    """
+
+    def __init__(self, admit_after: int = 0, max_entry_bytes: int = 0):
+        self.admit_after = min(admit_after, MAX_COUNT)
+        self.max_entry_bytes = max_entry_bytes
+        self.sketch: Optional[FrequencySketch] = None
+        self._allowed: Set[str] = set()
+        if self.admit_after > 0:
+            self.sketch = FrequencySketch()
+
+    def record(self, key: str) -> None:
+        """Count a request for key."""
+        if self.sketch is not None:
+            self.sketch.increment(key)
+
+    def allow(self, key: str) -> None:
+        """Admit key however rarely it is requested, e.g. a prewarmed phrase."""
+        self._allowed.add(key)
+
+    def admit(self, key: str, events: Iterable[Event]) -> bool:
+        reason = self._rejection(key, events)
+        if reason is not None:
+            CACHE_REJECTIONS_TOTAL.labels(reason=reason).inc()
+            return False
+
+        CACHE_ADMISSIONS_TOTAL.inc()
+        return True
+
+    def _rejection(self, key: str, events: Iterable[Event]) -> Optional[str]:
+        # An AudioStop was seen, and no AudioStart after the last one
+        stopped = False
+        size = 0
+        for event in events:
+            if Error.is_type(event.type):
+                return "error"
+            if AudioStart.is_type(event.type):
+                stopped = False
+            elif AudioStop.is_type(event.type):
+                stopped = True
+            size += len(event.payload or b"")
+
+        if not stopped:
+            return "incomplete"
+        if self.max_entry_bytes and (size > self.max_entry_bytes):
+            return "too_large"
+        if (
+            (self.sketch is not None)
+            and (key not in self._allowed)
+            and (self.sketch.estimate(key) < self.admit_after)
+        ):
+            return "infrequent"
+        return None
@@ -0,0 +1,109 @@
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from .latency import LatencyWindow
+
+_LOGGER = logging.getLogger(__name__)
+
+FAILOVER = "failover"
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+EWMA = "ewma"
+
+POLICIES = [FAILOVER, ROUND_ROBIN, LEAST_OUTSTANDING, EWMA]
+
+# Seconds of latency a failed request counts as for the EWMA
+FAILURE_PENALTY = 5.0
+# Seconds after which an upstream's EWMA counts half for ranking, so an
+# upstream that is no longer chosen is eventually tried again
+EWMA_HALF_LIFE = 60.0
+
+
+class UpstreamBalancer:
+    """Choose the order in which upstreams are tried for a synthesis request.
+
+    The first URI of the order gets the request and the rest are used for
+    failover. Policies:
+
+    - ``failover``: always the configured order
+    - ``round_robin``: rotate the configured order on every request
+    - ``least_outstanding``: fewest requests currently running first
+    - ``ewma``: lowest moving average of time to first audio first. A failed
+      request counts as ``FAILURE_PENALTY`` seconds, and the average decays
+      with a half-life of ``EWMA_HALF_LIFE`` seconds since it was updated, so
+      an upstream that stopped being chosen is retried once in a while. An
+      upstream without samples is tried first once to get measured.
+    """
+
+    def __init__(
+        self,
+        upstream_uris: List[str],
+        policy: str = FAILOVER,
+        latency: Optional[Dict[str, LatencyWindow]] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown load balancing policy: {policy}")
+
+        self.upstream_uris = upstream_uris
+        self.policy = policy
+        self.latency = latency if latency is not None else defaultdict(LatencyWindow)
+        self.outstanding: Dict[str, int] = defaultdict(int)
+        self._next = 0
+        # Unmeasured upstreams already given a request to measure them
+        self._probed: Set[str] = set()
+
+        if policy != FAILOVER:
+            _LOGGER.info(f"Balancing synthesis requests across upstreams: {policy}")
+
+    def order(self) -> List[str]:
+        """Return the upstreams to try for a new request, best first."""
+        if self.policy == ROUND_ROBIN:
+            order = self._rotated(self._next)
+            self._next += 1
+            return order
+
+        order = self._ranked()
+        if (self.policy == EWMA) and (self.latency[order[0]].ewma is None):
+            self._probed.add(order[0])
+        return order
+
+    def preferred(self) -> str:
+        """Return the upstream the next request will most likely go to."""
+        if self.policy == ROUND_ROBIN:
+            return self._rotated(self._next)[0]
+
+        return self._ranked()[0]
+
+    def started(self, uri: str) -> None:
+        self.outstanding[uri] += 1
+
+    def finished(self, uri: str) -> None:
+        self.outstanding[uri] = max(self.outstanding[uri] - 1, 0)
+
+    def failed(self, uri: str) -> None:
+        """Count a failed request against the upstream's moving average."""
+        self.latency[uri].penalize(FAILURE_PENALTY)
+
+    def _ranked(self) -> List[str]:
+        if self.policy == LEAST_OUTSTANDING:
+            return sorted(self.upstream_uris, key=lambda uri: self.outstanding[uri])
+
+        if self.policy == EWMA:
+            return sorted(self.upstream_uris, key=self._ewma)
+
+        return list(self.upstream_uris)
+
+    def _ewma(self, uri: str) -> float:
+        window = self.latency[uri]
+        if window.ewma is None:
+            # Probe once, then wait behind the measured upstreams
+            return float("inf") if uri in self._probed else 0.0
+
+        age = time.monotonic() - window.updated_at
+        return window.ewma * 0.5 ** (age / EWMA_HALF_LIFE)
+
+    def _rotated(self, offset: int) -> List[str]:
+        offset %= len(self.upstream_uris)
+        return self.upstream_uris[offset:] + self.upstream_uris[:offset]
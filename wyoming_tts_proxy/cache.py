@@ -1,100 +1,733 @@
+import asyncio
+import contextlib
 import hashlib
+import io
+import json
 import logging
+import mmap
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import (
+    Any,
+    AsyncIterator,
+    BinaryIO,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Union,
+)
 
+from wyoming.audio import AudioChunk
 from wyoming.event import Event, read_event, write_event
 
+from .admission import AdmissionPolicy
+from .cache_index import CacheIndex, SharedCacheIndex
+from .store import EntryData, FileStore, SegmentStore
+from .metrics import (
+    CACHE_COMPRESSION_RATIO,
+    CACHE_DECODE_SECONDS_TOTAL,
+    CACHE_DECODED_BYTES_TOTAL,
+    CACHE_MEMORY_BYTES,
+    CACHE_PENDING_WRITES,
+    CACHE_TIER_HITS_TOTAL,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the installed extras
+    np = None
+
 _LOGGER = logging.getLogger(__name__)
 
+# Entries are either a PCM container (magic, header length, JSON header, raw
+# audio), compressed Wyoming events (magic and a codec byte), or a plain
+# stream of Wyoming events as written by older versions.
+PCM_MAGIC = b"WTPA"
+COMPRESSED_MAGIC = b"WTPZ"
+CODECS = {"zlib": b"z", "delta": b"d"}
+ZLIB_LEVEL = 6
+# SQLite index of a cache directory shared by several processes
+SHARED_INDEX_FILE = "index.sqlite3"
+# Writes waiting for the I/O threads beyond this are dropped
+MAX_PENDING_WRITES = 64
+READ_BLOCK_SIZE = 64 * 1024
+# Audio bytes decoded per trip to the I/O threads while streaming an entry
+STREAM_BATCH_SIZE = 64 * 1024
+
 
 class AudioCache:
-    def __init__(self, cache_dir: str, max_size_mb: int = 512, enabled: bool = True):
+    """Disk cache of synthesized audio, with an optional in-memory LRU tier.
+
+    Async code should use ``stream_async()``, ``get_async()`` and
+    ``set_background()``, which run the disk I/O on the cache I/O threads.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size_mb: int = 512,
+        enabled: bool = True,
+        compression: str = "none",
+        memory_size_mb: float = 0,
+        io_workers: int = 2,
+        store: str = "files",
+        segment_size_mb: int = 64,
+        admit_after: int = 0,
+        max_entry_size_mb: float = 0,
+        shared: bool = False,
+    ):
         self.cache_dir = Path(cache_dir)
         self.max_size_mb = max_size_mb
         self.enabled = enabled
+        self.memory = MemoryTier(int(memory_size_mb * 1024 * 1024))
+        self.index: Union[CacheIndex, SharedCacheIndex] = CacheIndex()
+        self.admission = AdmissionPolicy(
+            admit_after, int(max_entry_size_mb * 1024 * 1024)
+        )
+        # Guards the memory tier and the pending writes
+        self._lock = threading.RLock()
+        # Guards the index. The shared index locks itself, so the event loop
+        # never waits on the cache lock while another process holds the
+        # database.
+        self._index_lock: ContextManager[Any] = (
+            contextlib.nullcontext() if (enabled and shared) else self._lock
+        )
+        self._pending: Dict[str, List[Event]] = {}
+        self._writes: Set[Future] = set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(io_workers, 1), thread_name_prefix="audio-cache"
+        )
+        self._compaction: Optional[Future] = None
+        if store not in ("files", "segments"):
+            raise ValueError(f"Unknown cache store: {store}")
+        if shared and (store != "files"):
+            raise ValueError("A shared cache requires the files cache store")
+        if (compression != "none") and (compression not in CODECS):
+            raise ValueError(f"Unknown cache compression: {compression}")
+        if (compression == "delta") and (np is None):
+            raise RuntimeError(
+                "Delta cache compression requires numpy, install wyoming-tts-proxy[audio]"
+            )
+        self.compression = compression
+        self.store: Union[FileStore, SegmentStore] = FileStore(self.cache_dir)
         if self.enabled:
             self.cache_dir.mkdir(parents=True, exist_ok=True)
+            if shared:
+                self.index = SharedCacheIndex(self.cache_dir / SHARED_INDEX_FILE)
+            if store == "segments":
+                self.store = SegmentStore(
+                    self.cache_dir / "segments",
+                    segment_size=segment_size_mb * 1024 * 1024,
+                )
+            self._load_index()
             _LOGGER.info(
-                f"Audio cache initialized at: {self.cache_dir} (limit: {max_size_mb} MB)"
+                f"Audio cache initialized at: {self.cache_dir} (limit: {max_size_mb} MB, store: {store}, compression: {compression}, shared: {shared}, {len(self.index)} entries)"
             )
 
     def get_hash(self, text: str, voice: Optional[str] = None) -> str:
         key = f"{text}|{voice or ''}"
         return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
+    def record_request(self, text: str, voice: Optional[str] = None) -> None:
+        """Count a request that did not look the cache up for admission."""
+        if self.enabled:
+            self.admission.record(self.get_hash(text, voice))
+
+    def allow(self, text: str, voice: Optional[str] = None) -> None:
+        """Cache text regardless of how often it is requested."""
+        if self.enabled:
+            self.admission.allow(self.get_hash(text, voice))
+
+    async def contains(self, text: str, voice: Optional[str] = None) -> bool:
+        """Return whether text is cached, without counting it as a request."""
+        if not self.enabled:
+            return False
+
+        cache_key = self.get_hash(text, voice)
+        with self._lock:
+            if cache_key in self._pending:
+                return True
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._indexed, cache_key
+        )
+
+    def _indexed(self, cache_key: str) -> bool:
+        with self._index_lock:
+            return cache_key in self.index
+
     def get(self, text: str, voice: Optional[str] = None) -> Optional[List[Event]]:
         if not self.enabled:
             return None
 
         cache_key = self.get_hash(text, voice)
-        cache_file = self.cache_dir / f"{cache_key}.events"
+        self.admission.record(cache_key)
+        events = self._get_from_memory(cache_key)
+        if events is not None:
+            return events
+        return self._get_from_disk(cache_key)
 
-        if not cache_file.exists():
+    async def get_async(
+        self, text: str, voice: Optional[str] = None
+    ) -> Optional[List[Event]]:
+        """Like get(), but reads from disk on the cache I/O threads."""
+        if not self.enabled:
             return None
 
-        try:
-            events = []
-            with open(cache_file, "rb") as f:
-                while True:
-                    event = read_event(f)
-                    if event is None:
-                        break
-                    events.append(event)
-            _LOGGER.debug(f"Cache hit for text hash: {cache_key}")
+        cache_key = self.get_hash(text, voice)
+        self.admission.record(cache_key)
+        events = self._get_from_memory(cache_key)
+        if events is not None:
             return events
-        except Exception as e:
-            _LOGGER.warning(f"Failed to read cache file {cache_file}: {e}")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._get_from_disk, cache_key
+        )
+
+    async def stream_async(
+        self, text: str, voice: Optional[str] = None
+    ) -> Optional[AsyncIterator[Event]]:
+        """Return the events of an entry as they are decoded, or None on a miss.
+
+        The entry file is memory-mapped and decoded in small batches on the
+        cache I/O threads. The first batch ends with the first audio chunk,
+        so replay can start after a single read, and memory use does not grow
+        with the length of the entry. A read error ends the stream early.
+        """
+        if not self.enabled:
+            return None
+
+        cache_key = self.get_hash(text, voice)
+        self.admission.record(cache_key)
+        events = self._get_from_memory(cache_key)
+        if events is not None:
+            return _aiter_list(events)
+
+        reader = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._open_from_disk, cache_key
+        )
+        if reader is None:
             return None
+        return self._stream_batches(cache_key, reader)
 
     def set(self, text: str, voice: Optional[str], events: List[Event]) -> None:
         if not self.enabled:
             return
 
         cache_key = self.get_hash(text, voice)
-        cache_file = self.cache_dir / f"{cache_key}.events"
+        if self.admission.admit(cache_key, events):
+            self._write(cache_key, events)
 
+    def _write(self, cache_key: str, events: List[Event]) -> None:
         try:
-            with open(cache_file, "wb") as f:
-                for event in events:
-                    write_event(event, f)
+            data = _encode_entry(events)
+            if self.compression == "none":
+                size = self.store.write(cache_key, data)
+            else:
+                size = self.store.write(cache_key, _compress(events, self.compression))
+            with self._index_lock:
+                self.index.add(cache_key, size)
+            with self._lock:
+                self.memory.put(cache_key, data)
             _LOGGER.debug(f"Cached {len(events)} events for text hash: {cache_key}")
             self._prune_cache()
         except Exception as e:
-            _LOGGER.warning(f"Failed to write cache file {cache_file}: {e}")
+            _LOGGER.warning(f"Failed to write cache entry {cache_key}: {e}")
 
-    def _get_cache_size(self) -> int:
-        """Return total size of cache in bytes."""
-        return sum(
-            f.stat().st_size for f in self.cache_dir.glob("*.events") if f.is_file()
-        )
+    def set_background(
+        self, text: str, voice: Optional[str], events: List[Event]
+    ) -> None:
+        """Write an entry on the cache I/O threads without waiting for it."""
+        if not self.enabled:
+            return
+
+        cache_key = self.get_hash(text, voice)
+        events = list(events)
+        if not self.admission.admit(cache_key, events):
+            return
+
+        with self._lock:
+            if (len(self._pending) >= MAX_PENDING_WRITES) and (
+                cache_key not in self._pending
+            ):
+                _LOGGER.warning(
+                    f"Dropping cache write for text hash {cache_key}, too many writes pending"
+                )
+                return
+            self._pending[cache_key] = events
+            CACHE_PENDING_WRITES.set(len(self._pending))
+
+        write = self._executor.submit(self._write_behind, cache_key, events)
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+
+    async def flush(self) -> None:
+        """Wait until all background writes are on disk."""
+        writes = [asyncio.wrap_future(write) for write in list(self._writes)]
+        if writes:
+            await asyncio.gather(*writes, return_exceptions=True)
+        if self.enabled:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self.store.flush)
+            await loop.run_in_executor(self._executor, self._flush_index)
+
+    async def close(self) -> None:
+        """Flush the cache and release the shared index on shutdown."""
+        await self.flush()
+        if isinstance(self.index, SharedCacheIndex):
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._close_index
+            )
+        self._executor.shutdown(wait=False)
+
+    def _flush_index(self) -> None:
+        if isinstance(self.index, SharedCacheIndex):
+            self.index.flush()
+
+    def _close_index(self) -> None:
+        assert isinstance(self.index, SharedCacheIndex)
+        self.index.close()
+
+    def _get_from_memory(self, cache_key: str) -> Optional[List[Event]]:
+        with self._lock:
+            events = self._pending.get(cache_key)
+            data = self.memory.get(cache_key) if events is None else None
+            if (events is None) and (data is None):
+                return None
+        with self._index_lock:
+            self.index.touch(cache_key)
+
+        CACHE_TIER_HITS_TOTAL.labels(tier="memory").inc()
+        _LOGGER.debug(f"Memory cache hit for text hash: {cache_key}")
+        if events is not None:
+            return list(events)
+        return list(_iter_entry(data))
+
+    def _get_from_disk(self, cache_key: str) -> Optional[List[Event]]:
+        reader = self._open_from_disk(cache_key)
+        if reader is None:
+            return None
+
+        try:
+            return list(reader)
+        except Exception as e:
+            _LOGGER.warning(f"Failed to read cache entry {cache_key}: {e}")
+            return None
+
+    def _open_from_disk(self, cache_key: str) -> Optional[Iterator[Event]]:
+        if not self.store.contains(cache_key):
+            with self._index_lock:
+                self.index.remove(cache_key)
+            return None
+
+        CACHE_TIER_HITS_TOTAL.labels(tier="disk").inc()
+        with self._index_lock:
+            self.index.touch(cache_key)
+        _LOGGER.debug(f"Cache hit for text hash: {cache_key}")
+        return self._read_entry(cache_key)
+
+    def _read_entry(self, cache_key: str) -> Iterator[Event]:
+        # Collect the entry to promote it to the memory tier, unless it turns
+        # out to be larger than the whole tier
+        promoted: Optional[List[Event]] = [] if self.memory.enabled else None
+        promoted_size = 0
+
+        try:
+            with self.store.open(cache_key) as data:
+                if data is None:
+                    return
+                for event in _iter_entry(data):
+                    if promoted is not None:
+                        promoted.append(event)
+                        promoted_size += len(event.payload or b"")
+                        if promoted_size > self.memory.max_bytes:
+                            promoted = None
+                    yield event
+        except CorruptEntryError:
+            self._discard(cache_key)
+            raise
+
+        if promoted is not None:
+            data = _encode_entry(promoted)
+            with self._lock:
+                self.memory.put(cache_key, data)
+
+    def _discard(self, cache_key: str) -> None:
+        _LOGGER.warning(f"Removing corrupt cache entry {cache_key}")
+        with self._index_lock:
+            self.index.remove(cache_key)
+        with self._lock:
+            self.memory.discard(cache_key)
+        self.store.remove(cache_key)
+
+    async def _stream_batches(
+        self, cache_key: str, reader: Iterator[Event]
+    ) -> AsyncIterator[Event]:
+        loop = asyncio.get_running_loop()
+        first = True
+        try:
+            while True:
+                batch = await loop.run_in_executor(
+                    self._executor, _read_batch, reader, first
+                )
+                if not batch:
+                    return
+                first = False
+                for event in batch:
+                    yield event
+        except Exception as e:
+            _LOGGER.warning(f"Failed to read cache entry {cache_key}: {e}")
+        finally:
+            close = getattr(reader, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self._executor, close)
+
+    def _write_behind(self, cache_key: str, events: List[Event]) -> None:
+        try:
+            self._write(cache_key, events)
+        finally:
+            with self._lock:
+                if self._pending.get(cache_key) is events:
+                    del self._pending[cache_key]
+                CACHE_PENDING_WRITES.set(len(self._pending))
+
+    def _load_index(self) -> None:
+        """Index the entries already on disk, most recently written last."""
+        if isinstance(self.index, SharedCacheIndex):
+            # Other processes keep the shared index up to date, only pick up
+            # entries written without it and forget entries that are gone
+            self.index.reconcile(self.store.scan(), time.time())
+            return
+
+        for entry in self.store.scan():
+            self.index.add(entry.key, entry.size, entry.written_at)
 
     def _prune_cache(self) -> None:
-        """Remove oldest cache files if total size exceeds limit."""
+        """Remove least recently used cache files if total size exceeds limit."""
         max_bytes = self.max_size_mb * 1024 * 1024
-        current_size = self._get_cache_size()
-
-        if current_size <= max_bytes:
+        if self.index.total_size <= max_bytes:
             return
 
         _LOGGER.debug(
-            f"Cache size ({current_size} bytes) exceeds limit ({max_bytes} bytes). Pruning..."
+            f"Cache size ({self.index.total_size} bytes) exceeds limit ({max_bytes} bytes). Pruning..."
         )
 
-        # Sort files by access time (oldest first)
-        files = sorted(
-            list(self.cache_dir.glob("*.events")),
-            key=lambda f: f.stat().st_atime,
-        )
+        while True:
+            with self._index_lock:
+                if self.index.total_size <= max_bytes:
+                    break
+                oldest = self.index.pop_oldest()
+            if oldest is None:
+                break
 
-        for cache_file in files:
-            file_size = cache_file.stat().st_size
             try:
-                cache_file.unlink()
-                current_size -= file_size
-                _LOGGER.debug(f"Deleted old cache file: {cache_file}")
+                self.store.remove(oldest[0])
+                _LOGGER.debug(f"Deleted old cache entry: {oldest[0]}")
             except Exception as e:
-                _LOGGER.warning(f"Failed to delete {cache_file}: {e}")
+                _LOGGER.warning(f"Failed to delete cache entry {oldest[0]}: {e}")
 
-            if current_size <= max_bytes:
-                break
+        if self.store.needs_compaction():
+            with self._lock:
+                if (self._compaction is None) or self._compaction.done():
+                    self._compaction = self._executor.submit(self._compact)
+
+    def _compact(self) -> None:
+        try:
+            self.store.compact()
+        except Exception as e:
+            _LOGGER.warning(f"Failed to compact cache segments: {e}")
+
+
+class _InflateReader:
+    """File-like reader that inflates a zlib stream as it is consumed."""
+
+    def __init__(self, f: BinaryIO):
+        self._file = f
+        self._inflate = zlib.decompressobj()
+        self._buffer = bytearray()
+        self._eof = False
+        self.decoded = 0
+
+    def readline(self) -> bytes:
+        while (b"\n" not in self._buffer) and (not self._eof):
+            self._fill()
+        end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+        return self._take(end)
+
+    def read(self, size: int) -> bytes:
+        while (len(self._buffer) < size) and (not self._eof):
+            self._fill()
+        return self._take(size)
+
+    def _fill(self) -> None:
+        data = self._file.read(READ_BLOCK_SIZE)
+        if data:
+            inflated = self._inflate.decompress(data)
+        else:
+            inflated = self._inflate.flush()
+            self._eof = True
+        self.decoded += len(inflated)
+        self._buffer += inflated
+
+    def _take(self, size: int) -> bytes:
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+class MemoryTier:
+    """Byte-budgeted LRU of serialized cache entries.
+
+    Entries are evicted least recently used first once their total size
+    exceeds ``max_bytes``; the disk tier still holds them. With
+    ``max_bytes=0`` nothing is kept in memory.
+    """
+
+    def __init__(self, max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if (not self.enabled) or (len(data) > self.max_bytes):
+            self.discard(key)
+            return
+
+        self.discard(key)
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+        CACHE_MEMORY_BYTES.set(self.size)
+
+    def discard(self, key: str) -> None:
+        data = self._entries.pop(key, None)
+        if data is not None:
+            self.size -= len(data)
+            CACHE_MEMORY_BYTES.set(self.size)
+
+
+class CorruptEntryError(ValueError):
+    """A cache entry does not match its header."""
+
+
+def _encode_entry(events: List[Event]) -> bytes:
+    return _encode_pcm(events) or _serialize(events)
+
+
+def _encode_pcm(events: List[Event]) -> Optional[bytes]:
+    """Encode events as a PCM container, or return None if they do not fit one.
+
+    The header holds the audio format, the layout of the entry (the length
+    of each chunk, or the whole event for anything that is not audio) and a
+    CRC32 of the audio.
+    """
+    audio_format = None
+    layout: List[Union[int, Dict[str, Any]]] = []
+    audio = []
+    for event in events:
+        if AudioChunk.is_type(event.type):
+            chunk = AudioChunk.from_event(event)
+            if chunk.timestamp is not None:
+                return None
+            chunk_format = [chunk.rate, chunk.width, chunk.channels]
+            if audio_format is None:
+                audio_format = chunk_format
+            elif chunk_format != audio_format:
+                return None
+            layout.append(len(chunk.audio))
+            audio.append(chunk.audio)
+        elif event.payload:
+            return None
+        else:
+            layout.append({"type": event.type, "data": event.data})
+
+    if audio_format is None:
+        return None
+
+    pcm = b"".join(audio)
+    rate, width, channels = audio_format
+    header = json.dumps(
+        {
+            "rate": rate,
+            "width": width,
+            "channels": channels,
+            "layout": layout,
+            "crc32": zlib.crc32(pcm),
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    return PCM_MAGIC + len(header).to_bytes(4, "little") + header + pcm
+
+
+def _iter_pcm(data: EntryData) -> Iterator[Event]:
+    """Replay a PCM container by slicing chunks out of the raw audio.
+
+    Chunks of an in-memory entry or a segment are memoryviews of it; chunks
+    of a mapped file are copied out of the mapping so it can be closed. The size is
+    checked before anything is returned, and the checksum once the last
+    chunk is out.
+    """
+    start = len(PCM_MAGIC) + 4
+    header_length = int.from_bytes(data[len(PCM_MAGIC) : start], "little")
+    header = json.loads(bytes(data[start : start + header_length]))
+    offset = start + header_length
+    layout = header["layout"]
+    chunk_lengths = [item for item in layout if isinstance(item, int)]
+    if len(data) != offset + sum(chunk_lengths):
+        raise CorruptEntryError("Cache entry size does not match its header")
+
+    audio = data if isinstance(data, mmap.mmap) else memoryview(data)
+    chunks_left = len(chunk_lengths)
+    crc = 0
+    for item in layout:
+        if not isinstance(item, int):
+            yield Event(type=item["type"], data=item.get("data"))
+            continue
+
+        chunk = audio[offset : offset + item]
+        offset += item
+        crc = zlib.crc32(chunk, crc)
+        yield AudioChunk(
+            rate=header["rate"],
+            width=header["width"],
+            channels=header["channels"],
+            audio=chunk,
+        ).event()
+
+        chunks_left -= 1
+        if (not chunks_left) and (crc != header["crc32"]):
+            raise CorruptEntryError("Cache entry audio does not match its checksum")
+
+
+def _serialize(events: List[Event]) -> bytes:
+    data = io.BytesIO()
+    for event in events:
+        write_event(event, data)
+    return data.getvalue()
+
+
+def _iter_events(f) -> Iterator[Event]:
+    while True:
+        event = read_event(f)
+        if event is None:
+            break
+        yield event
+
+
+def _iter_entry(data: EntryData) -> Iterator[Event]:
+    """Decode the events of a cache entry in any of its formats."""
+    magic = bytes(data[: len(PCM_MAGIC)])
+    if magic == PCM_MAGIC:
+        yield from _iter_pcm(data)
+        return
+
+    f = data if isinstance(data, mmap.mmap) else io.BytesIO(data)
+    if magic == COMPRESSED_MAGIC:
+        f.seek(len(COMPRESSED_MAGIC))
+        yield from _iter_compressed(f, f.read(1))
+    else:
+        f.seek(0)
+        yield from _iter_events(f)
+
+
+def _iter_compressed(f, codec: bytes) -> Iterator[Event]:
+    if codec not in CODECS.values():
+        raise ValueError(f"Unknown cache entry codec: {codec!r}")
+
+    reader = _InflateReader(f)
+    decoded = 0
+    while True:
+        started_at = time.perf_counter()
+        event = read_event(reader)
+        if (event is not None) and (codec == CODECS["delta"]):
+            event = _delta_decode(event)
+        CACHE_DECODE_SECONDS_TOTAL.inc(time.perf_counter() - started_at)
+        CACHE_DECODED_BYTES_TOTAL.inc(reader.decoded - decoded)
+        decoded = reader.decoded
+        if event is None:
+            return
+        yield event
+
+
+def _read_batch(reader: Iterator[Event], first: bool) -> List[Event]:
+    """Decode the next events of a streamed entry."""
+    batch: List[Event] = []
+    size = 0
+    for event in reader:
+        batch.append(event)
+        if first and AudioChunk.is_type(event.type):
+            break
+        size += len(event.payload or b"")
+        if size >= STREAM_BATCH_SIZE:
+            break
+    return batch
+
+
+async def _aiter_list(events: List[Event]) -> AsyncIterator[Event]:
+    for event in events:
+        yield event
+
+
+def _compress(events: List[Event], compression: str) -> bytes:
+    if compression == "delta":
+        events = [_delta_encode(event) for event in events]
+    data = _serialize(events)
+
+    compressed = zlib.compress(data, ZLIB_LEVEL)
+    CACHE_COMPRESSION_RATIO.observe(len(data) / len(compressed))
+    return COMPRESSED_MAGIC + CODECS[compression] + compressed
+
+
+def _delta_encode(event: Event) -> Event:
+    """Replace the samples of a chunk by the differences between them."""
+    if (not AudioChunk.is_type(event.type)) or (not event.payload):
+        return event
+
+    dtype = _sample_dtype(event)
+    if dtype is None:
+        return event
+
+    samples = np.frombuffer(event.payload, dtype=dtype)
+    deltas = samples.copy()
+    deltas[1:] -= samples[:-1]
+    return Event(type=event.type, data=event.data, payload=deltas.tobytes())
+
+
+def _delta_decode(event: Event) -> Event:
+    if (not AudioChunk.is_type(event.type)) or (not event.payload):
+        return event
+
+    dtype = _sample_dtype(event)
+    if dtype is None:
+        return event
+
+    if np is None:
+        raise RuntimeError("Reading delta-compressed cache entries requires numpy")
+    deltas = np.frombuffer(event.payload, dtype=dtype)
+    samples = np.cumsum(deltas, dtype=dtype)
+    return Event(type=event.type, data=event.data, payload=samples.tobytes())
+
+
+def _sample_dtype(event: Event) -> Optional[str]:
+    # Only whole 16 or 32-bit samples are delta-encoded
+    width = event.data.get("width")
+    if (width not in (2, 4)) or (len(event.payload or b"") % width):
+        return None
+    return f"<i{width}"
@@ -0,0 +1,227 @@
+import contextlib
+import heapq
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .store import StoredEntry
+
+
+class CacheIndex:
+    """Sizes and last use times of the entries of the disk cache.
+
+    The index is kept up to date on every read and write, so the total size
+    is known without listing the cache directory, and the least recently used
+    entry is found in O(log n) with a heap. Stale heap items left behind by
+    later uses are skipped when popped and dropped when the heap grows too
+    large. Use times come from the index itself, not from filesystem atime.
+    """
+
+    def __init__(self) -> None:
+        self.total_size = 0
+        # key -> (size, last use)
+        self._entries: Dict[str, Tuple[int, float]] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def add(self, key: str, size: int, used_at: Optional[float] = None) -> None:
+        """Add an entry, or replace it after it was rewritten."""
+        if used_at is None:
+            used_at = time.time()
+        self.remove(key)
+        self._entries[key] = (size, used_at)
+        self.total_size += size
+        self._push(used_at, key)
+
+    def touch(self, key: str) -> None:
+        """Mark an entry as just used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        used_at = time.time()
+        self._entries[key] = (entry[0], used_at)
+        self._push(used_at, key)
+
+    def remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_size -= entry[0]
+
+    def pop_oldest(self) -> Optional[Tuple[str, int]]:
+        """Remove the least recently used entry and return its key and size."""
+        while self._heap:
+            used_at, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if (entry is None) or (entry[1] != used_at):
+                # Removed or used again since this item was pushed
+                continue
+            self.remove(key)
+            return key, entry[0]
+        return None
+
+    def _push(self, used_at: float, key: str) -> None:
+        heapq.heappush(self._heap, (used_at, key))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(used_at, key) for key, (_, used_at) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+
+# Total size and entry count are kept in totals by triggers
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL,
+    count INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET size = size + NEW.size, count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET size = size - OLD.size, count = count - 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET size = size - OLD.size + NEW.size;
+END;
+"""
+
+
+class SharedCacheIndex:
+    """Cache index in a SQLite database shared by several proxy processes.
+
+    Offers the same operations as ``CacheIndex``, but the entries live in
+    ``path`` so every process that uses the cache directory sees the same
+    total size and evicts from the same LRU order. The total size is kept
+    up to date by triggers, and the least recently used entry is removed in
+    a single write transaction, so two processes never evict the same
+    entry. Use times are collected in memory and written with the next
+    change, or by ``flush()``, so cache hits do not wait for the database.
+    """
+
+    def __init__(self, path: Path, timeout: float = 30.0) -> None:
+        self.path = path
+        self._db = sqlite3.connect(
+            str(path), timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        # key -> last use not written to the database yet, guarded by its
+        # own lock so touch() never waits for the database
+        self._touched: Dict[str, float] = {}
+        self._touched_lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count FROM totals").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None
+
+    @property
+    def total_size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT size FROM totals").fetchone()[0]
+
+    def add(self, key: str, size: int, used_at: Optional[float] = None) -> None:
+        if used_at is None:
+            used_at = time.time()
+        with self._transaction() as db:
+            self._forget(key)
+            db.execute(
+                "INSERT INTO entries (key, size, used_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET size = excluded.size, used_at = excluded.used_at",
+                (key, size, used_at),
+            )
+
+    def touch(self, key: str) -> None:
+        with self._touched_lock:
+            self._touched[key] = time.time()
+
+    def remove(self, key: str) -> None:
+        with self._transaction() as db:
+            self._forget(key)
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def pop_oldest(self) -> Optional[Tuple[str, int]]:
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT key, size FROM entries ORDER BY used_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+        return row[0], row[1]
+
+    def reconcile(self, entries: Iterable[StoredEntry], scanned_at: float) -> None:
+        """Add entries found on disk and drop rows whose entry is gone.
+
+        Rows changed since ``scanned_at`` are kept, another process may
+        have written them after the scan.
+        """
+        on_disk = {}
+        for entry in entries:
+            on_disk[entry.key] = entry
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT INTO entries (key, size, used_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO NOTHING",
+                on_disk.values(),
+            )
+            stale = [
+                (key,)
+                for key, used_at in db.execute("SELECT key, used_at FROM entries")
+                if (key not in on_disk) and (used_at < scanned_at)
+            ]
+            db.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def flush(self) -> None:
+        """Write the collected use times to the database."""
+        with self._transaction():
+            pass
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+    def _forget(self, key: str) -> None:
+        with self._touched_lock:
+            self._touched.pop(key, None)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            # Take the write lock right away instead of upgrading a read lock
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                with self._touched_lock:
+                    touched, self._touched = self._touched, {}
+                self._db.executemany(
+                    "UPDATE entries SET used_at = MAX(used_at, ?) WHERE key = ?",
+                    [(used_at, key) for key, used_at in touched.items()],
+                )
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
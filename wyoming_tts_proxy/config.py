@@ -1,7 +1,12 @@
-from typing import List, Pattern
+from typing import List, Literal, Pattern
 from pydantic import BaseModel, Field, ConfigDict
 
 
+LoadBalancingPolicy = Literal["failover", "round_robin", "least_outstanding", "ewma"]
+CacheCompression = Literal["none", "zlib", "delta"]
+CacheStore = Literal["files", "segments"]
+
+
 class ReplacementConfig(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
@@ -45,6 +50,146 @@ class ProxyConfig(BaseModel):
         default="/tmp/wyoming_tts_cache", description="Cache directory"
     )
     max_cache_size_mb: int = Field(default=512, description="Maximum cache size in MB")
+    cache_store: CacheStore = Field(
+        default="files",
+        description="Store cache entries as one file each (files) or in append-only pack files with a persisted index (segments)",
+    )
+    cache_segment_size_mb: int = Field(
+        default=64,
+        description="Size at which a new pack file is started with cache_store: segments",
+    )
+    cache_shared: bool = Field(
+        default=False,
+        description="Let several proxy processes share cache_dir, keeping the cache index in SQLite (requires cache_store: files)",
+    )
+    cache_admit_after: int = Field(
+        default=0,
+        description="Only cache audio for a text once it was requested this many times recently, up to 15 (0 = cache everything)",
+    )
+    cache_max_entry_mb: float = Field(
+        default=0,
+        description="Do not cache responses with more audio than this many MB (0 = no limit)",
+    )
+    cache_memory_mb: float = Field(
+        default=0,
+        description="Keep the most recently used cache entries in memory up to this many MB (0 = disabled)",
+    )
+    cache_io_workers: int = Field(
+        default=2,
+        description="Threads that read and write cache entries off the event loop",
+    )
+    cache_compression: CacheCompression = Field(
+        default="none",
+        description="Compress new cache entries: none, zlib, or delta (delta-encoded PCM + zlib, requires numpy)",
+    )
+    prewarm_file: str = Field(
+        default="",
+        description="Optional YAML list of phrases (text, or text and voice) to synthesize into the cache at startup",
+    )
+    prewarm_rate: float = Field(
+        default=1.0,
+        description="Prewarm phrases synthesized per second at most (0 = no limit)",
+    )
+    sentence_cache: bool = Field(
+        default=False,
+        description="Also cache audio per sentence and only synthesize the sentences of a response that are not cached yet (requires cache_enabled)",
+    )
+    coalesce_requests: bool = Field(
+        default=True,
+        description="Share one upstream synthesis between concurrent requests for the same text and voice",
+    )
+    upstream_connect_timeout: float = Field(
+        default=0.0,
+        description="Seconds allowed to connect to an upstream before failing over (0 = no timeout)",
+    )
+    upstream_first_chunk_timeout: float = Field(
+        default=0.0,
+        description="Seconds allowed from sending a request upstream to its first audio chunk (0 = no timeout)",
+    )
+    upstream_chunk_timeout: float = Field(
+        default=0.0,
+        description="Seconds allowed between upstream events after the first audio chunk (0 = no timeout)",
+    )
+    request_timeout: float = Field(
+        default=0.0,
+        description="Total seconds allowed for a synthesis request across all failover attempts (0 = no deadline)",
+    )
+    upstream_pool_size: int = Field(
+        default=0,
+        description="Maximum idle connections kept open per upstream (0 = disabled)",
+    )
+    upstream_max_concurrent: int = Field(
+        default=0,
+        description="Maximum concurrent synthesis requests per upstream (0 = unlimited)",
+    )
+    upstream_queue_size: int = Field(
+        default=0,
+        description="Requests that may wait for a free slot per upstream before spilling to the next upstream",
+    )
+    upstream_pool_idle_timeout: float = Field(
+        default=60.0,
+        description="Seconds an idle pooled upstream connection is kept before being closed",
+    )
+    audio_frame_ms: int = Field(
+        default=0,
+        description="Re-frame audio sent to clients into chunks of this many milliseconds, e.g. 20-100 (0 = forward chunks as received)",
+    )
+    audio_rate: int = Field(
+        default=0,
+        description="Resample upstream audio to this rate in Hz before it is cached and sent (0 = keep upstream rate, requires numpy)",
+    )
+    audio_width: int = Field(
+        default=0,
+        description="Convert upstream audio to this sample width in bytes, 1-4 (0 = keep upstream width, requires numpy)",
+    )
+    audio_channels: int = Field(
+        default=0,
+        description="Downmix (or duplicate mono) upstream audio to this many channels (0 = keep upstream channels, requires numpy)",
+    )
+    client_write_buffer_bytes: int = Field(
+        default=0,
+        description="Batch audio sent to a client into writes of up to this many bytes (0 = write every event on its own)",
+    )
+    client_write_buffer_delay: float = Field(
+        default=0.02,
+        description="Maximum seconds batched audio waits before it is written to the client",
+    )
+    split_sentences: bool = Field(
+        default=False,
+        description="Synthesize each sentence as a separate upstream request and send its audio once the sentence is complete, so a failing upstream only costs the interrupted sentence (not with ssml_template)",
+    )
+    parallel_sentences: int = Field(
+        default=1,
+        description="Sentences synthesized concurrently when split_sentences is enabled (audio is still sent in order)",
+    )
+    load_balancing: LoadBalancingPolicy = Field(
+        default="failover",
+        description="How synthesis requests are spread across upstreams: failover (first URI first), round_robin, least_outstanding or ewma (lowest time to first audio)",
+    )
+    circuit_breaker_threshold: int = Field(
+        default=0,
+        description="Consecutive failures after which an upstream is skipped until its cooldown ends (0 = disabled)",
+    )
+    circuit_breaker_cooldown: float = Field(
+        default=30.0,
+        description="Seconds an upstream is skipped before a probe request is let through",
+    )
+    hedge_requests: bool = Field(
+        default=False,
+        description="Send a request to the next upstream as well if the first one is slow to produce audio",
+    )
+    hedge_percentile: float = Field(
+        default=95.0,
+        description="Percentile of recent time-to-first-audio of an upstream after which its requests are hedged",
+    )
+    hedge_delay: float = Field(
+        default=1.0,
+        description="Seconds to wait before hedging while too few latency samples have been collected",
+    )
+    info_cache_ttl: float = Field(
+        default=60.0,
+        description="Seconds before cached upstream Info is refreshed in the background (0 = disabled)",
+    )
     metrics_port: int = Field(
         default=0, description="Prometheus metrics port (0 = disabled)"
     )
@@ -58,3 +203,7 @@ class ProxyConfig(BaseModel):
         default=False,
         description="Force streaming TTS output even for non-streaming input",
     )
+    incremental_streaming: bool = Field(
+        default=False,
+        description="Forward complete sentences of streaming input upstream as they arrive instead of waiting for SynthesizeStop",
+    )
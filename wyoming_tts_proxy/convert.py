@@ -0,0 +1,215 @@
+import time
+from typing import List, Optional, Tuple
+
+from wyoming.audio import AudioChunk, AudioStart
+from wyoming.event import Event
+
+from .metrics import AUDIO_CONVERSION_TIME
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the installed extras
+    np = None
+
+AudioFormat = Tuple[int, int, int]
+
+SUPPORTED_WIDTHS = (1, 2, 3, 4)
+# Length of the FIR low-pass filter applied before downsampling
+LOW_PASS_TAPS = 63
+
+
+class AudioConverter:
+    """Convert audio events to a fixed rate, sample width and channel count.
+
+    AudioStart and AudioChunk events are rewritten to the target format, any
+    part of which may be 0 to keep the upstream value. Samples are converted
+    with NumPy: channels are downmixed by averaging (or a mono stream is
+    duplicated), the rate is changed by linear interpolation that carries over
+    between chunks, and widths are rescaled (1 byte audio is unsigned, as in
+    WAV). Before downsampling the audio goes through a windowed-sinc low-pass
+    filter at the target Nyquist frequency, so higher frequencies do not
+    alias; the filter delays the audio by ``LOW_PASS_TAPS // 2`` source
+    frames, which are cut from the end of the stream. Chunks that are
+    already in the target format are passed through untouched. With every
+    target set to 0 the converter is disabled.
+    """
+
+    def __init__(self, rate: int = 0, width: int = 0, channels: int = 0):
+        self.rate = rate
+        self.width = width
+        self.channels = channels
+        self.enabled = bool(rate or width or channels)
+
+        if self.enabled and (np is None):
+            raise RuntimeError(
+                "Audio format conversion requires numpy, install wyoming-tts-proxy[audio]"
+            )
+        if width and (width not in SUPPORTED_WIDTHS):
+            raise ValueError(f"Unsupported target sample width: {width}")
+
+        self._format: Optional[AudioFormat] = None
+        # Bytes of an incomplete frame left over from the previous chunk
+        self._partial = b""
+        # Last input frame and position of the next output frame relative to it
+        self._last = None
+        self._position = 0.0
+        # Low-pass filter for downsampling and the input frames it still needs
+        self._kernel = None
+        self._history = None
+
+    def target_format(self, audio_format: AudioFormat) -> AudioFormat:
+        rate, width, channels = audio_format
+        return (self.rate or rate, self.width or width, self.channels or channels)
+
+    def process(self, event: Event) -> List[Event]:
+        """Return the events to send in place of event."""
+        if not self.enabled:
+            return [event]
+
+        if AudioStart.is_type(event.type):
+            start = AudioStart.from_event(event)
+            rate, width, channels = self.target_format(
+                (start.rate, start.width, start.channels)
+            )
+            if (rate, width, channels) == (start.rate, start.width, start.channels):
+                return [event]
+            return [
+                AudioStart(
+                    rate=rate, width=width, channels=channels, timestamp=start.timestamp
+                ).event()
+            ]
+
+        if not AudioChunk.is_type(event.type):
+            return [event]
+
+        chunk = AudioChunk.from_event(event)
+        audio_format = (chunk.rate, chunk.width, chunk.channels)
+        target = self.target_format(audio_format)
+        if audio_format != self._format:
+            self._reset(audio_format)
+        if (audio_format == target) and (not self._partial):
+            return [event]
+
+        started_at = time.perf_counter()
+        audio = self._convert(chunk.audio, audio_format, target)
+        AUDIO_CONVERSION_TIME.observe(time.perf_counter() - started_at)
+        if not audio:
+            return []
+
+        rate, width, channels = target
+        return [
+            AudioChunk(
+                rate=rate,
+                width=width,
+                channels=channels,
+                audio=audio,
+                timestamp=chunk.timestamp,
+            ).event()
+        ]
+
+    def _reset(self, audio_format: AudioFormat) -> None:
+        if audio_format[1] not in SUPPORTED_WIDTHS:
+            raise ValueError(f"Unsupported upstream sample width: {audio_format[1]}")
+        self._format = audio_format
+        self._partial = b""
+        self._last = None
+        self._position = 0.0
+        self._kernel = None
+        self._history = None
+
+    def _convert(self, audio: bytes, source: AudioFormat, target: AudioFormat) -> bytes:
+        rate, width, channels = source
+        target_rate, target_width, target_channels = target
+
+        frame_bytes = width * channels
+        data = self._partial + bytes(audio)
+        usable = len(data) - (len(data) % frame_bytes)
+        self._partial = data[usable:]
+        if not usable:
+            return b""
+
+        samples = _decode(data[:usable], width).reshape(-1, channels)
+        if channels != target_channels:
+            if target_channels == 1:
+                samples = samples.mean(axis=1, keepdims=True)
+            elif channels == 1:
+                samples = np.repeat(samples, target_channels, axis=1)
+            else:
+                raise ValueError(
+                    f"Cannot convert {channels} channels to {target_channels}"
+                )
+
+        if rate > target_rate:
+            samples = self._low_pass(samples, target_rate / rate)
+        if rate != target_rate:
+            samples = self._resample(samples, rate / target_rate)
+
+        return _encode(samples, target_width)
+
+    def _low_pass(self, samples, cutoff: float):
+        """Remove frequencies above cutoff (a fraction of the source rate / 2)."""
+        if self._kernel is None:
+            positions = np.arange(LOW_PASS_TAPS) - (LOW_PASS_TAPS - 1) / 2
+            kernel = np.sinc(cutoff * positions) * np.hamming(LOW_PASS_TAPS)
+            self._kernel = kernel / kernel.sum()
+            self._history = np.zeros((LOW_PASS_TAPS - 1, samples.shape[1]))
+
+        # Filter with the frames kept from the previous chunk in front
+        padded = np.concatenate((self._history, samples))
+        self._history = padded[len(samples) :]
+        return np.stack(
+            [
+                np.convolve(padded[:, channel], self._kernel, mode="valid")
+                for channel in range(samples.shape[1])
+            ],
+            axis=1,
+        )
+
+    def _resample(self, samples, step: float):
+        if self._last is not None:
+            samples = np.concatenate((self._last, samples))
+        last_index = len(samples) - 1
+        if last_index < self._position:
+            self._last = samples[-1:]
+            self._position -= last_index
+            return samples[:0]
+
+        count = int((last_index - self._position) // step) + 1
+        positions = self._position + step * np.arange(count)
+        index = np.minimum(positions.astype(np.int64), last_index)
+        upper = np.minimum(index + 1, last_index)
+        fraction = (positions - index)[:, np.newaxis]
+        resampled = samples[index] * (1.0 - fraction) + samples[upper] * fraction
+
+        # Continue from the last input frame with the next chunk
+        self._last = samples[-1:]
+        self._position = self._position + (count * step) - last_index
+        return resampled
+
+
+def _decode(data: bytes, width: int):
+    """Decode little-endian PCM into float samples in [-1, 1)."""
+    if width == 1:
+        return (np.frombuffer(data, dtype=np.uint8).astype(np.float64) - 128) / 128
+    if width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = (values ^ 0x800000) - 0x800000
+        return values / float(1 << 23)
+
+    samples = np.frombuffer(data, dtype=f"<i{width}").astype(np.float64)
+    return samples / float(1 << (8 * width - 1))
+
+
+def _encode(samples, width: int) -> bytes:
+    """Encode float samples in [-1, 1) into little-endian PCM."""
+    scale = 1 << (8 * width - 1)
+    values = np.clip(np.rint(samples.reshape(-1) * scale), -scale, scale - 1)
+    if width == 1:
+        return (values + 128).astype(np.uint8).tobytes()
+    if width == 3:
+        values = values.astype(np.int32)
+        raw = np.stack((values & 0xFF, (values >> 8) & 0xFF, (values >> 16) & 0xFF))
+        return raw.T.astype(np.uint8).tobytes()
+
+    return values.astype(f"<i{width}").tobytes()
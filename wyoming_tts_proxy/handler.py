@@ -1,6 +1,7 @@
 import logging
 import asyncio
 import time
+from typing import AsyncIterator, Optional
 
 from wyoming.audio import AudioChunk, AudioStart, AudioStop
 from wyoming.event import Event
@@ -14,14 +15,21 @@ from wyoming.tts import (
     SynthesizeStopped,
 )
 from wyoming.server import AsyncEventHandler
-from wyoming.client import AsyncClient
 
 from .metrics import (
     REQUESTS_TOTAL,
     CACHE_HITS_TOTAL,
-    UPSTREAM_FAILURES_TOTAL,
-    TTS_LATENCY,
+    STREAMING_FIRST_AUDIO_LATENCY,
 )
+from .health import UpstreamHealth
+from .info import InfoCache
+from .pool import UpstreamPool
+from .convert import AudioConverter
+from .reframe import AudioReframer
+from .sentences import SentenceBuffer
+from .streaming import IncrementalSynthesis
+from .synthesizer import UpstreamSynthesizer
+from .writer import BufferedEventWriter
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -37,9 +45,30 @@ class TTSProxyEventHandler(AsyncEventHandler):
         self.text_normalizer = kwargs.pop("text_normalizer")
         self.cache = kwargs.pop("cache")
         self.config = kwargs.pop("config")
+        self.pool = kwargs.pop("pool", None) or UpstreamPool()
+        self.health = kwargs.pop("health", None) or UpstreamHealth(
+            failure_threshold=self.config.circuit_breaker_threshold,
+            cooldown=self.config.circuit_breaker_cooldown,
+        )
+        self.info_cache = kwargs.pop("info_cache", None) or InfoCache(
+            self.upstream_uris,
+            self.pool,
+            self.proxy_program_info,
+            ttl=self.config.info_cache_ttl,
+            health=self.health,
+        )
+        self.synthesizer = kwargs.pop("synthesizer", None) or UpstreamSynthesizer(
+            self.upstream_uris, self.config, self.cache, self.pool, self.health
+        )
 
         super().__init__(reader, writer, **kwargs)
 
+        self.event_writer = BufferedEventWriter(
+            writer,
+            max_bytes=self.config.client_write_buffer_bytes,
+            max_delay=self.config.client_write_buffer_delay,
+        )
+
         try:
             self.client_address = writer.get_extra_info("peername")
         except Exception:
@@ -50,12 +79,22 @@ class TTSProxyEventHandler(AsyncEventHandler):
         self.streaming_voice = None
         self.streaming_context = None
         self.streaming_text_chunks = []
+        self.streaming_start_time = None
+        self.streaming_session = None
+        self.sentence_buffer = None
+        self.streaming_normalized_length = 0
 
         _LOGGER.info(
             f"TTSProxyEventHandler initialized for client {self.client_address}. "
             f"Upstreams: {self.upstream_uris}"
         )
 
+    async def write_event(self, event: Event) -> None:
+        if self.event_writer.enabled:
+            await self.event_writer.write_event(event)
+        else:
+            await super().write_event(event)
+
     async def handle_event(self, event: Event) -> bool:
         _LOGGER.debug(f"Received event from client {self.client_address}: {event.type}")
         if Describe.is_type(event.type):
@@ -80,53 +119,13 @@ class TTSProxyEventHandler(AsyncEventHandler):
 
     async def _handle_describe(self, event: Event) -> bool:
         _LOGGER.debug(f"Handling Describe event from client {self.client_address}.")
-        for uri in self.upstream_uris:
-            try:
-                async with AsyncClient.from_uri(uri) as upstream_client:
-                    _LOGGER.debug(f"Sending Describe to upstream TTS: {uri}")
-                    await upstream_client.write_event(Describe().event())
-
-                    upstream_response = await upstream_client.read_event()
-                    if upstream_response and Info.is_type(upstream_response.type):
-                        upstream_info = Info.from_event(upstream_response)
-                        _LOGGER.debug(
-                            f"Received Info from upstream TTS ({uri}): {upstream_info.event().payload}"
-                        )
-
-                        modified_tts_programs = []
-                        if upstream_info.tts:
-                            for prog in upstream_info.tts:
-                                new_prog = TtsProgram(
-                                    name=f"{prog.name} (via {self.proxy_program_info['name']})",
-                                    description=prog.description,
-                                    attribution=prog.attribution,
-                                    installed=prog.installed,
-                                    version=prog.version,
-                                    voices=prog.voices or [],
-                                    supports_synthesize_streaming=prog.supports_synthesize_streaming,
-                                )
-                                modified_tts_programs.append(new_prog)
-
-                        final_info = Info(
-                            asr=upstream_info.asr,
-                            tts=modified_tts_programs,
-                            handle=upstream_info.handle,
-                            intent=upstream_info.intent,
-                            wake=upstream_info.wake,
-                            mic=upstream_info.mic,
-                            snd=upstream_info.snd,
-                            satellite=upstream_info.satellite,
-                        )
-                        await self.write_event(final_info.event())
-                        _LOGGER.debug(
-                            f"Sent modified Info to client: {final_info.event().payload}"
-                        )
-                        return True
-            except Exception as e:
-                _LOGGER.warning(f"Failed to get Describe from upstream {uri}: {e}")
-                UPSTREAM_FAILURES_TOTAL.labels(uri=uri).inc()
-
-        # Fallback if all upstreams fail
+        final_info = await self.info_cache.get()
+        if final_info is not None:
+            await self.write_event(final_info.event())
+            _LOGGER.debug(f"Sent modified Info to client: {final_info.event().payload}")
+            return True
+
+        # Fallback if no upstream has answered Describe yet
         _LOGGER.warning("All upstreams failed for Describe. Sending basic proxy info.")
         basic_proxy_info_event = Info(
             tts=[
@@ -147,6 +146,11 @@ class TTSProxyEventHandler(AsyncEventHandler):
         return True
 
     async def _handle_synthesize(self, event: Event) -> bool:
+        if self.is_streaming:
+            # Streaming clients also send the full text for backwards compatibility
+            _LOGGER.debug("Ignoring Synthesize received during a streaming session")
+            return True
+
         REQUESTS_TOTAL.inc()
         synthesize_event = Synthesize.from_event(event)
         original_text = synthesize_event.text
@@ -161,81 +165,81 @@ class TTSProxyEventHandler(AsyncEventHandler):
             return True
 
         # Check Cache
-        cached_events = self.cache.get(normalized_text, synthesize_event.voice)
-        if cached_events:
-            CACHE_HITS_TOTAL.inc()
-            for ev in cached_events:
-                await self.write_event(ev)
+        cached_events = await self.cache.stream_async(
+            normalized_text, synthesize_event.voice
+        )
+        if (cached_events is not None) and await self._replay_cached(cached_events):
             return True
 
-        # Wrap in SSML if configured
-        final_text = normalized_text
-        if self.config.ssml_template:
-            final_text = self.config.ssml_template.replace("{{text}}", normalized_text)
-            _LOGGER.debug(f"SSML wrapped text: {final_text}")
-
         # Check if we should force streaming (from --stream-tts flag or config)
         force_streaming = (
             getattr(self.cli_args, "stream_tts", False) or self.config.stream_tts
         )
 
-        # Try upstreams with failover
-        start_time = time.perf_counter()
-        first_chunk_sent = False
-
-        for uri in self.upstream_uris:
-            try:
-                events_to_cache = []
-                async with AsyncClient.from_uri(uri) as upstream_client:
-                    # Send as streaming if forced, otherwise send as regular synthesize
-                    if force_streaming:
-                        _LOGGER.debug(f"Forcing streaming mode to upstream {uri}")
-                        await upstream_client.write_event(
-                            SynthesizeStart(voice=synthesize_event.voice).event()
-                        )
-                        await upstream_client.write_event(
-                            SynthesizeChunk(text=final_text).event()
-                        )
-                        await upstream_client.write_event(SynthesizeStop().event())
-                    else:
-                        proxied_synthesize = Synthesize(
-                            text=final_text, voice=synthesize_event.voice
-                        ).event()
-                        await upstream_client.write_event(proxied_synthesize)
-
-                    while True:
-                        upstream_event = await upstream_client.read_event()
-                        if upstream_event is None:
-                            break
-
-                        events_to_cache.append(upstream_event)
-                        await self.write_event(upstream_event)
-
-                        if not first_chunk_sent and AudioChunk.is_type(
-                            upstream_event.type
-                        ):
-                            TTS_LATENCY.observe(time.perf_counter() - start_time)
-                            first_chunk_sent = True
-
-                        if (
-                            AudioStop.is_type(upstream_event.type)
-                            or Error.is_type(upstream_event.type)
-                            or SynthesizeStopped.is_type(upstream_event.type)
-                        ):
-                            break
-
-                    self.cache.set(
-                        normalized_text, synthesize_event.voice, events_to_cache
-                    )
-                    return True
-            except Exception as e:
-                _LOGGER.warning(f"Upstream {uri} failed for Synthesize: {e}")
-                UPSTREAM_FAILURES_TOTAL.labels(uri=uri).inc()
+        if await self._synthesize_upstream(
+            normalized_text, synthesize_event.voice, streaming=force_streaming
+        ):
+            return True
 
         _LOGGER.error("All upstreams failed for Synthesize.")
         await self.write_event(Error(text="All upstream TTS services failed.").event())
         return True
 
+    async def _synthesize_upstream(
+        self,
+        normalized_text: str,
+        voice: Optional[str],
+        streaming: bool,
+        stream_start_time: Optional[float] = None,
+    ) -> bool:
+        """Forward upstream audio for text to the client.
+
+        Returns False if every upstream failed.
+        """
+        request = self.synthesizer.synthesize(normalized_text, voice, streaming)
+
+        first_chunk_sent = False
+        async for upstream_event in request.subscribe():
+            await self.write_event(upstream_event)
+
+            if (
+                not first_chunk_sent
+                and (stream_start_time is not None)
+                and AudioChunk.is_type(upstream_event.type)
+            ):
+                STREAMING_FIRST_AUDIO_LATENCY.labels(mode="buffered").observe(
+                    time.perf_counter() - stream_start_time
+                )
+                first_chunk_sent = True
+
+        return not request.failed
+
+    async def _replay_cached(self, cached_events: AsyncIterator[Event]) -> bool:
+        """Send a cache entry to the client as it is read.
+
+        Returns False if the entry could not be read at all. An entry that
+        breaks off part way is closed with an AudioStop.
+        """
+        reframer = AudioReframer(self.config.audio_frame_ms)
+        replayed = False
+        audio_open = False
+        async for cached_event in cached_events:
+            if not replayed:
+                CACHE_HITS_TOTAL.inc()
+                replayed = True
+            if AudioStart.is_type(cached_event.type):
+                audio_open = True
+            elif AudioStop.is_type(cached_event.type):
+                audio_open = False
+            for ev in reframer.process(cached_event):
+                await self.write_event(ev)
+
+        for ev in reframer.flush():
+            await self.write_event(ev)
+        if audio_open:
+            await self.write_event(AudioStop().event())
+        return replayed
+
     async def _send_empty_audio(self):
         _LOGGER.warning("Text became empty after normalization.")
         await self.write_event(AudioStart(rate=16000, width=2, channels=1).event())
@@ -253,6 +257,40 @@ class TTSProxyEventHandler(AsyncEventHandler):
         self.streaming_voice = synthesize_start.voice
         self.streaming_context = synthesize_start.context
         self.streaming_text_chunks = []
+        self.streaming_start_time = time.perf_counter()
+
+        # Have a warm connection ready by the time text needs to go upstream
+        self.pool.prewarm(self.synthesizer.balancer.preferred())
+
+        if self.streaming_session is not None:
+            await self.streaming_session.abort()
+            self.streaming_session = None
+
+        if self.config.incremental_streaming:
+            if self.config.ssml_template:
+                # An SSML document cannot be split across sentences
+                _LOGGER.debug("SSML template configured, buffering streaming text")
+            else:
+                self.sentence_buffer = SentenceBuffer()
+                self.streaming_session = IncrementalSynthesis(
+                    self.synthesizer.balancer.order(),
+                    self.pool,
+                    self.streaming_voice,
+                    self.write_event,
+                    self.streaming_start_time,
+                    health=self.health,
+                    frame_ms=self.config.audio_frame_ms,
+                    converter=AudioConverter(
+                        self.config.audio_rate,
+                        self.config.audio_width,
+                        self.config.audio_channels,
+                    ),
+                    connect_timeout=self.config.upstream_connect_timeout,
+                    first_chunk_timeout=self.config.upstream_first_chunk_timeout,
+                    chunk_timeout=self.config.upstream_chunk_timeout,
+                    request_timeout=self.config.request_timeout,
+                )
+                self.streaming_normalized_length = 0
 
         return True
 
@@ -273,8 +311,30 @@ class TTSProxyEventHandler(AsyncEventHandler):
         # Accumulate text chunks
         self.streaming_text_chunks.append(synthesize_chunk.text)
 
+        if self.streaming_session is not None:
+            for sentence in self.sentence_buffer.add(synthesize_chunk.text):
+                await self._send_incremental_sentence(self.streaming_session, sentence)
+
         return True
 
+    async def _send_incremental_sentence(
+        self, session: IncrementalSynthesis, sentence: str
+    ) -> None:
+        normalized_sentence = self.text_normalizer.normalize(sentence)
+        if not normalized_sentence:
+            return
+
+        max_length = self.config.max_text_length
+        if max_length > 0:
+            remaining = max_length - self.streaming_normalized_length
+            if remaining <= 0:
+                return
+            normalized_sentence = normalized_sentence[:remaining]
+        self.streaming_normalized_length += len(normalized_sentence) + 1
+
+        _LOGGER.debug(f"Forwarding sentence upstream: '{normalized_sentence[:50]}'")
+        await session.send(normalized_sentence)
+
     async def _handle_synthesize_stop(self, event: Event) -> bool:
         """Handle end of streaming synthesize request."""
         if not self.is_streaming:
@@ -302,71 +362,42 @@ class TTSProxyEventHandler(AsyncEventHandler):
         # Reset streaming state
         self.is_streaming = False
         voice = self.streaming_voice
+        stream_start_time = self.streaming_start_time
+        session = self.streaming_session
         self.streaming_voice = None
         self.streaming_context = None
         self.streaming_text_chunks = []
+        self.streaming_session = None
+
+        if session is not None:
+            remainder = self.sentence_buffer.flush()
+            if remainder:
+                await self._send_incremental_sentence(session, remainder)
+
+            if session.started or session.failed:
+                # The cache was not looked up for the incremental stream
+                self.cache.record_request(normalized_text, voice)
+                if await session.finish():
+                    self.cache.set_background(normalized_text, voice, session.events)
+                return True
 
         if not normalized_text:
             await self._send_empty_audio()
             return True
 
         # Check Cache
-        cached_events = self.cache.get(normalized_text, voice)
-        if cached_events:
-            CACHE_HITS_TOTAL.inc()
-            for ev in cached_events:
-                await self.write_event(ev)
+        cached_events = await self.cache.stream_async(normalized_text, voice)
+        if (cached_events is not None) and await self._replay_cached(cached_events):
             return True
 
-        # Wrap in SSML if configured
-        final_text = normalized_text
-        if self.config.ssml_template:
-            final_text = self.config.ssml_template.replace("{{text}}", normalized_text)
-            _LOGGER.debug(f"SSML wrapped text: {final_text}")
-
         # Try upstreams with failover - using streaming synthesis
-        start_time = time.perf_counter()
-        first_chunk_sent = False
-
-        for uri in self.upstream_uris:
-            try:
-                events_to_cache = []
-                async with AsyncClient.from_uri(uri) as upstream_client:
-                    # Send as streaming to upstream
-                    await upstream_client.write_event(
-                        SynthesizeStart(voice=voice).event()
-                    )
-                    await upstream_client.write_event(
-                        SynthesizeChunk(text=final_text).event()
-                    )
-                    await upstream_client.write_event(SynthesizeStop().event())
-
-                    while True:
-                        upstream_event = await upstream_client.read_event()
-                        if upstream_event is None:
-                            break
-
-                        events_to_cache.append(upstream_event)
-                        await self.write_event(upstream_event)
-
-                        if not first_chunk_sent and AudioChunk.is_type(
-                            upstream_event.type
-                        ):
-                            TTS_LATENCY.observe(time.perf_counter() - start_time)
-                            first_chunk_sent = True
-
-                        if (
-                            AudioStop.is_type(upstream_event.type)
-                            or Error.is_type(upstream_event.type)
-                            or SynthesizeStopped.is_type(upstream_event.type)
-                        ):
-                            break
-
-                    self.cache.set(normalized_text, voice, events_to_cache)
-                    return True
-            except Exception as e:
-                _LOGGER.warning(f"Upstream {uri} failed for streaming Synthesize: {e}")
-                UPSTREAM_FAILURES_TOTAL.labels(uri=uri).inc()
+        if await self._synthesize_upstream(
+            normalized_text,
+            voice,
+            streaming=True,
+            stream_start_time=stream_start_time,
+        ):
+            return True
 
         _LOGGER.error("All upstreams failed for streaming Synthesize.")
         await self.write_event(Error(text="All upstream TTS services failed.").event())
@@ -374,5 +405,11 @@ class TTSProxyEventHandler(AsyncEventHandler):
         await self.write_event(SynthesizeStopped().event())
         return True
 
+    async def disconnect(self) -> None:
+        if self.streaming_session is not None:
+            await self.streaming_session.abort()
+            self.streaming_session = None
+        await self.event_writer.close()
+
 
 # --- END OF FILE handler.py ---
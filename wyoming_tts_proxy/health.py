@@ -0,0 +1,126 @@
+import logging
+import time
+from typing import Dict, Optional
+
+from .metrics import UPSTREAM_BREAKER_STATE
+
+_LOGGER = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Values exported on the breaker state gauge
+_STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitBreaker:
+    """Health state machine of one upstream.
+
+    The breaker opens after ``failure_threshold`` consecutive failures, and
+    requests skip the upstream while it is open. After ``cooldown`` seconds it
+    becomes half-open and lets a single probe request through: success closes
+    it again, failure re-opens it for another cooldown.
+    """
+
+    def __init__(self, uri: str, failure_threshold: int, cooldown: float):
+        self.uri = uri
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+
+        UPSTREAM_BREAKER_STATE.labels(uri=uri).set(_STATE_VALUES[CLOSED])
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent to the upstream now."""
+        if self.state == CLOSED:
+            return True
+
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._opened_at < self.cooldown:
+                return False
+            self._set_state(HALF_OPEN)
+
+        # Half-open: one probe at a time. A probe whose outcome was never
+        # recorded stops blocking others after a cooldown.
+        if (self._probe_started_at is not None) and (
+            now - self._probe_started_at < self.cooldown
+        ):
+            return False
+
+        self._probe_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_started_at = None
+        if self.state != CLOSED:
+            _LOGGER.info(f"Upstream {self.uri} recovered, closing circuit breaker")
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_started_at = None
+        if (self.state == HALF_OPEN) or (self.failures >= self.failure_threshold):
+            if self.state != OPEN:
+                _LOGGER.warning(
+                    f"Opening circuit breaker for upstream {self.uri} after {self.failures} failure(s)"
+                )
+                self._set_state(OPEN)
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Forget a request that ended without a success or failure outcome."""
+        self._probe_started_at = None
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        UPSTREAM_BREAKER_STATE.labels(uri=self.uri).set(_STATE_VALUES[state])
+
+
+class UpstreamHealth:
+    """Circuit breakers for all upstream URIs.
+
+    With ``failure_threshold=0`` breakers are disabled and every upstream is
+    always tried.
+    """
+
+    def __init__(self, failure_threshold: int = 0, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.enabled = failure_threshold > 0
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, uri: str) -> CircuitBreaker:
+        breaker = self._breakers.get(uri)
+        if breaker is None:
+            breaker = CircuitBreaker(uri, self.failure_threshold, self.cooldown)
+            self._breakers[uri] = breaker
+        return breaker
+
+    def allow(self, uri: str) -> bool:
+        if not self.enabled:
+            return True
+
+        if self.breaker(uri).allow():
+            return True
+
+        _LOGGER.debug(f"Skipping upstream {uri}, circuit breaker is open")
+        return False
+
+    def record_success(self, uri: str) -> None:
+        if self.enabled:
+            self.breaker(uri).record_success()
+
+    def record_failure(self, uri: str) -> None:
+        if self.enabled:
+            self.breaker(uri).record_failure()
+
+    def release(self, uri: str) -> None:
+        if self.enabled:
+            self.breaker(uri).release()
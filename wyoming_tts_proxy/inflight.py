@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Tuple
+
+from wyoming.event import Event
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class InFlightRequest:
+    """Event stream of one upstream synthesis, shared by every subscriber.
+
+    Subscribers replay the events published so far and then follow new ones
+    until the request is finished.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Event] = []
+        self.done = False
+        self.failed = False
+        self._updated = asyncio.Event()
+
+    def publish(self, event: Event) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, failed: bool = False) -> None:
+        self.failed = failed
+        self.done = True
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Event]:
+        index = 0
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+
+            if self.done:
+                return
+
+            await self._updated.wait()
+
+    def _notify(self) -> None:
+        updated = self._updated
+        self._updated = asyncio.Event()
+        updated.set()
+
+
+class InFlightTable:
+    """Table of running upstream requests, so identical requests only run once."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._requests: Dict[str, InFlightRequest] = {}
+
+    def join(self, key: str) -> Tuple[InFlightRequest, bool]:
+        """Return the running request for key, and whether the caller must drive it."""
+        if self.enabled:
+            request = self._requests.get(key)
+            if request is not None:
+                _LOGGER.debug(f"Joining in-flight request for text hash: {key}")
+                return request, False
+
+        request = InFlightRequest(key)
+        if self.enabled:
+            self._requests[key] = request
+        return request, True
+
+    def remove(self, request: InFlightRequest) -> None:
+        if self._requests.get(request.key) is request:
+            del self._requests[request.key]
@@ -0,0 +1,149 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from wyoming.info import Describe, Info, TtsProgram
+
+from .health import UpstreamHealth
+from .metrics import UPSTREAM_FAILURES_TOTAL
+from .pool import UpstreamPool
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class InfoCache:
+    """In-process cache of the rewritten upstream Info.
+
+    The first request waits for upstream. After that the cached Info is served
+    immediately, and a refresh runs in the background once it is older than
+    ``ttl`` seconds, so a slow upstream never stalls Describe. With ``ttl=0``
+    the cache is disabled and every call queries upstream.
+    """
+
+    def __init__(
+        self,
+        upstream_uris: List[str],
+        pool: UpstreamPool,
+        proxy_program_info: Dict[str, Any],
+        ttl: float = 60.0,
+        health: Optional[UpstreamHealth] = None,
+    ):
+        self.upstream_uris = upstream_uris
+        self.pool = pool
+        self.proxy_program_info = proxy_program_info
+        self.ttl = ttl
+        self.health = health or UpstreamHealth()
+        self.enabled = ttl > 0
+
+        self._info: Optional[Info] = None
+        self._fetched_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._background_task: Optional[asyncio.Task] = None
+
+    async def get(self) -> Optional[Info]:
+        """Return the proxied Info, or None if no upstream has ever answered."""
+        if not self.enabled:
+            return await self._fetch()
+
+        if self._info is None:
+            return await self.refresh()
+
+        if time.monotonic() - self._fetched_at > self.ttl:
+            _LOGGER.debug("Cached upstream Info is stale, serving it while refreshing")
+            self._start_refresh()
+
+        return self._info
+
+    async def refresh(self) -> Optional[Info]:
+        """Fetch Info from upstream, sharing a refresh that is already running."""
+        return await asyncio.shield(self._start_refresh())
+
+    def start(self) -> None:
+        """Fetch Info now and keep refreshing it every ``ttl`` seconds."""
+        if self.enabled and (self._background_task is None):
+            self._background_task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        for task in (self._background_task, self._refresh_task):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await task
+        self._background_task = None
+        self._refresh_task = None
+
+    def _start_refresh(self) -> asyncio.Task:
+        if (self._refresh_task is None) or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._update())
+        return self._refresh_task
+
+    async def _update(self) -> Optional[Info]:
+        info = await self._fetch()
+        if info is not None:
+            self._info = info
+            self._fetched_at = time.monotonic()
+        elif self._info is not None:
+            _LOGGER.warning("All upstreams failed for Describe, keeping cached Info")
+        return self._info
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.ttl)
+
+    async def _fetch(self) -> Optional[Info]:
+        for uri in self.upstream_uris:
+            if not self.health.allow(uri):
+                continue
+
+            try:
+                async with self.pool.connection(uri) as upstream_client:
+                    _LOGGER.debug(f"Sending Describe to upstream TTS: {uri}")
+                    await upstream_client.write_event(Describe().event())
+
+                    upstream_response = await upstream_client.read_event()
+                    if not (upstream_response and Info.is_type(upstream_response.type)):
+                        self.pool.discard(upstream_client)
+                        self.health.release(uri)
+                        continue
+
+                    upstream_info = Info.from_event(upstream_response)
+                    _LOGGER.debug(
+                        f"Received Info from upstream TTS ({uri}): {upstream_info.event().payload}"
+                    )
+                    self.health.record_success(uri)
+                    return self._rewrite(upstream_info)
+            except Exception as e:
+                _LOGGER.warning(f"Failed to get Describe from upstream {uri}: {e}")
+                UPSTREAM_FAILURES_TOTAL.labels(uri=uri).inc()
+                self.health.record_failure(uri)
+
+        return None
+
+    def _rewrite(self, upstream_info: Info) -> Info:
+        modified_tts_programs = []
+        if upstream_info.tts:
+            for prog in upstream_info.tts:
+                new_prog = TtsProgram(
+                    name=f"{prog.name} (via {self.proxy_program_info['name']})",
+                    description=prog.description,
+                    attribution=prog.attribution,
+                    installed=prog.installed,
+                    version=prog.version,
+                    voices=prog.voices or [],
+                    supports_synthesize_streaming=prog.supports_synthesize_streaming,
+                )
+                modified_tts_programs.append(new_prog)
+
+        return Info(
+            asr=upstream_info.asr,
+            tts=modified_tts_programs,
+            handle=upstream_info.handle,
+            intent=upstream_info.intent,
+            wake=upstream_info.wake,
+            mic=upstream_info.mic,
+            snd=upstream_info.snd,
+            satellite=upstream_info.satellite,
+        )
@@ -0,0 +1,44 @@
+import math
+import time
+from collections import deque
+from typing import Optional
+
+
+class LatencyWindow:
+    """Sliding window of recent latency samples for one upstream.
+
+    Also keeps an exponentially weighted moving average (EWMA) of all samples,
+    where ``alpha`` is the weight of the newest one, and the time it was last
+    updated.
+    """
+
+    def __init__(self, size: int = 100, min_samples: int = 20, alpha: float = 0.3):
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self.updated_at = 0.0
+        self._samples = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.penalize(seconds)
+
+    def penalize(self, seconds: float) -> None:
+        """Update only the EWMA, e.g. with a penalty for a failed request."""
+        if self.ewma is None:
+            self.ewma = seconds
+        else:
+            self.ewma = self.alpha * seconds + (1 - self.alpha) * self.ewma
+        self.updated_at = time.monotonic()
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return the given percentile, or None until enough samples exist."""
+        if len(self._samples) < self.min_samples:
+            return None
+
+        ordered = sorted(self._samples)
+        index = math.ceil(percent / 100 * len(ordered)) - 1
+        return ordered[min(max(index, 0), len(ordered) - 1)]
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional
+
+from .metrics import (
+    UPSTREAM_QUEUE_DEPTH,
+    UPSTREAM_QUEUE_REJECTED_TOTAL,
+    UPSTREAM_QUEUE_TIME,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class UpstreamSlot:
+    """A reserved place in an upstream's concurrency limit.
+
+    The slot is either granted already or waiting in the upstream's queue.
+    ``release()`` must be called once the request is done, whether or not the
+    slot was ever granted.
+    """
+
+    def __init__(self, limiter: "UpstreamLimiter", uri: str, granted: asyncio.Future):
+        self.limiter = limiter
+        self.uri = uri
+        self._granted = granted
+        self._queued_at = time.perf_counter()
+        self._released = False
+
+    async def acquire(self) -> None:
+        """Wait until the slot is granted."""
+        if not self._granted.done():
+            _LOGGER.debug(f"Waiting for a free slot on upstream {self.uri}")
+        await self._granted
+        UPSTREAM_QUEUE_TIME.labels(uri=self.uri).observe(
+            time.perf_counter() - self._queued_at
+        )
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+
+        if self._granted.done() and not self._granted.cancelled():
+            self.limiter._release(self.uri)
+        else:
+            self._granted.cancel()
+            self.limiter._dequeue(self.uri, self._granted)
+
+
+class UpstreamLimiter:
+    """Per-URI limit on concurrent upstream requests, with a bounded wait queue.
+
+    At most ``max_concurrent`` requests run on an upstream at once, and up to
+    ``max_queue`` more wait for a free slot in arrival order. When the queue is
+    full, ``reserve()`` returns None so the caller can spill the request to
+    another upstream. With ``max_concurrent=0`` the limiter is disabled.
+    """
+
+    def __init__(self, max_concurrent: int = 0, max_queue: int = 0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.enabled = max_concurrent > 0
+
+        self._active: Dict[str, int] = defaultdict(int)
+        self._waiters: Dict[str, Deque[asyncio.Future]] = defaultdict(deque)
+
+    def reserve(self, uri: str) -> Optional[UpstreamSlot]:
+        """Reserve a slot on the upstream, or return None if its queue is full."""
+        granted = asyncio.get_running_loop().create_future()
+        if (not self.enabled) or (self._active[uri] < self.max_concurrent):
+            self._active[uri] += 1
+            granted.set_result(None)
+            return UpstreamSlot(self, uri, granted)
+
+        waiters = self._waiters[uri]
+        if len(waiters) >= self.max_queue:
+            _LOGGER.debug(f"Wait queue of upstream {uri} is full")
+            UPSTREAM_QUEUE_REJECTED_TOTAL.labels(uri=uri).inc()
+            return None
+
+        waiters.append(granted)
+        UPSTREAM_QUEUE_DEPTH.labels(uri=uri).set(len(waiters))
+        return UpstreamSlot(self, uri, granted)
+
+    def available(self, uri: str) -> Optional[int]:
+        """Return how many more requests the upstream can take, running or queued.
+
+        Returns None if the limiter is disabled.
+        """
+        if not self.enabled:
+            return None
+        free = self.max_concurrent - self._active[uri]
+        return max(free, 0) + self.max_queue - len(self._waiters[uri])
+
+    def _release(self, uri: str) -> None:
+        waiters = self._waiters[uri]
+        while waiters:
+            granted = waiters.popleft()
+            if not granted.done():
+                # Hand the slot straight to the next waiting request
+                granted.set_result(None)
+                UPSTREAM_QUEUE_DEPTH.labels(uri=uri).set(len(waiters))
+                return
+
+        self._active[uri] -= 1
+        UPSTREAM_QUEUE_DEPTH.labels(uri=uri).set(0)
+
+    def _dequeue(self, uri: str, granted: asyncio.Future) -> None:
+        waiters = self._waiters[uri]
+        if granted in waiters:
+            waiters.remove(granted)
+            UPSTREAM_QUEUE_DEPTH.labels(uri=uri).set(len(waiters))
@@ -1,7 +1,8 @@
+import asyncio
 import logging
 import threading
 from http.server import HTTPServer
-from prometheus_client import Counter, Histogram, MetricsHandler
+from prometheus_client import Counter, Gauge, Histogram, MetricsHandler
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -24,15 +25,159 @@ REQUESTS_TOTAL = Counter(
 CACHE_HITS_TOTAL = Counter(
     "tts_proxy_cache_hits_total", "Total number of audio cache hits"
 )
+CACHE_TIER_HITS_TOTAL = Counter(
+    "tts_proxy_cache_tier_hits_total",
+    "Total number of audio cache lookups served by the memory or the disk tier",
+    ["tier"],
+)
+CACHE_MEMORY_BYTES = Gauge(
+    "tts_proxy_cache_memory_bytes",
+    "Size of the serialized entries held in the in-memory cache tier",
+)
+CACHE_PENDING_WRITES = Gauge(
+    "tts_proxy_cache_pending_writes",
+    "Audio cache entries waiting to be written to disk in the background",
+)
+CACHE_ADMISSIONS_TOTAL = Counter(
+    "tts_proxy_cache_admissions_total",
+    "Total number of synthesized streams admitted to the audio cache",
+)
+CACHE_REJECTIONS_TOTAL = Counter(
+    "tts_proxy_cache_rejections_total",
+    "Total number of synthesized streams not admitted to the audio cache",
+    ["reason"],
+)
+CACHE_SEGMENTS = Gauge(
+    "tts_proxy_cache_segments",
+    "Number of pack files of the segment cache store",
+)
+CACHE_COMPACTED_BYTES_TOTAL = Counter(
+    "tts_proxy_cache_compacted_bytes_total",
+    "Total number of bytes of evicted entries reclaimed by compacting cache segments",
+)
+CACHE_COMPRESSION_RATIO = Histogram(
+    "tts_proxy_cache_compression_ratio",
+    "Uncompressed to compressed size of each compressed audio cache entry written",
+    buckets=(1.0, 1.25, 1.5, 2.0, 2.5, 3.0, 4.0, 6.0, 8.0),
+)
+CACHE_DECODED_BYTES_TOTAL = Counter(
+    "tts_proxy_cache_decoded_bytes_total",
+    "Total number of bytes inflated while reading compressed audio cache entries",
+)
+CACHE_DECODE_SECONDS_TOTAL = Counter(
+    "tts_proxy_cache_decode_seconds_total",
+    "Total time spent reading and decoding compressed audio cache entries",
+)
+PREWARM_PHRASES_TOTAL = Counter(
+    "tts_proxy_prewarm_phrases_total",
+    "Total number of prewarm phrases processed, by result",
+    ["result"],
+)
+PREWARM_PENDING = Gauge(
+    "tts_proxy_prewarm_pending",
+    "Prewarm phrases not processed yet",
+)
+SENTENCE_CACHE_HITS_TOTAL = Counter(
+    "tts_proxy_sentence_cache_hits_total",
+    "Total number of sentences served from the sentence cache",
+)
+SENTENCE_CACHE_MISSES_TOTAL = Counter(
+    "tts_proxy_sentence_cache_misses_total",
+    "Total number of sentences that had to be synthesized because they were not in the sentence cache",
+)
+SENTENCE_CACHE_HIT_RATIO = Histogram(
+    "tts_proxy_sentence_cache_hit_ratio",
+    "Fraction of the sentences of a multi-sentence request served from the sentence cache",
+    buckets=(0.0, 0.25, 0.5, 0.75, 0.99, 1.0),
+)
+COALESCED_REQUESTS_TOTAL = Counter(
+    "tts_proxy_coalesced_requests_total",
+    "Total number of synthesis requests served by joining an identical in-flight upstream request",
+)
+HEDGED_REQUESTS_TOTAL = Counter(
+    "tts_proxy_hedged_requests_total",
+    "Total number of synthesis requests hedged to a second upstream, by which attempt produced audio first",
+    ["winner"],
+)
 UPSTREAM_FAILURES_TOTAL = Counter(
     "tts_proxy_upstream_failures_total",
     "Total number of failures to upstream TTS services",
     ["uri"],
 )
+UPSTREAM_TIMEOUTS_TOTAL = Counter(
+    "tts_proxy_upstream_timeouts_total",
+    "Total number of upstream attempts abandoned because a timeout expired",
+    ["uri", "stage"],
+)
+UPSTREAM_QUEUE_TIME = Histogram(
+    "tts_proxy_upstream_queue_seconds",
+    "Time a request waited for a free slot under the upstream concurrency limit",
+    ["uri"],
+)
+UPSTREAM_QUEUE_DEPTH = Gauge(
+    "tts_proxy_upstream_queue_depth",
+    "Number of requests waiting for a free slot on an upstream",
+    ["uri"],
+)
+UPSTREAM_QUEUE_REJECTED_TOTAL = Counter(
+    "tts_proxy_upstream_queue_rejected_total",
+    "Total number of requests that skipped an upstream because its wait queue was full",
+    ["uri"],
+)
+UPSTREAM_BREAKER_STATE = Gauge(
+    "tts_proxy_upstream_breaker_state",
+    "Circuit breaker state per upstream (0 = closed, 1 = open, 2 = half-open)",
+    ["uri"],
+)
 TTS_LATENCY = Histogram(
     "tts_proxy_latency_seconds",
     "Latency of TTS generation (from request to first audio chunk)",
 )
+STREAMING_FIRST_AUDIO_LATENCY = Histogram(
+    "tts_proxy_streaming_first_audio_seconds",
+    "Time from SynthesizeStart to the first upstream audio chunk sent to the client",
+    ["mode"],
+)
+AUDIO_CONVERSION_TIME = Histogram(
+    "tts_proxy_audio_conversion_seconds",
+    "Time to convert one audio chunk to the configured output format",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025),
+)
+UPSTREAM_POOL_HITS_TOTAL = Counter(
+    "tts_proxy_upstream_pool_hits_total",
+    "Total number of upstream requests served by a pooled connection",
+    ["uri"],
+)
+UPSTREAM_POOL_MISSES_TOTAL = Counter(
+    "tts_proxy_upstream_pool_misses_total",
+    "Total number of upstream requests that had to open a new connection",
+    ["uri"],
+)
+UPSTREAM_CONNECT_LATENCY = Histogram(
+    "tts_proxy_upstream_connect_seconds",
+    "Time to open a connection to an upstream TTS service",
+    ["uri"],
+)
+
+
+EVENT_LOOP_LAG = Histogram(
+    "tts_proxy_event_loop_lag_seconds",
+    "How late the event loop woke up a task sleeping for a fixed interval",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Record event loop lag until cancelled.
+
+    Anything that blocks the loop, such as synchronous disk I/O, delays the
+    wake-up of this task and shows up as lag.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started_at = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - started_at - interval, 0.0))
 
 
 def start_metrics_server(port: int) -> None:
@@ -0,0 +1,162 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from wyoming.client import AsyncClient
+
+from .metrics import (
+    UPSTREAM_CONNECT_LATENCY,
+    UPSTREAM_POOL_HITS_TOTAL,
+    UPSTREAM_POOL_MISSES_TOTAL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _is_open(client: AsyncClient) -> bool:
+    """Check that the peer has not closed an idle connection."""
+    reader = getattr(client, "_reader", None)
+    writer = getattr(client, "_writer", None)
+    if (reader is None) or (writer is None):
+        return False
+    return not (reader.at_eof() or writer.is_closing())
+
+
+class UpstreamPool:
+    """Per-URI pool of warm Wyoming client connections.
+
+    A connection is returned to the pool when the ``connection()`` block exits
+    normally, unless it was passed to ``discard()`` because the exchange on it
+    did not finish cleanly. With ``max_idle_per_uri=0`` the pool is disabled and
+    every ``connection()`` opens and closes a fresh client.
+    """
+
+    def __init__(self, max_idle_per_uri: int = 0, idle_timeout: float = 60.0):
+        self.max_idle_per_uri = max_idle_per_uri
+        self.idle_timeout = idle_timeout
+        self.enabled = max_idle_per_uri > 0
+
+        self._idle: Dict[str, List[Tuple[AsyncClient, float]]] = defaultdict(list)
+        self._discarded: Set[int] = set()
+        self._prewarming: Dict[str, asyncio.Task] = {}
+
+        if self.enabled:
+            _LOGGER.info(
+                f"Upstream connection pool enabled (max idle per upstream: {max_idle_per_uri}, idle timeout: {idle_timeout}s)"
+            )
+
+    @contextlib.asynccontextmanager
+    async def connection(self, uri: str) -> AsyncIterator[AsyncClient]:
+        """Borrow a connected client for one complete request/response exchange."""
+        if not self.enabled:
+            async with contextlib.AsyncExitStack() as stack:
+                start_time = time.perf_counter()
+                client = await stack.enter_async_context(AsyncClient.from_uri(uri))
+                UPSTREAM_CONNECT_LATENCY.labels(uri=uri).observe(
+                    time.perf_counter() - start_time
+                )
+                yield client
+            return
+
+        prewarm_task = self._prewarming.get(uri)
+        if prewarm_task is not None:
+            # A connection is already being opened for us
+            await asyncio.wait({prewarm_task})
+
+        client = await self._checkout(uri)
+        if client is None:
+            UPSTREAM_POOL_MISSES_TOTAL.labels(uri=uri).inc()
+            client = await self._connect(uri)
+        else:
+            UPSTREAM_POOL_HITS_TOTAL.labels(uri=uri).inc()
+
+        try:
+            yield client
+        except BaseException:
+            self._discarded.discard(id(client))
+            await self._close(client)
+            raise
+
+        if id(client) in self._discarded:
+            self._discarded.discard(id(client))
+            await self._close(client)
+        else:
+            await self._release(uri, client)
+
+    def discard(self, client: AsyncClient) -> None:
+        """Close the client instead of returning it to the pool."""
+        if self.enabled:
+            self._discarded.add(id(client))
+
+    def prewarm(self, uri: str) -> None:
+        """Open a connection in the background if none is idle for the URI."""
+        if (not self.enabled) or (uri in self._prewarming):
+            return
+
+        if any(_is_open(client) for client, _ in self._idle[uri]):
+            return
+
+        task = asyncio.create_task(self._prewarm(uri))
+        self._prewarming[uri] = task
+        task.add_done_callback(lambda _: self._prewarming.pop(uri, None))
+
+    async def close(self) -> None:
+        """Close all idle connections."""
+        for task in list(self._prewarming.values()):
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+
+        idle = [client for clients in self._idle.values() for client, _ in clients]
+        self._idle.clear()
+        for client in idle:
+            await self._close(client)
+
+    async def _checkout(self, uri: str) -> Optional[AsyncClient]:
+        idle = self._idle[uri]
+        now = time.monotonic()
+        while idle:
+            client, released_at = idle.pop()
+            if (now - released_at <= self.idle_timeout) and _is_open(client):
+                return client
+
+            _LOGGER.debug(f"Dropping stale pooled connection to {uri}")
+            await self._close(client)
+
+        return None
+
+    async def _release(self, uri: str, client: AsyncClient) -> None:
+        idle = self._idle[uri]
+        if (len(idle) >= self.max_idle_per_uri) or (not _is_open(client)):
+            await self._close(client)
+            return
+
+        idle.append((client, time.monotonic()))
+
+    async def _connect(self, uri: str) -> AsyncClient:
+        start_time = time.perf_counter()
+        client = AsyncClient.from_uri(uri)
+        await client.connect()
+        UPSTREAM_CONNECT_LATENCY.labels(uri=uri).observe(
+            time.perf_counter() - start_time
+        )
+        _LOGGER.debug(f"Opened new connection to upstream {uri}")
+        return client
+
+    async def _prewarm(self, uri: str) -> None:
+        try:
+            client = await self._connect(uri)
+        except Exception as e:
+            _LOGGER.debug(f"Failed to pre-open connection to upstream {uri}: {e}")
+            return
+
+        await self._release(uri, client)
+
+    async def _close(self, client: AsyncClient) -> None:
+        try:
+            await client.disconnect()
+        except Exception as e:
+            _LOGGER.debug(f"Error while closing upstream connection: {e}")
@@ -0,0 +1,140 @@
+import asyncio
+import contextlib
+import logging
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import yaml
+
+from .cache import AudioCache
+from .metrics import PREWARM_PENDING, PREWARM_PHRASES_TOTAL
+from .normalizer import TextNormalizer
+from .synthesizer import UpstreamSynthesizer
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PrewarmPhrase(NamedTuple):
+    text: str
+    voice: Optional[str] = None
+
+
+def load_prewarm_file(path: str) -> List[PrewarmPhrase]:
+    """Read the phrases to prewarm from a YAML list.
+
+    Every item is either the text of a phrase, synthesized with the default
+    voice, or a mapping with ``text`` and an optional ``voice``.
+    """
+    with open(Path(path), "r", encoding="utf-8") as f:
+        items = yaml.safe_load(f) or []
+
+    if not isinstance(items, list):
+        raise ValueError("Prewarm file must contain a list of phrases")
+
+    phrases = []
+    for item in items:
+        if isinstance(item, str):
+            phrases.append(PrewarmPhrase(item))
+        elif isinstance(item, dict) and isinstance(item.get("text"), str):
+            phrases.append(PrewarmPhrase(item["text"], item.get("voice")))
+        else:
+            raise ValueError(f"Invalid prewarm phrase: {item!r}")
+    return phrases
+
+
+class CachePrewarmer:
+    """Synthesize a list of phrases into the audio cache in the background.
+
+    Phrases are normalized like client text and synthesized one at a time
+    through the ``UpstreamSynthesizer``, at most ``rate`` per second, so
+    prewarming never competes with client requests for more than one
+    upstream slot. Phrases that are already cached are skipped, and prewarmed
+    phrases bypass the admission frequency filter. A failed phrase, or one
+    the admission policy still rejects (e.g. as too large), is logged and
+    skipped.
+    """
+
+    def __init__(
+        self,
+        phrases: List[PrewarmPhrase],
+        synthesizer: UpstreamSynthesizer,
+        cache: AudioCache,
+        text_normalizer: TextNormalizer,
+        rate: float = 1.0,
+        streaming: bool = False,
+    ):
+        self.phrases = phrases
+        self.synthesizer = synthesizer
+        self.cache = cache
+        self.text_normalizer = text_normalizer
+        self.rate = rate
+        self.streaming = streaming
+
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if (self._task is None) and self.phrases and self.cache.enabled:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await self._task
+            self._task = None
+        PREWARM_PENDING.set(0)
+
+    async def run(self) -> None:
+        """Prewarm every phrase and wait for it."""
+        interval = (1.0 / self.rate) if self.rate > 0 else 0.0
+        loop = asyncio.get_running_loop()
+        _LOGGER.info(f"Prewarming the audio cache with {len(self.phrases)} phrases")
+
+        results: Dict[str, int] = defaultdict(int)
+        for index, phrase in enumerate(self.phrases):
+            PREWARM_PENDING.set(len(self.phrases) - index)
+            started_at = loop.time()
+            result = await self._prewarm(phrase)
+            PREWARM_PHRASES_TOTAL.labels(result=result).inc()
+            results[result] += 1
+            if result not in ("synthesized", "not_admitted"):
+                continue
+
+            # Only synthesis counts against the rate, cached phrases are free
+            delay = interval - (loop.time() - started_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        PREWARM_PENDING.set(0)
+        _LOGGER.info(
+            f"Prewarming finished, synthesized {results['synthesized']} of {len(self.phrases)} phrases into the cache ({results['not_admitted']} not admitted, {results['failed']} failed)"
+        )
+
+    async def _prewarm(self, phrase: PrewarmPhrase) -> str:
+        normalized_text = self.text_normalizer.normalize(phrase.text)
+        if not normalized_text:
+            return "skipped"
+        if await self.cache.contains(normalized_text, phrase.voice):
+            return "cached"
+
+        self.cache.allow(normalized_text, phrase.voice)
+        request = self.synthesizer.synthesize(
+            normalized_text, phrase.voice, self.streaming
+        )
+        async for _ in request.subscribe():
+            pass
+
+        if request.failed:
+            _LOGGER.warning(f"Failed to prewarm phrase: '{normalized_text[:50]}'")
+            return "failed"
+
+        # Admitted entries are pending or written by now
+        if not await self.cache.contains(normalized_text, phrase.voice):
+            _LOGGER.warning(
+                f"Prewarmed phrase was not admitted to the cache: '{normalized_text[:50]}'"
+            )
+            return "not_admitted"
+
+        _LOGGER.debug(f"Prewarmed phrase: '{normalized_text[:50]}'")
+        return "synthesized"
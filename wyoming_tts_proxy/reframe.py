@@ -0,0 +1,86 @@
+from typing import List, Optional, Tuple
+
+from wyoming.audio import AudioChunk
+from wyoming.event import Event
+
+AudioFormat = Tuple[int, int, int]
+
+
+class AudioReframer:
+    """Re-frame a stream of audio events into chunks of a fixed duration.
+
+    Small chunks are coalesced and large ones are split, so every chunk except
+    the last one of an utterance holds exactly ``frame_ms`` of audio. A chunk
+    that already has the frame size is passed through untouched, and large
+    chunks are split into memoryview slices of the original audio instead of
+    copies. All other events are passed through, with any buffered audio
+    flushed before them. With ``frame_ms=0`` every event is passed through.
+    """
+
+    def __init__(self, frame_ms: int = 0):
+        self.frame_ms = frame_ms
+        self.enabled = frame_ms > 0
+
+        self._buffer = bytearray()
+        self._format: Optional[AudioFormat] = None
+
+    def process(self, event: Event) -> List[Event]:
+        """Return the events to send in place of event."""
+        if not self.enabled:
+            return [event]
+
+        if not AudioChunk.is_type(event.type):
+            framed = self.flush()
+            framed.append(event)
+            return framed
+
+        chunk = AudioChunk.from_event(event)
+        audio_format = (chunk.rate, chunk.width, chunk.channels)
+        framed = []
+        if audio_format != self._format:
+            framed.extend(self.flush())
+            self._format = audio_format
+
+        frame_bytes = self._frame_bytes(audio_format)
+        audio = memoryview(chunk.audio)
+        if self._buffer:
+            # Top up the partial frame left over from earlier chunks
+            needed = frame_bytes - len(self._buffer)
+            self._buffer += audio[:needed]
+            audio = audio[needed:]
+            if len(self._buffer) < frame_bytes:
+                return framed
+            framed.append(self._chunk(bytes(self._buffer)))
+            self._buffer.clear()
+        elif len(audio) == frame_bytes:
+            framed.append(event)
+            return framed
+
+        offset = 0
+        while len(audio) - offset >= frame_bytes:
+            framed.append(self._chunk(audio[offset : offset + frame_bytes]))
+            offset += frame_bytes
+
+        self._buffer += audio[offset:]
+        return framed
+
+    def flush(self) -> List[Event]:
+        """Return the buffered audio as a final, shorter chunk."""
+        if not self._buffer:
+            return []
+
+        framed = [self._chunk(bytes(self._buffer))]
+        self._buffer.clear()
+        return framed
+
+    def _frame_bytes(self, audio_format: AudioFormat) -> int:
+        rate, width, channels = audio_format
+        samples = max(rate * self.frame_ms // 1000, 1)
+        return samples * width * channels
+
+    def _chunk(self, audio) -> Event:
+        assert self._format is not None
+        rate, width, channels = self._format
+        return AudioChunk(
+            rate=rate, width=width, channels=channels, audio=audio
+        ).event()
@@ -0,0 +1,51 @@
+import re
+from typing import List
+
+# Sentence terminators followed by whitespace (optionally after closing quotes or
+# brackets), CJK full-width terminators, or line breaks.
+_SENTENCE_BOUNDARY = re.compile(r"[.!?…]+[\"'”’»)\]]*\s+|[。！？]+\s*|\n+")
+_CODE_FENCE = "```"
+
+
+class SentenceBuffer:
+    """Accumulate streamed text and hand out sentences once they are complete.
+
+    A sentence only counts as complete when the whitespace after its terminator
+    has arrived, so "3." followed later by "14" is not split. Boundaries inside
+    an unclosed triple-backtick code block are ignored.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+
+    def add(self, text: str) -> List[str]:
+        """Append text and return the sentences completed by it."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_BOUNDARY.finditer(self._buffer):
+            if self._buffer.count(_CODE_FENCE, 0, match.start()) % 2:
+                continue
+            sentence = self._buffer[start : match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        """Return and clear whatever text is left in the buffer."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split a complete text into sentences."""
+    buffer = SentenceBuffer()
+    sentences = buffer.add(text)
+    remainder = buffer.flush()
+    if remainder:
+        sentences.append(remainder)
+    return sentences
@@ -0,0 +1,372 @@
+import contextlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .metrics import CACHE_COMPACTED_BYTES_TOTAL, CACHE_SEGMENTS
+
+_LOGGER = logging.getLogger(__name__)
+
+# Readable view of an entry: a mapped file, or a slice of a mapped segment
+EntryData = Union[mmap.mmap, memoryview, bytes]
+
+# Record header in a segment: raw sha256 key, data length, write time
+RECORD_HEADER = struct.Struct("<32sId")
+INDEX_FILE = "index.json"
+# Index changes after which the segment index is saved again
+SAVE_INDEX_EVERY = 100
+# Segments whose live data falls below this share are compacted
+COMPACT_LIVE_RATIO = 0.5
+# Temporary files of writes older than this were left behind by a crash
+STALE_TEMP_SECONDS = 3600
+
+
+class StoredEntry(NamedTuple):
+    key: str
+    size: int
+    written_at: float
+
+
+class FileStore:
+    """One ``<key>.events`` file per cache entry in the cache directory.
+
+    Entries are written to a temporary file and renamed into place, so
+    readers, including other processes sharing the directory, only ever see
+    complete entries.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.events"
+
+    def scan(self) -> Iterator[StoredEntry]:
+        self._remove_stale_temp_files()
+        for entry_file in self.directory.glob("*.events"):
+            try:
+                stat = entry_file.stat()
+            except OSError:
+                continue
+            yield StoredEntry(entry_file.stem, stat.st_size, stat.st_mtime)
+
+    def contains(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    @contextlib.contextmanager
+    def open(self, key: str) -> Iterator[Optional[EntryData]]:
+        """Map the entry for reading, yielding None if it does not exist."""
+        try:
+            f = open(self.path(key), "rb")
+        except FileNotFoundError:
+            yield None
+            return
+
+        with f:
+            if not f.seek(0, os.SEEK_END):
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+
+    def write(self, key: str, data: bytes) -> int:
+        """Store an entry and return the disk space it takes."""
+        temp_path = self.directory / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return len(data)
+
+    def remove(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    def compact(self) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def _remove_stale_temp_files(self) -> None:
+        expired = time.time() - STALE_TEMP_SECONDS
+        for temp_file in self.directory.glob(".*.tmp"):
+            try:
+                if temp_file.stat().st_mtime < expired:
+                    temp_file.unlink()
+            except OSError:
+                continue
+
+
+class SegmentStore:
+    """Log-structured store of cache entries in append-only pack files.
+
+    Entries are appended to the active segment as a small header (key,
+    length, write time) and the entry data; a new segment is started once
+    the active one reaches ``segment_size`` bytes. The location of every
+    entry is kept in memory and saved to ``index.json`` from time to time.
+    On startup the saved index is loaded and any records appended after it
+    was saved are recovered by scanning the end of each segment.
+
+    Removing an entry only drops it from the index. ``compact()`` copies the
+    live entries out of segments that are mostly dead and deletes them.
+    Entries are read from memory-mapped segments without copying.
+    """
+
+    def __init__(self, directory: Path, segment_size: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # key -> (segment, offset of the data, length, write time)
+        self._entries: Dict[str, Tuple[int, int, int, float]] = {}
+        self._sizes: Dict[int, int] = {}
+        self._live: Dict[int, int] = defaultdict(int)
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._lock = threading.RLock()
+        self._changes = 0
+
+        self._load()
+        self._active = max(self._sizes, default=0)
+        if self._active not in self._sizes:
+            self._active += 1
+            self._sizes[self._active] = 0
+        self._file: BinaryIO = open(self._segment_path(self._active), "ab")
+        CACHE_SEGMENTS.set(len(self._sizes))
+
+    def scan(self) -> Iterator[StoredEntry]:
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, (_, _, length, written_at) in entries:
+            yield StoredEntry(key, RECORD_HEADER.size + length, written_at)
+
+    def contains(self, key: str) -> bool:
+        return key in self._entries
+
+    @contextlib.contextmanager
+    def open(self, key: str) -> Iterator[Optional[EntryData]]:
+        with self._lock:
+            location = self._entries.get(key)
+            if location is None:
+                data = None
+            else:
+                segment, offset, length, _ = location
+                data = memoryview(self._map(segment, offset + length))[
+                    offset : offset + length
+                ]
+        yield data
+
+    def write(self, key: str, data: bytes) -> int:
+        with self._lock:
+            record_size = RECORD_HEADER.size + len(data)
+            if (self._sizes[self._active] > 0) and (
+                self._sizes[self._active] + record_size > self.segment_size
+            ):
+                self._roll()
+
+            written_at = time.time()
+            offset = self._sizes[self._active]
+            self._file.write(
+                RECORD_HEADER.pack(bytes.fromhex(key), len(data), written_at)
+            )
+            self._file.write(data)
+            self._file.flush()
+
+            self._sizes[self._active] = offset + record_size
+            self._set_entry(
+                key,
+                (self._active, offset + RECORD_HEADER.size, len(data), written_at),
+            )
+            self._changed()
+            return record_size
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._set_entry(key, None)
+                self._changed()
+
+    def needs_compaction(self) -> bool:
+        return bool(self._compactable())
+
+    def compact(self) -> None:
+        """Move the live entries out of mostly dead segments and delete them."""
+        for segment in self._compactable():
+            with self._lock:
+                keys = [
+                    key
+                    for key, location in self._entries.items()
+                    if location[0] == segment
+                ]
+                reclaimed = self._sizes[segment] - self._live[segment]
+
+            for key in keys:
+                with self._lock:
+                    location = self._entries.get(key)
+                    if (location is None) or (location[0] != segment):
+                        continue
+                    _, offset, length, written_at = location
+                    data = bytes(
+                        self._map(segment, offset + length)[offset : offset + length]
+                    )
+                    self.write(key, data)
+                    # Keep the original write time for pruning
+                    self._entries[key] = self._entries[key][:3] + (written_at,)
+
+            with self._lock:
+                self._drop_segment(segment)
+                self._save_index()
+            CACHE_COMPACTED_BYTES_TOTAL.inc(reclaimed)
+            _LOGGER.debug(
+                f"Compacted cache segment {segment}, reclaimed {reclaimed} bytes"
+            )
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+            self._save_index()
+
+    def _compactable(self) -> List[int]:
+        with self._lock:
+            return [
+                segment
+                for segment, size in self._sizes.items()
+                if (segment != self._active)
+                and (self._live[segment] < size * COMPACT_LIVE_RATIO)
+            ]
+
+    def _set_entry(
+        self, key: str, location: Optional[Tuple[int, int, int, float]]
+    ) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._live[previous[0]] -= RECORD_HEADER.size + previous[2]
+        if location is not None:
+            self._entries[key] = location
+            self._live[location[0]] += RECORD_HEADER.size + location[2]
+
+    def _changed(self) -> None:
+        self._changes += 1
+        if self._changes >= SAVE_INDEX_EVERY:
+            self._save_index()
+
+    def _map(self, segment: int, end: int) -> mmap.mmap:
+        """Return a mapping of the segment that covers at least end bytes."""
+        mapped = self._maps.get(segment)
+        if (mapped is None) or (len(mapped) < end):
+            # The active segment grew since it was mapped. Readers of the
+            # old mapping keep it alive until they are done with it.
+            with open(self._segment_path(segment), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    def _roll(self) -> None:
+        self._file.close()
+        self._active += 1
+        self._sizes[self._active] = 0
+        self._file = open(self._segment_path(self._active), "ab")
+        CACHE_SEGMENTS.set(len(self._sizes))
+        self._save_index()
+
+    def _drop_segment(self, segment: int) -> None:
+        self._sizes.pop(segment, None)
+        self._live.pop(segment, None)
+        # Open readers keep the mapping alive; the file can go away already
+        self._maps.pop(segment, None)
+        try:
+            self._segment_path(segment).unlink(missing_ok=True)
+        except OSError as e:
+            _LOGGER.warning(f"Failed to delete cache segment {segment}: {e}")
+        CACHE_SEGMENTS.set(len(self._sizes))
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"segment-{segment:06d}.pack"
+
+    def _save_index(self) -> None:
+        index = {
+            "segments": {str(segment): size for segment, size in self._sizes.items()},
+            "entries": {key: list(location) for key, location in self._entries.items()},
+        }
+        temp_path = self.directory / f"{INDEX_FILE}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temp_path, self.directory / INDEX_FILE)
+        self._changes = 0
+
+    def _load(self) -> None:
+        saved_sizes: Dict[int, int] = {}
+        try:
+            with open(self.directory / INDEX_FILE, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            saved_sizes = {
+                int(segment): size for segment, size in index["segments"].items()
+            }
+            for key, location in index["entries"].items():
+                self._set_entry(key, tuple(location))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            _LOGGER.warning(f"Ignoring unreadable cache segment index: {e}")
+            saved_sizes = {}
+            self._entries.clear()
+            self._live.clear()
+
+        on_disk = {}
+        for segment_file in self.directory.glob("segment-*.pack"):
+            try:
+                on_disk[int(segment_file.stem.split("-")[1])] = (
+                    segment_file.stat().st_size
+                )
+            except (ValueError, OSError):
+                continue
+
+        # Forget entries of segments that are gone or shorter than indexed
+        for key, (segment, offset, length, _) in list(self._entries.items()):
+            if offset + length > on_disk.get(segment, 0):
+                self._set_entry(key, None)
+
+        for segment, size in sorted(on_disk.items()):
+            saved = saved_sizes.get(segment, 0)
+            self._sizes[segment] = self._recover(segment, min(saved, size), size)
+
+    def _recover(self, segment: int, start: int, size: int) -> int:
+        """Index the records of a segment from start on and return its size."""
+        if start >= size:
+            return size
+
+        offset = start
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(start)
+            while offset + RECORD_HEADER.size <= size:
+                raw_key, length, written_at = RECORD_HEADER.unpack(
+                    f.read(RECORD_HEADER.size)
+                )
+                if offset + RECORD_HEADER.size + length > size:
+                    break
+                self._set_entry(
+                    raw_key.hex(),
+                    (segment, offset + RECORD_HEADER.size, length, written_at),
+                )
+                f.seek(length, os.SEEK_CUR)
+                offset += RECORD_HEADER.size + length
+
+        if offset < size:
+            # A torn write at the end of the segment
+            _LOGGER.warning(
+                f"Truncating cache segment {segment} from {size} to {offset} bytes"
+            )
+            os.truncate(self._segment_path(segment), offset)
+        return offset
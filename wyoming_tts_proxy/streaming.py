@@ -0,0 +1,324 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from wyoming.audio import AudioChunk
+from wyoming.client import AsyncClient
+from wyoming.error import Error
+from wyoming.event import Event
+from wyoming.tts import (
+    SynthesizeChunk,
+    SynthesizeStart,
+    SynthesizeStop,
+    SynthesizeStopped,
+)
+
+from .health import UpstreamHealth
+from .metrics import (
+    STREAMING_FIRST_AUDIO_LATENCY,
+    TTS_LATENCY,
+    UPSTREAM_FAILURES_TOTAL,
+    UPSTREAM_TIMEOUTS_TOTAL,
+)
+from .pool import UpstreamPool
+from .convert import AudioConverter
+from .reframe import AudioReframer
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ClientWriteError(Exception):
+    """Forwarding audio to the client failed, e.g. because it disconnected."""
+
+
+class IncrementalSynthesis:
+    """Stream sentences to an upstream TTS service while the client is still sending text.
+
+    The upstream streaming session is opened lazily when the first sentence is
+    sent. Upstream events are forwarded to the client by a background task as
+    soon as they arrive, so audio for the first sentence can play while the
+    rest of the text is still being generated.
+
+    ``connect_timeout`` applies to opening the session. Gaps in the audio
+    are expected while the client is still sending text, so the first chunk,
+    chunk and request timeouts only start once SynthesizeStop has been sent
+    upstream; an expired timeout fails the session.
+    """
+
+    def __init__(
+        self,
+        upstream_uris: List[str],
+        pool: UpstreamPool,
+        voice: Optional[str],
+        write_event: Callable[[Event], Awaitable[None]],
+        start_time: float,
+        health: Optional[UpstreamHealth] = None,
+        frame_ms: int = 0,
+        converter: Optional[AudioConverter] = None,
+        connect_timeout: float = 0.0,
+        first_chunk_timeout: float = 0.0,
+        chunk_timeout: float = 0.0,
+        request_timeout: float = 0.0,
+    ) -> None:
+        self.upstream_uris = upstream_uris
+        self.pool = pool
+        self.health = health or UpstreamHealth()
+        self._converter = converter or AudioConverter()
+        self._reframer = AudioReframer(frame_ms)
+        self.voice = voice
+        self.write_event = write_event
+        self.start_time = start_time
+        self.connect_timeout = connect_timeout
+        self.first_chunk_timeout = first_chunk_timeout
+        self.chunk_timeout = chunk_timeout
+        self.request_timeout = request_timeout
+
+        self.uri: Optional[str] = None
+        self.events: List[Event] = []
+        self.sentences: List[str] = []
+        self.failed = False
+        self.completed = False
+
+        self._request_time = 0.0
+        self._first_chunk_seen = False
+        self._last_event_at = 0.0
+        self._error_forwarded = False
+        self._client_error: Optional[BaseException] = None
+
+        self._exit_stack = contextlib.AsyncExitStack()
+        self._client: Optional[AsyncClient] = None
+        self._reader_task: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None
+
+    async def send(self, text: str) -> None:
+        """Send one complete sentence upstream."""
+        if self.failed:
+            return
+
+        if self._client is None:
+            await self._open()
+            if self._client is None:
+                return
+
+        self.sentences.append(text)
+        try:
+            # Keep the whitespace after the sentence, upstream sentence
+            # detectors only split on a terminator followed by whitespace
+            await self._client.write_event(SynthesizeChunk(text=text + " ").event())
+        except Exception as e:
+            await self._fail(f"Upstream {self.uri} failed while streaming text: {e}")
+
+    async def finish(self) -> bool:
+        """Signal the end of the text and wait until all audio has been forwarded.
+
+        If the upstream failed at any point, the client is sent an Error followed
+        by SynthesizeStopped and False is returned. If the client could not be
+        written to, the error is raised once the upstream session is closed,
+        without counting it against the upstream.
+        """
+        try:
+            if (self._client is not None) and (not self.failed):
+                try:
+                    await self._client.write_event(SynthesizeStop().event())
+                except Exception as e:
+                    await self._fail(
+                        f"Upstream {self.uri} failed while stopping stream: {e}"
+                    )
+
+            if self._reader_task is not None:
+                await self._wait_for_audio(time.perf_counter())
+        finally:
+            if self._client is not None:
+                if self.completed and not self.failed:
+                    self.health.record_success(self.uri)
+                else:
+                    self.pool.discard(self._client)
+                    self.health.release(self.uri)
+            await self._exit_stack.aclose()
+
+        if self._client_error is not None:
+            raise self._client_error
+
+        if self.completed and (not self.failed):
+            return True
+
+        if not self._error_forwarded:
+            await self.write_event(
+                Error(text="All upstream TTS services failed.").event()
+            )
+        await self.write_event(SynthesizeStopped().event())
+        return False
+
+    async def abort(self) -> None:
+        """Tear down the upstream session without waiting for remaining audio."""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await self._reader_task
+        if self._client is not None:
+            self.pool.discard(self._client)
+            self.health.release(self.uri)
+        await self._exit_stack.aclose()
+
+    async def _open(self) -> None:
+        for uri in self.upstream_uris:
+            if not self.health.allow(uri):
+                continue
+
+            client = None
+            try:
+                client = await self._connect(uri)
+                await client.write_event(SynthesizeStart(voice=self.voice).event())
+            except Exception as e:
+                _LOGGER.warning(
+                    f"Upstream {uri} failed for incremental Synthesize: {e}"
+                )
+                UPSTREAM_FAILURES_TOTAL.labels(uri=uri).inc()
+                self.health.record_failure(uri)
+                if client is not None:
+                    self.pool.discard(client)
+                await self._exit_stack.aclose()
+                continue
+
+            _LOGGER.debug(f"Opened incremental streaming session to upstream {uri}")
+            self.uri = uri
+            self._client = client
+            self._request_time = time.perf_counter()
+            self._reader_task = asyncio.create_task(self._forward_audio())
+            return
+
+        self.failed = True
+        _LOGGER.error("All upstreams failed for incremental Synthesize.")
+
+    async def _connect(self, uri: str) -> AsyncClient:
+        connect = self._exit_stack.enter_async_context(self.pool.connection(uri))
+        if self.connect_timeout <= 0:
+            return await connect
+
+        try:
+            return await asyncio.wait_for(connect, timeout=self.connect_timeout)
+        except asyncio.TimeoutError:
+            UPSTREAM_TIMEOUTS_TOTAL.labels(uri=uri, stage="connect").inc()
+            raise TimeoutError("connect timeout expired") from None
+
+    async def _wait_for_audio(self, stopped_at: float) -> None:
+        """Wait for the reader task to forward the rest of the audio.
+
+        The first chunk timeout counts from ``stopped_at`` if no audio has
+        arrived yet, the chunk timeout from the last upstream event, and the
+        request timeout from ``stopped_at``.
+        """
+        assert self._reader_task is not None
+        deadline = None
+        if self.request_timeout > 0:
+            deadline = stopped_at + self.request_timeout
+
+        while not self._reader_task.done():
+            if self._first_chunk_seen:
+                stage, timeout = "chunk", self.chunk_timeout
+                since = max(self._last_event_at, stopped_at)
+            else:
+                stage, timeout = "first_chunk", self.first_chunk_timeout
+                since = stopped_at
+
+            expires_at = (since + timeout) if timeout > 0 else None
+            if (deadline is not None) and (
+                (expires_at is None) or (deadline < expires_at)
+            ):
+                stage, expires_at = "request", deadline
+
+            if expires_at is None:
+                await asyncio.wait({self._reader_task})
+                break
+
+            remaining = expires_at - time.perf_counter()
+            if remaining > 0:
+                # Events that arrive meanwhile move the chunk timeout on
+                await asyncio.wait({self._reader_task}, timeout=remaining)
+                continue
+
+            UPSTREAM_TIMEOUTS_TOTAL.labels(uri=self.uri, stage=stage).inc()
+            await self._fail(
+                f"Upstream {self.uri} failed for incremental Synthesize: {stage} timeout expired"
+            )
+            return
+
+        await self._reader_task
+
+    async def _forward_audio(self) -> None:
+        assert self._client is not None
+        try:
+            while True:
+                upstream_event = await self._client.read_event()
+                self._last_event_at = time.perf_counter()
+                if upstream_event is None:
+                    self._mark_failed(
+                        f"Upstream {self.uri} closed the incremental stream early"
+                    )
+                    return
+
+                if SynthesizeStopped.is_type(upstream_event.type):
+                    self.completed = True
+                    if not self.failed:
+                        await self._forward(self._reframer.flush())
+                        await self._write(upstream_event)
+                    return
+
+                for converted_event in self._converter.process(upstream_event):
+                    await self._forward(self._reframer.process(converted_event))
+
+                if (not self._first_chunk_seen) and AudioChunk.is_type(
+                    upstream_event.type
+                ):
+                    now = time.perf_counter()
+                    TTS_LATENCY.observe(now - self._request_time)
+                    STREAMING_FIRST_AUDIO_LATENCY.labels(mode="incremental").observe(
+                        now - self.start_time
+                    )
+                    self._first_chunk_seen = True
+
+                if Error.is_type(upstream_event.type):
+                    self.failed = True
+                    self._error_forwarded = True
+                    return
+        except asyncio.CancelledError:
+            raise
+        except ClientWriteError as e:
+            # The client went away, the upstream is not to blame
+            _LOGGER.debug(f"Stopped forwarding incremental audio: {e}")
+            self.failed = True
+            self._client_error = e.__cause__
+        except Exception as e:
+            self._mark_failed(
+                f"Upstream {self.uri} failed for incremental Synthesize: {e}"
+            )
+
+    async def _forward(self, events: List[Event]) -> None:
+        for event in events:
+            self.events.append(event)
+            await self._write(event)
+
+    async def _write(self, event: Event) -> None:
+        try:
+            await self.write_event(event)
+        except Exception as e:
+            raise ClientWriteError(f"Failed to write to client: {e}") from e
+
+    def _mark_failed(self, message: str) -> None:
+        if not self.failed:
+            _LOGGER.warning(message)
+            UPSTREAM_FAILURES_TOTAL.labels(uri=self.uri).inc()
+            self.health.record_failure(self.uri)
+        self.failed = True
+
+    async def _fail(self, message: str) -> None:
+        self._mark_failed(message)
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await self._reader_task
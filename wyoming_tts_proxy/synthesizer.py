@@ -0,0 +1,673 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.client import AsyncClient
+from wyoming.error import Error
+from wyoming.event import Event
+from wyoming.tts import (
+    Synthesize,
+    SynthesizeChunk,
+    SynthesizeStart,
+    SynthesizeStop,
+    SynthesizeStopped,
+)
+
+from .balancer import UpstreamBalancer
+from .cache import AudioCache
+from .config import ProxyConfig
+from .convert import AudioConverter
+from .health import UpstreamHealth
+from .inflight import InFlightRequest, InFlightTable
+from .latency import LatencyWindow
+from .limiter import UpstreamLimiter, UpstreamSlot
+from .metrics import (
+    COALESCED_REQUESTS_TOTAL,
+    HEDGED_REQUESTS_TOTAL,
+    SENTENCE_CACHE_HIT_RATIO,
+    SENTENCE_CACHE_HITS_TOTAL,
+    SENTENCE_CACHE_MISSES_TOTAL,
+    TTS_LATENCY,
+    UPSTREAM_FAILURES_TOTAL,
+    UPSTREAM_TIMEOUTS_TOTAL,
+)
+from .pool import UpstreamPool
+from .reframe import AudioReframer
+from .sentences import split_sentences
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Seconds to wait for SynthesizeStopped after AudioStop before dropping a pooled connection
+STREAM_DRAIN_TIMEOUT = 1.0
+
+
+class UpstreamSynthesizer:
+    """Run synthesis requests against the upstream TTS services.
+
+    Identical concurrent requests (same normalized text and voice) share a
+    single upstream call: the first caller starts it and later callers
+    subscribe to its event stream. With hedging enabled, a request that gets
+    no audio from its upstream within the usual time is also sent to the next
+    upstream, and the first one to produce audio is used.
+    """
+
+    def __init__(
+        self,
+        upstream_uris: List[str],
+        config: ProxyConfig,
+        cache: AudioCache,
+        pool: UpstreamPool,
+        health: Optional[UpstreamHealth] = None,
+    ):
+        self.upstream_uris = upstream_uris
+        self.config = config
+        self.cache = cache
+        self.pool = pool
+        self.health = health or UpstreamHealth()
+        self.in_flight = InFlightTable(enabled=config.coalesce_requests)
+        self.latency: Dict[str, LatencyWindow] = defaultdict(LatencyWindow)
+        self.balancer = UpstreamBalancer(
+            upstream_uris, config.load_balancing, self.latency
+        )
+        self.limiter = UpstreamLimiter(
+            max_concurrent=config.upstream_max_concurrent,
+            max_queue=config.upstream_queue_size,
+        )
+        self._tasks = set()
+
+    def synthesize(
+        self, normalized_text: str, voice: Optional[str], streaming: bool
+    ) -> InFlightRequest:
+        """Start or join the upstream request for text and voice."""
+        key = self.cache.get_hash(normalized_text, voice)
+        request, is_leader = self.in_flight.join(key)
+        if not is_leader:
+            COALESCED_REQUESTS_TOTAL.inc()
+            return request
+
+        task = asyncio.create_task(
+            self._produce(request, normalized_text, voice, streaming)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return request
+
+    async def _produce(
+        self,
+        request: InFlightRequest,
+        normalized_text: str,
+        voice: Optional[str],
+        streaming: bool,
+    ) -> None:
+        succeeded = False
+        try:
+            succeeded = await self._synthesize_upstream(
+                request, normalized_text, voice, streaming
+            )
+        finally:
+            self.in_flight.remove(request)
+            request.finish(failed=not succeeded)
+
+    async def _synthesize_upstream(
+        self,
+        request: InFlightRequest,
+        normalized_text: str,
+        voice: Optional[str],
+        streaming: bool,
+    ) -> bool:
+        """Synthesize text on the first working upstream and publish the audio.
+
+        With ``split_sentences`` every sentence is a separate upstream
+        request, and the audio of all of them is spliced in order into one
+        AudioStart/AudioStop stream. The audio of a sentence is only
+        published once the sentence is complete, so an upstream failing part
+        way through a sentence only costs that sentence, which is
+        synthesized again on the next upstream. Up to ``parallel_sentences``
+        sentences are synthesized at once; the first one is dispatched
+        immediately and the following ones are buffered until it is their
+        turn, and no more than the first upstream can take at once, so the
+        sentences of a request never push each other out of its concurrency
+        limit. All sentences go to the same upstream, so the voice does not
+        change mid-utterance; a sentence only moves on to the next upstream
+        when the current one fails, and the sentences after it follow. An
+        SSML document is never split.
+
+        Returns False if every upstream failed.
+        """
+        # Sentences can only be cached if there is a cache
+        sentence_cache = self.config.sentence_cache and self.cache.enabled
+        split = (
+            self.config.split_sentences or sentence_cache
+        ) and not self.config.ssml_template
+        segments = [normalized_text]
+        if split:
+            segments = split_sentences(normalized_text) or segments
+        # A single sentence is already cached under the whole text
+        cache_segments = sentence_cache and (len(segments) > 1)
+
+        start_time = time.perf_counter()
+        first_chunk_sent = False
+        audio_start: Optional[AudioStart] = None
+        # Total time allowed for the request, across failover attempts
+        deadline = None
+        if self.config.request_timeout > 0:
+            deadline = start_time + self.config.request_timeout
+        events_to_cache = []
+        reframer = AudioReframer(self.config.audio_frame_ms)
+
+        def emit(framed_event: Event) -> None:
+            nonlocal first_chunk_sent
+            events_to_cache.append(framed_event)
+            request.publish(framed_event)
+
+            if not first_chunk_sent and AudioChunk.is_type(framed_event.type):
+                TTS_LATENCY.observe(time.perf_counter() - start_time)
+                first_chunk_sent = True
+
+        def publish(upstream_event: Event) -> None:
+            for framed_event in reframer.process(upstream_event):
+                emit(framed_event)
+
+        outputs = [InFlightRequest(f"{request.key}:{i}") for i in range(len(segments))]
+        upstreams = self.balancer.order()
+        parallel = max(self.config.parallel_sentences, 1)
+        available = self.limiter.available(upstreams[0])
+        if available is not None:
+            parallel = max(min(parallel, available), 1)
+        tasks = []
+        cache_hits = 0
+
+        async def fill_segment(index: int) -> None:
+            nonlocal cache_hits
+            if cache_segments:
+                cached_events = await self.cache.get_async(segments[index], voice)
+                if cached_events:
+                    cache_hits += 1
+                    SENTENCE_CACHE_HITS_TOTAL.inc()
+                    for cached_event in cached_events:
+                        outputs[index].publish(cached_event)
+                    outputs[index].finish()
+                    return
+                SENTENCE_CACHE_MISSES_TOTAL.inc()
+
+            await self._synthesize_segment(
+                outputs[index],
+                segments[index],
+                voice,
+                streaming,
+                deadline,
+                upstreams,
+                hold_back=split,
+                cache_segment=cache_segments,
+            )
+
+        def start_segment(index: int) -> None:
+            tasks.append(asyncio.create_task(fill_segment(index)))
+
+        for index in range(min(parallel, len(segments))):
+            start_segment(index)
+
+        try:
+            for index, output in enumerate(outputs):
+                is_last = index == len(outputs) - 1
+                async for upstream_event in output.subscribe():
+                    if AudioStart.is_type(upstream_event.type):
+                        if audio_start is not None:
+                            try:
+                                _check_audio_format(
+                                    audio_start, AudioStart.from_event(upstream_event)
+                                )
+                            except AudioFormatError as e:
+                                # Set audio_rate/width/channels to mix upstreams
+                                _LOGGER.warning(
+                                    f"Not splicing sentence {index + 1}: {e}"
+                                )
+                                publish(AudioStop().event())
+                                return False
+                            continue
+                        audio_start = AudioStart.from_event(upstream_event)
+                    elif AudioStop.is_type(
+                        upstream_event.type
+                    ) or SynthesizeStopped.is_type(upstream_event.type):
+                        if not is_last:
+                            continue
+                    elif Error.is_type(upstream_event.type):
+                        # The upstream refused the text, trying others will not help
+                        publish(upstream_event)
+                        self.cache.set_background(
+                            normalized_text, voice, events_to_cache
+                        )
+                        return True
+
+                    publish(upstream_event)
+
+                if output.failed:
+                    if audio_start is not None:
+                        # Close the audio stream that was already started
+                        publish(AudioStop().event())
+                    return False
+
+                if index + parallel < len(segments):
+                    start_segment(index + parallel)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if cache_segments:
+            if cache_hits:
+                _LOGGER.debug(
+                    f"Served {cache_hits} of {len(segments)} sentences from the cache"
+                )
+            SENTENCE_CACHE_HIT_RATIO.observe(cache_hits / len(segments))
+
+        for framed_event in reframer.flush():
+            emit(framed_event)
+        self.cache.set_background(normalized_text, voice, events_to_cache)
+        return True
+
+    async def _synthesize_segment(
+        self,
+        output: InFlightRequest,
+        text: str,
+        voice: Optional[str],
+        streaming: bool,
+        deadline: Optional[float],
+        upstreams: List[str],
+        hold_back: bool = False,
+        cache_segment: bool = False,
+    ) -> None:
+        """Synthesize one segment of a request into output, failing over as needed.
+
+        Upstreams are tried in the order of ``upstreams``, which is shared by
+        the segments of a request; the upstream that produces the segment is
+        moved to the front so the following segments go to it as well.
+        Audio is converted to the configured output format first. With
+        ``hold_back`` the audio of the segment is only published once the
+        upstream has finished it, so an attempt that fails part way is
+        thrown away and the segment is synthesized again on the next
+        upstream. Otherwise audio is published as it arrives, and the next
+        upstream is only tried while no audio has been published, since the
+        client would hear the start of the segment twice. With
+        ``cache_segment`` the audio of the segment is cached on its own.
+        """
+        final_text = self._apply_ssml(text)
+        remaining = list(upstreams)
+        succeeded = False
+
+        try:
+            while True:
+                pending = list(remaining)
+                attempt = await self._first_audio(
+                    pending, final_text, voice, streaming, deadline
+                )
+                if attempt is None:
+                    return
+
+                uri, stream, buffered = attempt
+                attempt_events: List[Event] = []
+                converter = AudioConverter(
+                    self.config.audio_rate,
+                    self.config.audio_width,
+                    self.config.audio_channels,
+                )
+                try:
+                    async for upstream_event in _convert(
+                        _resume(buffered, stream), converter
+                    ):
+                        attempt_events.append(upstream_event)
+                        if not hold_back:
+                            output.publish(upstream_event)
+
+                    self.health.record_success(uri)
+                    succeeded = True
+                    if upstreams[0] != uri:
+                        upstreams.remove(uri)
+                        upstreams.insert(0, uri)
+                    if hold_back:
+                        for upstream_event in attempt_events:
+                            output.publish(upstream_event)
+                    if cache_segment:
+                        self.cache.set_background(text, voice, attempt_events)
+                    return
+                except Exception as e:
+                    self._upstream_failed(uri, e)
+                    remaining = pending
+                finally:
+                    await stream.aclose()
+
+                if (not hold_back) and any(
+                    AudioChunk.is_type(event.type) for event in attempt_events
+                ):
+                    _LOGGER.warning(
+                        "Not failing over after audio was sent, enable split_sentences to resynthesize the interrupted sentence"
+                    )
+                    return
+        finally:
+            output.finish(failed=not succeeded)
+
+    def _apply_ssml(self, text: str) -> str:
+        # Wrap in SSML if configured
+        if not self.config.ssml_template:
+            return text
+
+        final_text = self.config.ssml_template.replace("{{text}}", text)
+        _LOGGER.debug(f"SSML wrapped text: {final_text}")
+        return final_text
+
+    async def _first_audio(
+        self,
+        pending: List[str],
+        final_text: str,
+        voice: Optional[str],
+        streaming: bool,
+        deadline: Optional[float],
+    ) -> Optional[Tuple[str, AsyncIterator[Event], List[Event]]]:
+        """Start attempts on the pending URIs until one of them produces audio.
+
+        The next URI is tried once the current one fails. With hedging enabled
+        it is also started when the current one takes longer than its usual
+        time to first audio; whichever attempt produces audio first wins and
+        the other one is cancelled. Returns the winning URI, its event stream
+        and the events read from it so far, or None if every attempt failed.
+        """
+        attempts: Dict[asyncio.Task, Tuple[str, AsyncIterator[Event]]] = {}
+        slots: Dict[asyncio.Task, UpstreamSlot] = {}
+        busy = False
+        hedge_uri = None
+        winner = None
+
+        def launch() -> Optional[str]:
+            nonlocal busy
+            if (deadline is not None) and (time.perf_counter() >= deadline):
+                return None
+
+            while pending:
+                uri = pending.pop(0)
+                if not self.health.allow(uri):
+                    continue
+
+                slot = self.limiter.reserve(uri)
+                if slot is None:
+                    _LOGGER.debug(f"Upstream {uri} is busy, spilling to the next one")
+                    self.health.release(uri)
+                    busy = True
+                    continue
+
+                stream = self._stream_from(
+                    uri, final_text, voice, streaming, slot, deadline
+                )
+                task = asyncio.create_task(_read_until_audio(stream))
+                attempts[task] = (uri, stream)
+                slots[task] = slot
+                return uri
+
+            return None
+
+        primary_uri = launch()
+        try:
+            while attempts and (winner is None):
+                timeout = None
+                if self.config.hedge_requests and (hedge_uri is None) and pending:
+                    timeout = self._hedge_delay(primary_uri)
+
+                done, _ = await asyncio.wait(
+                    attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedge_uri = launch()
+                    if hedge_uri is not None:
+                        _LOGGER.debug(
+                            f"No audio from upstream {primary_uri} after {timeout:.3f}s, hedging to {hedge_uri}"
+                        )
+                    continue
+
+                for task in done:
+                    uri, stream = attempts.pop(task)
+                    if task.exception() is not None:
+                        self._upstream_failed(uri, task.exception())
+                    elif winner is None:
+                        winner = (uri, stream, task.result())
+                    else:
+                        self.health.release(uri)
+                        await stream.aclose()
+
+                if (winner is None) and (not attempts) and pending:
+                    if hedge_uri is None:
+                        primary_uri = launch()
+                    else:
+                        launch()
+        finally:
+            # Cancel the losing attempt, which closes its upstream connection
+            for task, (uri, stream) in attempts.items():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await task
+                self.health.release(uri)
+                await stream.aclose()
+                # The attempt may have been cancelled before it started
+                slots[task].release()
+
+        if (winner is None) and busy:
+            _LOGGER.warning("All available upstreams are at their concurrency limit")
+
+        if hedge_uri is not None:
+            if winner is None:
+                outcome = "none"
+            elif winner[0] == hedge_uri:
+                outcome = "hedge"
+            else:
+                outcome = "primary"
+            HEDGED_REQUESTS_TOTAL.labels(winner=outcome).inc()
+
+        return winner
+
+    def _upstream_failed(self, uri: str, e: BaseException) -> None:
+        _LOGGER.warning(f"Upstream {uri} failed for Synthesize: {e}")
+        UPSTREAM_FAILURES_TOTAL.labels(uri=uri).inc()
+        self.health.record_failure(uri)
+        self.balancer.failed(uri)
+
+    def _hedge_delay(self, uri: str) -> float:
+        delay = self.latency[uri].percentile(self.config.hedge_percentile)
+        if delay is None:
+            return self.config.hedge_delay
+        return delay
+
+    async def _stream_from(
+        self,
+        uri: str,
+        final_text: str,
+        voice: Optional[str],
+        streaming: bool,
+        slot: UpstreamSlot,
+        deadline: Optional[float],
+    ) -> AsyncIterator[Event]:
+        """Send the request to one upstream and yield its response events.
+
+        Raises TimeoutError if the upstream exceeds the connect, first chunk or
+        inter-chunk timeout, or the request runs past its deadline.
+        """
+        start_time = time.perf_counter()
+        first_chunk_seen = False
+
+        self.balancer.started(uri)
+        try:
+            await self._within(slot.acquire(), uri, "queue", 0, deadline)
+            async with contextlib.AsyncExitStack() as stack:
+                upstream_client = await self._within(
+                    stack.enter_async_context(self.pool.connection(uri)),
+                    uri,
+                    "connect",
+                    self.config.upstream_connect_timeout,
+                    deadline,
+                )
+
+                # Send as streaming if requested, otherwise send as regular synthesize
+                if streaming:
+                    _LOGGER.debug(f"Using streaming mode to upstream {uri}")
+                    await upstream_client.write_event(
+                        SynthesizeStart(voice=voice).event()
+                    )
+                    await upstream_client.write_event(
+                        SynthesizeChunk(text=final_text).event()
+                    )
+                    await upstream_client.write_event(SynthesizeStop().event())
+                else:
+                    proxied_synthesize = Synthesize(
+                        text=final_text, voice=voice
+                    ).event()
+                    await upstream_client.write_event(proxied_synthesize)
+
+                sent_at = time.perf_counter()
+                while True:
+                    if first_chunk_seen:
+                        upstream_event = await self._within(
+                            upstream_client.read_event(),
+                            uri,
+                            "chunk",
+                            self.config.upstream_chunk_timeout,
+                            deadline,
+                        )
+                    else:
+                        upstream_event = await self._within(
+                            upstream_client.read_event(),
+                            uri,
+                            "first_chunk",
+                            self.config.upstream_first_chunk_timeout,
+                            deadline,
+                            started_at=sent_at,
+                        )
+                    if upstream_event is None:
+                        raise ConnectionError("Upstream closed the connection")
+
+                    if not first_chunk_seen and AudioChunk.is_type(upstream_event.type):
+                        self.latency[uri].record(time.perf_counter() - start_time)
+                        first_chunk_seen = True
+
+                    yield upstream_event
+
+                    if (
+                        AudioStop.is_type(upstream_event.type)
+                        or Error.is_type(upstream_event.type)
+                        or SynthesizeStopped.is_type(upstream_event.type)
+                    ):
+                        break
+
+                await self._finish_upstream_exchange(
+                    upstream_client, upstream_event, streaming
+                )
+        finally:
+            slot.release()
+            self.balancer.finished(uri)
+
+    async def _within(
+        self,
+        awaitable: Awaitable[T],
+        uri: str,
+        stage: str,
+        timeout: float,
+        deadline: Optional[float],
+        started_at: Optional[float] = None,
+    ) -> T:
+        """Await a step of an upstream exchange under its timeout and the request deadline.
+
+        A timeout of 0 disables the step's own timeout. With ``started_at`` the
+        timeout counts from that time instead of from now.
+        """
+        budget = None
+        if timeout > 0:
+            budget = timeout
+            if started_at is not None:
+                budget -= time.perf_counter() - started_at
+
+        if deadline is not None:
+            remaining = deadline - time.perf_counter()
+            if (budget is None) or (remaining < budget):
+                budget = remaining
+                stage = "request"
+
+        if budget is None:
+            return await awaitable
+
+        try:
+            return await asyncio.wait_for(awaitable, timeout=max(budget, 0))
+        except asyncio.TimeoutError:
+            UPSTREAM_TIMEOUTS_TOTAL.labels(uri=uri, stage=stage).inc()
+            raise TimeoutError(f"{stage} timeout expired") from None
+
+    async def _finish_upstream_exchange(
+        self,
+        upstream_client: AsyncClient,
+        last_event: Optional[Event],
+        streaming: bool,
+    ) -> None:
+        """Only let a pooled connection be reused after a complete exchange."""
+        if not self.pool.enabled:
+            return
+
+        if (
+            streaming
+            and (last_event is not None)
+            and AudioStop.is_type(last_event.type)
+        ):
+            # Streaming upstreams follow AudioStop with SynthesizeStopped
+            try:
+                last_event = await asyncio.wait_for(
+                    upstream_client.read_event(), timeout=STREAM_DRAIN_TIMEOUT
+                )
+            except Exception:
+                last_event = None
+
+        expected = SynthesizeStopped if streaming else AudioStop
+        if (last_event is None) or (not expected.is_type(last_event.type)):
+            self.pool.discard(upstream_client)
+
+
+class AudioFormatError(Exception):
+    """An upstream's audio cannot be spliced into the stream already sent."""
+
+
+def _check_audio_format(expected: AudioStart, actual: AudioStart) -> None:
+    if (expected.rate, expected.width, expected.channels) != (
+        actual.rate,
+        actual.width,
+        actual.channels,
+    ):
+        raise AudioFormatError(
+            f"audio format {actual.rate}Hz/{actual.width}B/{actual.channels}ch "
+            f"differs from the stream already sent ({expected.rate}Hz/{expected.width}B/{expected.channels}ch)"
+        )
+
+
+async def _read_until_audio(stream: AsyncIterator[Event]) -> List[Event]:
+    """Read events from an attempt until it produces audio or finishes."""
+    buffered = []
+    async for event in stream:
+        buffered.append(event)
+        if AudioChunk.is_type(event.type):
+            break
+    return buffered
+
+
+async def _resume(
+    buffered: List[Event], stream: AsyncIterator[Event]
+) -> AsyncIterator[Event]:
+    for event in buffered:
+        yield event
+    async for event in stream:
+        yield event
+
+
+async def _convert(
+    stream: AsyncIterator[Event], converter: AudioConverter
+) -> AsyncIterator[Event]:
+    async for event in stream:
+        for converted_event in converter.process(event):
+            yield converted_event
@@ -0,0 +1,75 @@
+import asyncio
+import io
+import logging
+from typing import Optional
+
+from wyoming.audio import AudioChunk
+from wyoming.event import Event, write_event
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BufferedEventWriter:
+    """Serialize events into a buffer and write them to the client in batches.
+
+    Audio chunks are collected until the buffer holds ``max_bytes`` or the
+    oldest of them has waited ``max_delay`` seconds, and are then sent with a
+    single write and drain. Any other event (AudioStart, AudioStop, Info,
+    Error, ...) flushes the buffer right away, so control events are never
+    delayed. With ``max_bytes=0`` every event is written and drained on its own.
+    """
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        max_bytes: int = 0,
+        max_delay: float = 0.02,
+    ):
+        self.writer = writer
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.enabled = max_bytes > 0
+
+        self._buffer = io.BytesIO()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def write_event(self, event: Event) -> None:
+        write_event(event, self._buffer)
+
+        if AudioChunk.is_type(event.type) and (self._buffer.tell() < self.max_bytes):
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_later())
+            return
+
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything buffered so far to the client."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        data = self._buffer.getvalue()
+        if not data:
+            return
+
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def close(self) -> None:
+        """Flush remaining events, ignoring a client that has gone away."""
+        try:
+            await self.flush()
+        except Exception as e:
+            _LOGGER.debug(f"Failed to flush buffered events to client: {e}")
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_delay)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Nobody awaits this task, so the error would never be retrieved
+            _LOGGER.debug(f"Failed to flush buffered events to client: {e}")